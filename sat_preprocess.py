@@ -0,0 +1,389 @@
+# sat_preprocess.py
+# -----------------
+# Simplification of a clause database before it is handed to a solver (see
+# sat_solver.py).
+#
+# Preprocessor runs, in order:
+#	unit propagation - fixed literals are removed from every clause
+#	subsumption - clauses containing another clause are dropped, and
+#		self-subsuming resolution strengthens clauses (C | x and D | ~x,
+#		with C contained in D, strengthen D | ~x to D)
+#	bounded variable elimination - a variable is resolved away when the
+#		resolvents are no more than the clauses they replace.  Variables
+#		defined by an AND or OR gate (e.g. B{x}_{y} <=> P over its
+#		neighbourhood) are only resolved gate against non-gate clauses, which
+#		amounts to substituting their definition
+#
+# Frozen variables (the ones later clauses or queries may use) are never
+# eliminated.  The clauses of each eliminated variable are kept on a
+# reconstruction stack, so that models can be extended to it, and so that
+# SimplifiedSolver can put a variable back (restore it) when a later clause
+# or query mentions it after all.
+import heapq
+
+import sat_solver
+
+
+
+
+#-------------------------------------------------------------------------------
+# Preprocessor
+#-------------------------------------------------------------------------------
+class Preprocessor(object):
+	"""
+	clauses := the clauses to simplify (sequences of DIMACS literals)
+	frozen := the variables that must not be eliminated
+	max_occurrences := variables with more clauses than this on both sides
+		are not eliminated; default=16
+	max_length := longest resolvent added by elimination; default=16
+	grow := how many more clauses than it removes an elimination may add;
+		default=0
+	eliminated := the reconstruction stack of an earlier Preprocessor whose
+		output the clauses are, so that simplifying can be resumed as
+		clauses are added; default=None
+
+	simplified() returns the simplified clauses (units included), which are
+	satisfiable iff the input is, and have the same models over the
+	variables that are not eliminated.
+	"""
+	def __init__(self, clauses, frozen=(), max_occurrences=16, max_length=16, grow=0, eliminated=None):
+		self.frozen = set(frozen)
+		self.max_occurrences = max_occurrences
+		self.max_length = max_length
+		self.grow = grow
+		self.clauses = []
+		self.occurs = {}
+		self.fixed = {}
+		self.units = []
+		self.queue = []
+		self.eliminated = dict(eliminated or {})
+		self.ok = True
+		self.stats = {'input': 0, 'units': 0, 'subsumed': 0, 'strengthened': 0, 'eliminated': 0, 'gates': 0,
+			'resolvents': 0}
+
+
+		for clause in clauses:
+			self.stats['input'] += 1
+			self.add(clause)
+		self.propagate()
+		if self.ok: self.subsume(range(len(self.clauses)))
+		if self.ok: self.eliminate()
+		if self.ok: self.subsume(range(len(self.clauses)))
+
+
+	def add(self, clause):
+		"""
+		Adds a clause under the fixed literals; returns its index, or None if
+		it was satisfied, tautological or a unit.
+		"""
+		lits = set()
+		for lit in clause:
+			value = self.fixed.get(abs(lit))
+			if value is not None and value == (lit > 0): return None
+			if -lit in lits: return None
+			if value is None: lits.add(lit)
+
+
+		if len(lits) <= 1:
+			if lits: self.assign(lits.pop())
+			else: self.ok = False
+			return None
+
+		self.clauses.append(lits)
+		cid = len(self.clauses) - 1
+		for lit in lits: self.occurs.setdefault(lit, set()).add(cid)
+
+		return cid
+
+
+	def assign(self, lit):
+		value = self.fixed.get(abs(lit))
+		if value is None:
+			self.fixed[abs(lit)] = lit > 0
+			self.units.append(lit)
+			self.queue.append(lit)
+			self.stats['units'] += 1
+		elif value != (lit > 0):
+			self.ok = False
+
+
+	def delete(self, cid):
+		for lit in self.clauses[cid]: self.occurs[lit].discard(cid)
+		self.clauses[cid] = None
+
+
+	def strengthen(self, cid, lit):
+		clause = self.clauses[cid]
+		clause.discard(lit)
+		self.occurs[lit].discard(cid)
+
+
+		if len(clause) == 1:
+			self.delete(cid)
+			self.assign(next(iter(clause)))
+
+
+	def propagate(self):
+		while self.queue and self.ok:
+			lit = self.queue.pop()
+			for cid in list(self.occurs.get(lit, ())): self.delete(cid)
+			for cid in list(self.occurs.get(-lit, ())):
+				if len(self.clauses[cid]) == 1: self.ok = False
+				else: self.strengthen(cid, -lit)
+
+
+	def subsume(self, cids):
+		"""
+		Subsumption and self-subsuming resolution of the clauses cids against
+		the database, shortest first; strengthened clauses are checked again.
+		"""
+		queue = [(len(self.clauses[cid]), cid) for cid in cids if self.clauses[cid] is not None]
+		heapq.heapify(queue)
+
+
+		while queue and self.ok:
+			size, cid = heapq.heappop(queue)
+			clause = self.clauses[cid]
+			if clause is None or len(clause) != size: continue
+			best = min(clause, key=lambda lit: len(self.occurs[lit]))
+			for other in list(self.occurs[best]):
+				if other != cid and len(self.clauses[other]) >= size and clause <= self.clauses[other]:
+					self.delete(other)
+					self.stats['subsumed'] += 1
+			for lit in list(clause):
+				if len(self.occurs.get(-lit, ())) > 64 * self.max_occurrences: continue
+				for other in list(self.occurs.get(-lit, ())):
+					target = self.clauses[other]
+					if target is None or len(target) < size or other == cid: continue
+					if all(x == lit or x in target for x in clause):
+						self.strengthen(other, -lit)
+						self.stats['strengthened'] += 1
+						if self.clauses[other] is not None: heapq.heappush(queue, (len(self.clauses[other]), other))
+				if self.clauses[cid] is None: break
+			self.propagate()
+
+
+	def gate(self, v):
+		"""
+		The clauses (pos, neg) of an AND/OR gate defining variable v, or None:
+		for v <=> (a1 & ... & ak), the clause (v | ~a1 | ... | ~ak) and the
+		binaries (~v | ai), and the same with v negated.
+		"""
+		for lit in (v, -v):
+			binaries = {}
+			for cid in self.occurs.get(-lit, ()):
+				if len(self.clauses[cid]) == 2:
+					binaries.setdefault(next(x for x in self.clauses[cid] if x != -lit), cid)
+			if not binaries: continue
+
+			for cid in self.occurs.get(lit, ()):
+				others = [x for x in self.clauses[cid] if x != lit]
+				if all(-x in binaries for x in others):
+					defining = set([cid])
+					defined = set(binaries[-x] for x in others)
+					return ((defining, defined) if lit == v else (defined, defining))
+
+		return None
+
+
+	def resolvents(self, v, pos, neg, limit):
+		"""
+		The non-tautological resolvents on v of the clauses pos and neg, or
+		None if there are more than limit of them or one is too long.
+		"""
+		resolvents = []
+
+
+		for p in pos:
+			left = self.clauses[p]
+			for n in neg:
+				right = self.clauses[n]
+				if any(-x in right for x in left if x != v): continue
+				resolvent = (left | right) - set([v, -v])
+				if len(resolvent) > self.max_length or len(resolvents) >= limit: return None
+				resolvents.append(resolvent)
+
+		return resolvents
+
+
+	def eliminate(self):
+		"""
+		Bounded variable elimination, over the variables with the fewest
+		clauses first.
+		"""
+		variables = set(abs(lit) for lit, cids in self.occurs.items() if cids) - self.frozen
+		queue = [(len(self.occurs.get(v, ())) + len(self.occurs.get(-v, ())), v) for v in variables]
+		heapq.heapify(queue)
+
+
+		while queue and self.ok:
+			count, v = heapq.heappop(queue)
+			if v in self.fixed or v in self.eliminated: continue
+			pos, neg = self.occurs.get(v, set()), self.occurs.get(-v, set())
+			if len(pos) + len(neg) != count:
+				if pos or neg: heapq.heappush(queue, (len(pos) + len(neg), v))
+				continue
+			if len(pos) > self.max_occurrences and len(neg) > self.max_occurrences: continue
+
+			limit = len(pos) + len(neg) + self.grow
+			gate = self.gate(v)
+			if gate is None:
+				resolvents = self.resolvents(v, pos, neg, limit)
+			else:
+				gate_pos, gate_neg = gate
+				resolvents = self.resolvents(v, gate_pos, neg - gate_neg, limit)
+				if resolvents is not None:
+					more = self.resolvents(v, pos - gate_pos, gate_neg, limit - len(resolvents))
+					resolvents = (None if more is None else resolvents + more)
+			if resolvents is None: continue
+
+			if gate is not None: self.stats['gates'] += 1
+			self.stats['eliminated'] += 1
+			self.stats['resolvents'] += len(resolvents)
+			self.eliminated[v] = [tuple(self.clauses[cid]) for cid in sorted(pos | neg)]
+			for cid in list(pos | neg): self.delete(cid)
+			for resolvent in resolvents: self.add(resolvent)
+			self.propagate()
+
+
+	def simplified(self):
+		"""
+		The simplified clauses: the units, then the remaining clauses.
+		"""
+		if not self.ok: return [()]
+
+
+		clauses = [(lit,) for lit in self.units]
+		clauses.extend(tuple(sorted(clause, key=abs)) for clause in self.clauses if clause is not None)
+
+		return clauses
+
+
+	def restore(self, v):
+		"""
+		Takes eliminated variable v off the reconstruction stack and returns
+		the clauses to add back for it, including those of the variables
+		they mention that were eliminated too.
+		"""
+		clauses = self.eliminated.pop(v, None)
+		if clauses is None: return []
+
+
+		restored = []
+		for clause in clauses:
+			for lit in clause:
+				if abs(lit) in self.eliminated: restored.extend(self.restore(abs(lit)))
+			restored.append(clause)
+
+		return restored
+
+
+	def extend(self, value):
+		"""
+		Extends a model of the simplified clauses to the eliminated variables,
+		latest first.
+
+		value := function giving the model's value (True/False) of a
+			variable that is not eliminated
+		Returns {variable: value} for the eliminated variables.
+		"""
+		model = {}
+		lookup = lambda lit: (model[abs(lit)] if abs(lit) in model else value(abs(lit))) == (lit > 0)
+
+
+		for v in reversed(list(self.eliminated)):
+			model[v] = any(v in clause and not any(lookup(lit) for lit in clause if lit != v)
+				for clause in self.eliminated[v])
+
+		return model
+
+
+
+#-------------------------------------------------------------------------------
+# Solver over preprocessed clauses
+#-------------------------------------------------------------------------------
+class SimplifiedSolver(object):
+	"""
+	A solver (see sat_solver.new_solver) loaded with clauses simplified by a
+	Preprocessor, with the same interface.
+
+	Eliminated variables stay usable: adding a clause, assuming a literal or
+	asking root_value about one restores its clauses first, and model_value
+	extends the solver's model to the ones still eliminated.
+
+	The clauses the solver holds (simplified, added and restored) are kept
+	in clauses, and resimplify() preprocesses them again, which is cheaper
+	than starting over from the original clauses.
+
+	clauses, frozen, options := see Preprocessor
+	backend := see sat_solver.new_solver
+	"""
+	def __init__(self, clauses, frozen=(), backend=None, **options):
+		self.preprocessor = Preprocessor(clauses, frozen, **options)
+		self.backend = backend
+		self.solver = sat_solver.new_solver(backend)
+		self.stats = self.solver.stats
+		self.extension = None
+		self.clauses = self.preprocessor.simplified()
+
+
+		for clause in self.clauses: self.solver.add_clause(clause)
+
+
+	def resimplify(self, frozen=(), **options):
+		"""
+		A new SimplifiedSolver over this one's clauses, continuing its
+		reconstruction stack.  Learned clauses are not carried over.
+		"""
+		return SimplifiedSolver(self.clauses, frozen, self.backend, eliminated=self.preprocessor.eliminated, **options)
+
+
+	def restore(self, lits):
+		eliminated = self.preprocessor.eliminated
+		for lit in lits:
+			if abs(lit) in eliminated:
+				for clause in self.preprocessor.restore(abs(lit)):
+					self.clauses.append(clause)
+					self.solver.add_clause(clause)
+				self.extension = None
+
+
+	def add_clause(self, clause):
+		self.restore(clause)
+		self.clauses.append(clause)
+
+
+		return self.solver.add_clause(clause)
+
+
+	def solve(self, assumptions=()):
+		assumptions = list(assumptions)
+		self.restore(assumptions)
+		self.extension = None
+
+
+		return self.solver.solve(assumptions)
+
+
+	def root_literals(self):
+		return self.solver.root_literals()
+
+
+	def root_value(self, lit):
+		self.restore([lit])
+
+
+		return self.solver.root_value(lit)
+
+
+	def set_phases(self, lits):
+		self.solver.set_phases([lit for lit in lits if abs(lit) not in self.preprocessor.eliminated])
+
+
+	def model_value(self, lit):
+		v = abs(lit)
+		if v not in self.preprocessor.eliminated: return self.solver.model_value(lit)
+
+
+		if self.extension is None: self.extension = self.preprocessor.extend(self.solver.model_value)
+		return (self.extension[v] if lit > 0 else not self.extension[v])
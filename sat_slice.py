@@ -0,0 +1,194 @@
+# sat_slice.py
+# ------------
+# Entailment queries solved over the part of a clause database they depend
+# on (their cone of influence), rather than over the whole of it.
+#
+# ClauseGraph indexes the clauses by variable as they are added.  Under the
+# literals already fixed at the root level (see sat_solver root_value), the
+# satisfied clauses are dropped and the false literals removed; what is left
+# splits into variable-disjoint components, and a literal is entailed by the
+# whole database iff it is entailed by its own component (the others being
+# satisfiable when the whole is).
+#
+# Components are only as small as the graph lets them be, so the clauses of
+# a variable that can't matter are left out too: a variable no query asks
+# about whose clauses only have tautological resolvents on it (e.g. the
+# output of an AND/OR gate nothing else mentions, like the B, S and OK of a
+# location no percept link or query uses) can always be given a value
+# satisfying them, so leaving them out keeps the models of every other
+# variable.  Over the wumpus KB, the component of OK{x}_{y}_{t} is then the
+# pits and Breezes around the visited locations near x,y, and the Wumpus
+# locations with their exactly-one constraint.
+#
+# Each component is solved in a fresh solver, and independent ones can be
+# solved in parallel through a concurrent.futures executor.
+#
+#	graph = ClauseGraph()
+#	for clause in clauses: graph.add_clause(clause)
+#	entailed = entailed_literals(graph, lits, solver.root_value)
+import sat_solver
+
+
+
+
+#-------------------------------------------------------------------------------
+# Clause graph
+#-------------------------------------------------------------------------------
+def _tautology(left, right, v):
+	# Whether the resolvent on v of clauses (sets) left and right is a
+	# tautology, looking the shorter one up in the longer one.
+	if len(left) > len(right): left, right = right, left
+
+
+	return any(-lit in right for lit in left if abs(lit) != v)
+
+
+
+class ClauseGraph(object):
+	"""
+	The variable/clause graph of a clause database, grown by add_clause.
+
+	max_resolvents := a variable with more pairs of clauses to resolve than
+		this is kept rather than checked for tautological resolvents;
+		default=256
+	"""
+	def __init__(self, max_resolvents=256):
+		self.max_resolvents = max_resolvents
+		self.clauses = []
+		self.occurs = {}
+		self.stats = {'queries': 0, 'slices': 0, 'clauses': 0, 'solves': 0}
+
+
+	def add_clause(self, clause):
+		clause = tuple(clause)
+		cid = len(self.clauses)
+		self.clauses.append(clause)
+
+
+		for v in set(abs(lit) for lit in clause): self.occurs.setdefault(v, []).append(cid)
+
+
+	def slices(self, lits, value):
+		"""
+		The independent slices the queries lits fall into, as a list of
+		(clauses, lits): the clauses of a slice are simplified under the
+		root level, and only mention variables no other slice does.  Literals
+		with a root value are in no slice.
+
+		value := function giving the root value of a literal: 1 (True), -1
+			(False) or 0 (unknown), e.g. a solver's root_value
+		"""
+		frozen = set(abs(lit) for lit in lits)
+		reduced = {}
+		removable = {}
+		component = {}
+		done = set()
+		slices = []
+
+
+		def simplified(cid):
+			# The clause under the root level, or None if it is satisfied.
+			if cid not in reduced:
+				clause = []
+				for lit in self.clauses[cid]:
+					root = value(lit)
+					if root == 1:
+						clause = None
+						break
+					if root == 0: clause.append(lit)
+				reduced[cid] = (None if clause is None else tuple(clause))
+			return reduced[cid]
+
+		def free(v):
+			# Whether every resolvent on v of its (simplified) clauses is a
+			# tautology, so that its clauses can be left out.
+			if v in frozen: return False
+			if v not in removable:
+				clauses = [set(clause) for clause in (simplified(cid) for cid in self.occurs.get(v, ())) if clause is not None]
+				pos = [clause for clause in clauses if v in clause]
+				neg = [clause for clause in clauses if -v in clause]
+				removable[v] = (len(pos) * len(neg) <= self.max_resolvents
+					and all(_tautology(p, n, v) for p in pos for n in neg))
+			return removable[v]
+
+		for lit in lits:
+			v = abs(lit)
+			if v in component or value(lit): continue
+			index = len(slices)
+			component[v] = index
+			clauses, queue = [], [v]
+			while queue:
+				u = queue.pop()
+				for cid in self.occurs.get(u, ()):
+					if cid in done: continue
+					done.add(cid)
+					clause = simplified(cid)
+					if clause is None or any(abs(other) != u and free(abs(other)) for other in clause): continue
+					clauses.append(clause)
+					for other in clause:
+						if abs(other) not in component:
+							component[abs(other)] = index
+							queue.append(abs(other))
+			slices.append((clauses, []))
+
+		for lit in lits:
+			if component.get(abs(lit)) is not None and not value(lit): slices[component[abs(lit)]][1].append(lit)
+		self.stats['queries'] += len(lits)
+		self.stats['slices'] += len(slices)
+		self.stats['clauses'] += sum(len(clauses) for clauses, queries in slices)
+
+		return slices
+
+
+
+#-------------------------------------------------------------------------------
+# Solving slices
+#-------------------------------------------------------------------------------
+def solve_slice(clauses, lits, backend=None):
+	"""
+	(entailed, solves): the literals in lits entailed by clauses (see
+	sat_solver.entailed_literals), and the number of solves it took.  A
+	top-level function, so that process pools can run it.
+
+	The variables are renumbered from 1 first, so that the solver is sized
+	by the slice rather than by the highest variable of the database.
+	"""
+	solver = sat_solver.new_solver(backend)
+	number = {}
+	rename = lambda lit: (number.setdefault(abs(lit), len(number) + 1) * (1 if lit > 0 else -1))
+
+
+	for clause in clauses: solver.add_clause([rename(lit) for lit in clause])
+	queries = dict((rename(lit), lit) for lit in lits)
+	entailed = sat_solver.entailed_literals(solver, list(queries))
+
+	return set(queries[lit] for lit in entailed), solver.stats['solves']
+
+
+
+def entailed_literals(graph, lits, value, backend=None, executor=None):
+	"""
+	Returns the set of literals in lits entailed by the clauses of graph,
+	solving each slice of them (see ClauseGraph.slices) in its own solver.
+
+	value := see ClauseGraph.slices; it must only fix literals the clauses
+		entail
+	backend := see sat_solver.new_solver
+	executor := a concurrent.futures executor the slices are solved in, in
+		parallel, when there are several; default=None (one after the other)
+	"""
+	lits = list(lits)
+	entailed = set(lit for lit in lits if value(lit) == 1)
+	slices = graph.slices(lits, value)
+
+
+	if executor is None or len(slices) < 2:
+		results = [solve_slice(clauses, queries, backend) for clauses, queries in slices]
+	else:
+		results = list(executor.map(solve_slice, [clauses for clauses, queries in slices],
+			[queries for clauses, queries in slices], [backend] * len(slices)))
+	for found, solves in results:
+		entailed.update(found)
+		graph.stats['solves'] += solves
+
+	return entailed
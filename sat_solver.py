@@ -0,0 +1,576 @@
+# sat_solver.py
+# -------------
+# In-process, incremental SAT solving for the wumpus KB.
+#
+# Clauses are sequences of signed integer literals (DIMACS style: -v is the
+# negation of variable v), as produced by the clause generators in
+# wumpus_kb.  A solver keeps its clauses, including the ones it learns,
+# across calls: new clauses are added between calls with add_clause and
+# queries are posed as solve(assumptions).
+#
+# new_solver() returns a native solver through the optional python-sat
+# package (pysat, https://pysathq.github.io) when it is installed, and the
+# pure-Python CDCLSolver otherwise.
+import heapq
+
+try:
+	from pysat.solvers import Solver as _PySATSolver
+except ImportError:
+	_PySATSolver = None
+
+
+
+
+#-------------------------------------------------------------------------------
+# Pure-Python CDCL solver
+#-------------------------------------------------------------------------------
+
+# Luby restart sequence: 1, 1, 2, 1, 1, 2, 4, ...
+def luby(i):
+	size, seq = 1, 0
+	while size < i + 1:
+		seq += 1
+		size = 2 * size + 1
+
+	while size - 1 != i:
+		size = (size - 1) >> 1
+		seq -= 1
+		i = i % size
+
+	return 2 ** seq
+
+
+
+class CDCLSolver(object):
+	"""
+	Conflict-driven clause learning with two watched literals per clause,
+	first-UIP learning, VSIDS branching with phase saving, Luby restarts and
+	LBD-based cleaning of the learned clauses.
+
+	Assumptions are decided first, one per decision level, as in MiniSat;
+	learned clauses never depend on them, so they are kept from one call
+	to the next.
+	"""
+	restart_base = 100
+	var_decay = 0.95
+
+
+	def __init__(self):
+		self.nvars = 0
+		self.assigns = [0]
+		self.levels = [0]
+		self.reasons = [None]
+		self.activity = [0.0]
+		self.phases = [-1]
+		self.used = [False]
+
+		self.clauses = []
+		self.learnts = []
+		self.lbds = {}
+		self.watches = {}
+		self.trail = []
+		self.trail_lim = []
+		self.qhead = 0
+		self.heap = []
+		self.var_inc = 1.0
+		self.max_learnts = 2000
+
+		self.ok = True
+		self.model = None
+		self.stats = {'solves': 0, 'decisions': 0, 'conflicts': 0, 'propagations': 0, 'restarts': 0}
+
+
+	def ensure_var(self, v):
+		while self.nvars < v:
+			self.nvars += 1
+			self.assigns.append(0)
+			self.levels.append(0)
+			self.reasons.append(None)
+			self.activity.append(0.0)
+			self.phases.append(-1)
+			self.used.append(False)
+
+
+	def value(self, lit):
+		"""
+		1 if lit is True, -1 if False and 0 if unassigned in the current trail.
+		"""
+		return (self.assigns[lit] if lit > 0 else -self.assigns[-lit])
+
+
+	def add_clause(self, clause):
+		"""
+		Adds a clause; returns False once the clauses are unsatisfiable.
+		"""
+		if not self.ok: return False
+		if self.trail_lim: self.cancel_until(0)
+
+
+		lits = []
+		seen = set()
+		for lit in clause:
+			v = abs(lit)
+			self.ensure_var(v)
+			if not self.used[v]:
+				self.used[v] = True
+				heapq.heappush(self.heap, (-self.activity[v], v))
+			val = self.value(lit)
+			if val == 1 or -lit in seen: return True
+			if val == 0 and lit not in seen:
+				seen.add(lit)
+				lits.append(lit)
+
+		if not lits:
+			self.ok = False
+		elif len(lits) == 1:
+			self.enqueue(lits[0], None)
+			self.ok = self.propagate() is None
+		else:
+			self.clauses.append(lits)
+			self.watch(lits)
+
+		return self.ok
+
+
+	def watch(self, clause):
+		self.watches.setdefault(clause[0], []).append(clause)
+		self.watches.setdefault(clause[1], []).append(clause)
+
+
+	def enqueue(self, lit, reason):
+		v = abs(lit)
+		self.assigns[v] = (1 if lit > 0 else -1)
+		self.levels[v] = len(self.trail_lim)
+		self.reasons[v] = reason
+		self.trail.append(lit)
+
+
+	def propagate(self):
+		"""
+		Unit propagation over the watched literals; returns a conflicting
+		clause, or None.
+		"""
+		assigns, watches, trail = self.assigns, self.watches, self.trail
+		start = self.qhead
+
+
+		while self.qhead < len(trail):
+			false_lit = -trail[self.qhead]
+			self.qhead += 1
+			ws = watches.get(false_lit)
+			if not ws: continue
+
+			i = j = 0
+			n = len(ws)
+			while i < n:
+				c = ws[i]
+				i += 1
+				if c[0] == false_lit: c[0], c[1] = c[1], false_lit
+				first = c[0]
+				fv = (assigns[first] if first > 0 else -assigns[-first])
+				if fv == 1:
+					ws[j] = c
+					j += 1
+					continue
+
+				for k in range(2, len(c)):
+					lit = c[k]
+					if (assigns[lit] if lit > 0 else -assigns[-lit]) != -1:
+						c[1] = lit
+						c[k] = false_lit
+						watches.setdefault(lit, []).append(c)
+						break
+				else:
+					ws[j] = c
+					j += 1
+					if fv == -1:
+						ws[j:] = ws[i:]
+						self.stats['propagations'] += len(trail) - start
+						self.qhead = len(trail)
+						return c
+					self.enqueue(first, c)
+			del ws[j:]
+
+		self.stats['propagations'] += len(trail) - start
+
+		return None
+
+
+	def analyze(self, confl):
+		"""
+		First-UIP conflict analysis; returns (learnt clause, backjump level).
+		"""
+		levels, trail = self.levels, self.trail
+		level = len(self.trail_lim)
+		seen = set()
+		learnt = [0]
+		counter = 0
+		p = 0
+		i = len(trail) - 1
+
+
+		while True:
+			for q in (confl if p == 0 else confl[1:]):
+				v = abs(q)
+				if v not in seen and levels[v] > 0:
+					seen.add(v)
+					self.bump(v)
+					if levels[v] >= level: counter += 1
+					else: learnt.append(q)
+
+			while abs(trail[i]) not in seen: i -= 1
+			p = trail[i]
+			i -= 1
+			confl = self.reasons[abs(p)]
+			counter -= 1
+			if counter == 0: break
+
+		learnt[0] = -p
+		if len(learnt) == 1: return learnt, 0
+
+		k = max(range(1, len(learnt)), key=lambda j: levels[abs(learnt[j])])
+		learnt[1], learnt[k] = learnt[k], learnt[1]
+
+		return learnt, levels[abs(learnt[1])]
+
+
+	def bump(self, v):
+		self.activity[v] += self.var_inc
+		if self.activity[v] > 1e100:
+			self.activity = [a * 1e-100 for a in self.activity]
+			self.var_inc *= 1e-100
+			self.rebuild_heap()
+		elif self.assigns[v] == 0:
+			heapq.heappush(self.heap, (-self.activity[v], v))
+
+
+	def rebuild_heap(self):
+		self.heap = [(-self.activity[v], v) for v in range(1, self.nvars + 1) if self.used[v] and self.assigns[v] == 0]
+		heapq.heapify(self.heap)
+
+
+	def cancel_until(self, level):
+		if len(self.trail_lim) <= level: return
+
+
+		assigns, phases, activity, heap = self.assigns, self.phases, self.activity, self.heap
+		for lit in self.trail[self.trail_lim[level]:]:
+			v = abs(lit)
+			phases[v] = assigns[v]
+			assigns[v] = 0
+			self.reasons[v] = None
+			heapq.heappush(heap, (-activity[v], v))
+		del self.trail[self.trail_lim[level]:]
+		del self.trail_lim[level:]
+		self.qhead = len(self.trail)
+
+
+	# Only variables that occur in some clause are branched on: the others
+	# are unconstrained, and there may be many of them when IDs come from a
+	# registry laid out per time step.
+	def pick_branch_var(self):
+		heap, assigns = self.heap, self.assigns
+		if len(heap) > 4 * self.nvars + 1000: self.rebuild_heap()
+
+
+		while heap:
+			v = heapq.heappop(heap)[1]
+			if assigns[v] == 0: return v
+
+		return 0
+
+
+	def reduce_db(self):
+		"""
+		Drops the less useful half of the learned clauses (by LBD), keeping
+		binary clauses and clauses that are the reason of an assignment.
+		"""
+		lbds, reasons, assigns = self.lbds, self.reasons, self.assigns
+		self.learnts.sort(key=lambda c: lbds[id(c)])
+		keep = self.learnts[:len(self.learnts) // 2]
+		dropped = set()
+
+
+		for c in self.learnts[len(self.learnts) // 2:]:
+			v = abs(c[0])
+			if len(c) <= 2 or lbds[id(c)] <= 2 or (reasons[v] is c and assigns[v] != 0):
+				keep.append(c)
+			else:
+				dropped.add(id(c))
+				del lbds[id(c)]
+
+		for lit in set(lit for c in self.learnts if id(c) in dropped for lit in c[:2]):
+			self.watches[lit] = [c for c in self.watches[lit] if id(c) not in dropped]
+		self.learnts = keep
+		self.max_learnts = int(self.max_learnts * 1.1)
+
+
+	def search(self, budget, assumptions):
+		"""
+		Returns True (model found), False (unsatisfiable under the
+		assumptions) or None (restart after budget conflicts).
+		"""
+		conflicts = 0
+
+
+		while True:
+			confl = self.propagate()
+			if confl is not None:
+				self.stats['conflicts'] += 1
+				conflicts += 1
+				if not self.trail_lim:
+					self.ok = False
+					return False
+
+				learnt, level = self.analyze(confl)
+				self.cancel_until(level)
+				if len(learnt) == 1:
+					self.enqueue(learnt[0], None)
+				else:
+					self.learnts.append(learnt)
+					self.lbds[id(learnt)] = len(set(self.levels[abs(lit)] for lit in learnt))
+					self.watch(learnt)
+					self.enqueue(learnt[0], learnt)
+				self.var_inc /= self.var_decay
+				continue
+
+			if conflicts >= budget:
+				self.cancel_until(0)
+				return None
+			if len(self.learnts) - len(self.trail) >= self.max_learnts: self.reduce_db()
+
+			lit = 0
+			while len(self.trail_lim) < len(assumptions):
+				a = assumptions[len(self.trail_lim)]
+				self.ensure_var(abs(a))
+				val = self.value(a)
+				if val == 1:
+					self.trail_lim.append(len(self.trail))
+				elif val == -1:
+					return False
+				else:
+					lit = a
+					break
+
+			if lit == 0:
+				v = self.pick_branch_var()
+				if v == 0:
+					self.model = list(self.assigns)
+					return True
+				self.stats['decisions'] += 1
+				lit = (v if self.phases[v] > 0 else -v)
+
+			self.trail_lim.append(len(self.trail))
+			self.enqueue(lit, None)
+
+
+	def solve(self, assumptions=()):
+		"""
+		Returns True if the clauses and the assumption literals are
+		satisfiable (the model is then available through model_value).
+		"""
+		self.model = None
+		self.stats['solves'] += 1
+		if not self.ok: return False
+
+
+		self.cancel_until(0)
+		if self.propagate() is not None:
+			self.ok = False
+			return False
+
+		status = None
+		restarts = 0
+		while status is None:
+			status = self.search(luby(restarts) * self.restart_base, list(assumptions))
+			restarts += 1
+		self.stats['restarts'] += restarts - 1
+		self.cancel_until(0)
+
+		return status
+
+
+	def root_literals(self):
+		"""
+		The literals implied by the clauses alone (at decision level 0).
+		"""
+		self.cancel_until(0)
+		if self.ok and self.propagate() is not None: self.ok = False
+
+
+		return list(self.trail)
+
+
+	def root_value(self, lit):
+		"""
+		1 if unit propagation over the clauses alone (no decisions) makes lit
+		True, -1 if it makes lit False, 0 otherwise (or if the clauses are
+		known to be unsatisfiable).
+
+		The root level is kept up to date as clauses are added and learned,
+		so this is a lookup, not a search.
+		"""
+		if self.trail_lim: self.cancel_until(0)
+		if self.ok and self.propagate() is not None: self.ok = False
+
+
+		if not self.ok or abs(lit) > self.nvars: return 0
+		return self.value(lit)
+
+
+	def set_phases(self, lits):
+		"""
+		Decides the variables of lits first in the next search, each with the
+		polarity of its literal.
+		"""
+		top = max(self.activity) + self.var_inc
+		for lit in lits:
+			v = abs(lit)
+			self.ensure_var(v)
+			self.phases[v] = (1 if lit > 0 else -1)
+			self.activity[v] = top
+			heapq.heappush(self.heap, (-top, v))
+
+
+	def model_value(self, lit):
+		"""
+		Value of lit in the last model; variables the solver has never seen
+		are unconstrained and read as False.
+		"""
+		v = abs(lit)
+		value = (self.model[v] > 0 if v < len(self.model) else False)
+
+		return (value if lit > 0 else not value)
+
+
+
+#-------------------------------------------------------------------------------
+# Native solver (python-sat)
+#-------------------------------------------------------------------------------
+class NativeSolver(object):
+	"""
+	The same interface over a python-sat solver (MiniSat 2.2 by default).
+
+	Unit clauses are kept out of the solver and passed as assumptions
+	instead: MiniSat's propagate only reports literals above decision level
+	0, so units added as clauses (and all they imply) would never show up
+	in root_literals.
+	"""
+	def __init__(self, name='minisat22'):
+		self.solver = _PySATSolver(name=name)
+		self.units = []
+		self.unit_set = set()
+		self.model = None
+		self.roots = None
+		self.ok = True
+		self.stats = {'solves': 0}
+
+
+	def add_clause(self, clause):
+		lits = [int(lit) for lit in clause]
+
+
+		if len(set(lits)) == 1:
+			if lits[0] not in self.unit_set:
+				self.unit_set.add(lits[0])
+				self.units.append(lits[0])
+		else:
+			self.solver.add_clause(lits)
+		self.roots = None
+
+		return True
+
+
+	def solve(self, assumptions=()):
+		self.stats['solves'] += 1
+		status = self.solver.solve(assumptions=self.units + [int(lit) for lit in assumptions])
+		self.model = ([0] + self.solver.get_model() if status else None)
+
+		return status
+
+
+	def root_set(self):
+		# The units and what they imply, cached until the next add_clause.
+		if self.roots is None:
+			status, lits = self.solver.propagate(assumptions=self.units)
+			self.ok = status
+			self.roots = (set(lits) if status else set())
+
+		return self.roots
+
+
+	def root_literals(self):
+		return sorted(self.root_set(), key=abs)
+
+
+	def root_value(self, lit):
+		roots = self.root_set()
+
+
+		return (1 if lit in roots else (-1 if -lit in roots else 0))
+
+
+	def set_phases(self, lits):
+		self.solver.set_phases([int(lit) for lit in lits])
+
+
+	def model_value(self, lit):
+		v = abs(lit)
+		value = (self.model[v] > 0 if v < len(self.model) else False)
+
+		return (value if lit > 0 else not value)
+
+
+
+def native_available():
+	return _PySATSolver is not None
+
+
+
+def new_solver(backend=None):
+	"""
+	backend := 'native', 'python' or None (native when available)
+	"""
+	if backend == 'native' or (backend is None and native_available()): return NativeSolver()
+	if backend in (None, 'python'): return CDCLSolver()
+
+	raise ValueError('Unknown solver backend: {0!r}'.format(backend))
+
+
+
+#-------------------------------------------------------------------------------
+# Batched entailment
+#-------------------------------------------------------------------------------
+def entailed_literals(solver, lits):
+	"""
+	Returns the set of literals in lits entailed by the solver's clauses.
+
+	Shares work across the literals: a literal is only entailed if it is
+	True in every model, so each model found (starting from one base solve)
+	refutes every candidate it falsifies, and only candidates no model has
+	refuted yet need a dedicated solve under their negation.  Decisions are
+	steered towards falsifying the remaining candidates, so that each model
+	refutes as many of them as possible.
+
+	Literals already decided by unit propagation at the root level (see
+	root_value) are answered without solving; the clauses are assumed
+	satisfiable when all of lits are decided that way.  Unsatisfiable
+	clauses entail every literal.
+	"""
+	queries = list(lits)
+	entailed = set(lit for lit in queries if solver.root_value(lit) == 1)
+	lits = [lit for lit in queries if solver.root_value(lit) == 0]
+
+
+	if not lits: return entailed
+	if not solver.solve(): return set(queries)
+	candidates = [lit for lit in lits if solver.model_value(lit)]
+	while candidates:
+		lit = candidates.pop()
+		solver.set_phases([-other for other in candidates])
+		if solver.solve([-lit]):
+			candidates = [other for other in candidates if solver.model_value(other)]
+		else:
+			entailed.add(lit)
+
+	return entailed
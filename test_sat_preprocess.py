@@ -0,0 +1,147 @@
+# test_sat_preprocess.py
+# ----------------------
+# Randomized tests of the clause preprocessing (see sat_preprocess.py)
+# against brute force over small random CNFs: satisfiability, models over
+# the variables that are not eliminated, model extension, restoring
+# eliminated variables and resimplifying.
+#
+#	python -m pytest test_sat_preprocess.py
+import itertools
+import random
+
+import sat_preprocess
+
+
+
+
+#-------------------------------------------------------------------------------
+# Brute force
+#-------------------------------------------------------------------------------
+def random_cnf(rng, nvars, nclauses, max_length=4):
+	return [tuple(rng.choice((1, -1)) * v for v in rng.sample(range(1, nvars + 1), rng.randint(1, max_length)))
+		for i in range(nclauses)]
+
+
+
+def satisfies(model, clauses):
+	# model := {variable: True/False}
+	return all(any(model[abs(lit)] == (lit > 0) for lit in clause) for clause in clauses)
+
+
+
+def models(clauses, nvars):
+	for values in itertools.product((False, True), repeat=nvars):
+		model = dict(zip(range(1, nvars + 1), values))
+		if satisfies(model, clauses): yield model
+
+
+
+def entailed(clauses, nvars, lit):
+	return all(model[abs(lit)] == (lit > 0) for model in models(clauses, nvars))
+
+
+
+def instances(seed, count, nvars=7):
+	rng = random.Random(seed)
+
+
+	for i in range(count):
+		clauses = random_cnf(rng, nvars, rng.randint(3, 24))
+		frozen = rng.sample(range(1, nvars + 1), rng.randint(0, 3))
+		yield rng, clauses, frozen
+
+
+
+#-------------------------------------------------------------------------------
+# Preprocessor
+#-------------------------------------------------------------------------------
+def test_simplified_keeps_models_over_remaining_variables():
+	nvars = 7
+
+
+	for rng, clauses, frozen in instances(1, 300, nvars):
+		pre = sat_preprocess.Preprocessor(clauses, frozen)
+		simplified = pre.simplified()
+		kept = [v for v in range(1, nvars + 1) if v not in pre.eliminated]
+		project = lambda ms: set(tuple(model[v] for v in kept) for model in ms)
+		assert set(pre.eliminated).isdisjoint(frozen)
+		assert project(models(clauses, nvars)) == project(models(simplified, nvars))
+
+
+
+def test_extend_completes_models_of_simplified_clauses():
+	nvars = 7
+
+
+	for rng, clauses, frozen in instances(2, 300, nvars):
+		pre = sat_preprocess.Preprocessor(clauses, frozen)
+		for model in models(pre.simplified(), nvars):
+			full = dict(model)
+			full.update(pre.extend(lambda v: model[v]))
+			assert satisfies(full, clauses)
+
+
+
+def test_restore_puts_back_equivalent_clauses():
+	nvars = 7
+
+
+	for rng, clauses, frozen in instances(3, 300, nvars):
+		pre = sat_preprocess.Preprocessor(clauses, frozen)
+		restored = pre.simplified()
+		for v in list(pre.eliminated):
+			restored = restored + pre.restore(v)
+			kept = [u for u in range(1, nvars + 1) if u not in pre.eliminated]
+			project = lambda ms: set(tuple(model[u] for u in kept) for model in ms)
+			assert v in kept
+			assert project(models(clauses, nvars)) == project(models(restored, nvars))
+
+
+
+#-------------------------------------------------------------------------------
+# SimplifiedSolver
+#-------------------------------------------------------------------------------
+def check_solver(solver, clauses, nvars):
+	# Satisfiability, entailment and root values of every literal, eliminated
+	# or not, and the models, against brute force.
+	satisfiable = any(True for model in models(clauses, nvars))
+	assert solver.solve() == satisfiable
+	if not satisfiable: return
+
+	model = dict((v, solver.model_value(v)) for v in range(1, nvars + 1))
+	assert satisfies(model, clauses)
+	for lit in [v * sign for v in range(1, nvars + 1) for sign in (1, -1)]:
+		expected = entailed(clauses, nvars, lit)
+		assert (not solver.solve([-lit])) == expected
+		if not expected:
+			model = dict((v, solver.model_value(v)) for v in range(1, nvars + 1))
+			assert satisfies(model, clauses) and model[abs(lit)] != (lit > 0)
+		if solver.root_value(lit) == 1: assert expected
+
+
+
+def test_simplified_solver_answers_like_brute_force():
+	nvars = 7
+
+
+	for rng, clauses, frozen in instances(4, 150, nvars):
+		check_solver(sat_preprocess.SimplifiedSolver(clauses, frozen, 'python'), clauses, nvars)
+
+
+
+def test_added_clauses_restore_and_resimplify():
+	nvars = 7
+
+
+	for rng, clauses, frozen in instances(5, 150, nvars):
+		solver = sat_preprocess.SimplifiedSolver(clauses, frozen, 'python')
+		more = random_cnf(rng, nvars, rng.randint(1, 4), 3)
+		for clause in more: solver.add_clause(clause)
+		clauses = clauses + more
+		check_solver(solver, clauses, nvars)
+
+		solver = solver.resimplify(rng.sample(range(1, nvars + 1), rng.randint(0, 3)))
+		check_solver(solver, clauses, nvars)
+		more = random_cnf(rng, nvars, rng.randint(1, 4), 3)
+		for clause in more: solver.add_clause(clause)
+		check_solver(solver, clauses + more, nvars)
@@ -0,0 +1,117 @@
+# test_sat_slice.py
+# -----------------
+# Randomized tests of sliced entailment (see sat_slice.py): on satisfiable
+# random KBs, the literals entailed slice by slice must be those entailed by
+# the whole database, with or without variables left out as free, and
+# whether the slices are solved in turn or in parallel.
+#
+#	python -m pytest test_sat_slice.py
+import concurrent.futures
+import itertools
+import random
+
+import sat_slice
+import sat_solver
+
+
+
+
+#-------------------------------------------------------------------------------
+# Random KBs
+#-------------------------------------------------------------------------------
+def random_kb(rng, nvars, nclauses):
+	"""
+	Random clauses over variables 1..nvars (units among them, for the root
+	level to simplify), plus AND gates g <=> a & b over fresh variables g:
+	the gates of g nothing else mentions only have tautological resolvents
+	on g, so they can be left out as free.  Returns (clauses, nvars).
+	"""
+	clauses = [[rng.choice((1, -1)) * v for v in rng.sample(range(1, nvars + 1), rng.choice((1, 2, 2, 3, 3, 3)))]
+		for i in range(nclauses)]
+
+
+	for g in range(nvars + 1, nvars + 1 + rng.randint(1, 4)):
+		a, b = [rng.choice((1, -1)) * v for v in rng.sample(range(1, g), 2)]
+		clauses.extend([[-g, a], [-g, b], [g, -a, -b]])
+		if rng.random() < 0.3: clauses.append([rng.choice((1, -1)) * g, rng.choice((1, -1)) * rng.randint(1, nvars)])
+		nvars = g
+
+	return clauses, nvars
+
+
+
+def brute_force_entailed(clauses, nvars, lits):
+	models = [values for values in itertools.product((False, True), repeat=nvars)
+		if all(any(values[abs(lit) - 1] == (lit > 0) for lit in clause) for clause in clauses)]
+
+
+	if not models: return None
+	return set(lit for lit in lits if all(model[abs(lit) - 1] == (lit > 0) for model in models))
+
+
+
+def new_solver(clauses):
+	solver = sat_solver.CDCLSolver()
+	for clause in clauses: solver.add_clause(clause)
+
+
+	return solver
+
+
+
+#-------------------------------------------------------------------------------
+# Sliced entailment
+#-------------------------------------------------------------------------------
+def test_sliced_entailment_matches_the_whole_database():
+	rng = random.Random(4)
+	compared = eliminated = 0
+
+
+	while compared < 150:
+		clauses, nvars = random_kb(rng, 10, rng.randint(3, 16))
+		lits = [rng.choice((1, -1)) * v for v in rng.sample(range(1, nvars + 1), rng.randint(1, nvars))]
+		expected = brute_force_entailed(clauses, nvars, lits)
+		if expected is None: continue
+		assert sat_solver.entailed_literals(new_solver(clauses), lits) == expected
+
+		root = new_solver(clauses)
+		for max_resolvents in (256, 0):
+			graph = sat_slice.ClauseGraph(max_resolvents)
+			for clause in clauses: graph.add_clause(clause)
+			assert sat_slice.entailed_literals(graph, lits, root.root_value, 'python') == expected, (clauses, lits)
+			if max_resolvents: eliminated += graph.stats['clauses'] < len(clauses)
+		compared += 1
+	assert eliminated > 0
+
+
+
+def test_free_gate_outputs_are_left_out():
+	# With its inputs asked about, the gate 4 <=> 1 & 2 is kept when 4 is
+	# asked about too, or used by another clause (resolving [4, -1, -2] with
+	# [-4, 3] isn't a tautology), and left out otherwise.
+	gate = [(-4, 1), (-4, 2), (4, -1, -2)]
+	value = lambda lit: 0
+
+
+	for extra, lits, kept in (([], [1, 2], False), ([], [1, 2, 4], True), ([(-4, 3)], [1, 2, 3], True)):
+		graph = sat_slice.ClauseGraph()
+		for clause in gate + extra: graph.add_clause(clause)
+		slices = graph.slices(lits, value)
+		clauses = [clause for slice_clauses, queries in slices for clause in slice_clauses]
+		assert sorted(clauses) == sorted(gate + extra if kept else [])
+		assert sorted(lit for slice_clauses, queries in slices for lit in queries) == sorted(lits)
+
+
+
+def test_slices_solved_in_parallel():
+	# Two variable-disjoint halves, each entailing its own literal, and a
+	# clause left out: 6 only occurs positively.
+	clauses = [(1, 2), (1, -2), (3, 4), (-3, 4), (5, 6)]
+	graph = sat_slice.ClauseGraph()
+	for clause in clauses: graph.add_clause(clause)
+
+
+	assert [len(clauses) for clauses, queries in graph.slices([1, 4, 5], lambda lit: 0)] == [2, 2, 0]
+	with concurrent.futures.ThreadPoolExecutor(2) as executor:
+		assert sat_slice.entailed_literals(graph, [1, 4, 5, -6], lambda lit: 0, 'python', executor) == set([1, 4])
+	assert graph.stats['solves'] > 0
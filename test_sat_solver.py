@@ -0,0 +1,161 @@
+# test_sat_solver.py
+# ------------------
+# Randomized tests of the pure-Python CDCL solver (see sat_solver.py) against
+# brute force over small random CNFs: satisfiability with and without
+# assumptions, models, root-level values, clauses added between solves and
+# batched entailment.  Tiny restart and learned clause budgets make every
+# instance go through restarts and clause database reductions.
+#
+#	python -m pytest test_sat_solver.py
+import itertools
+import random
+
+import pytest
+
+import sat_solver
+
+
+
+
+#-------------------------------------------------------------------------------
+# Brute force
+#-------------------------------------------------------------------------------
+def random_cnf(rng, nvars, nclauses, max_length=3):
+	return [[rng.choice((1, -1)) * v for v in rng.sample(range(1, nvars + 1), rng.randint(1, max_length))]
+		for i in range(nclauses)]
+
+
+
+def satisfies(model, clauses):
+	# model := {variable: True/False}
+	return all(any(model[abs(lit)] == (lit > 0) for lit in clause) for clause in clauses)
+
+
+
+def models(clauses, nvars):
+	for values in itertools.product((False, True), repeat=nvars):
+		model = dict(zip(range(1, nvars + 1), values))
+		if satisfies(model, clauses): yield model
+
+
+
+def new_solver():
+	solver = sat_solver.CDCLSolver()
+	solver.restart_base = 1
+	solver.max_learnts = 0
+
+
+	return solver
+
+
+
+def check(solver, clauses, nvars, rng):
+	all_models = list(models(clauses, nvars))
+	assert solver.solve() == bool(all_models)
+	if all_models:
+		assert satisfies(dict((v, solver.model_value(v)) for v in range(1, nvars + 1)), clauses)
+
+	for i in range(4):
+		assumptions = [rng.choice((1, -1)) * v for v in rng.sample(range(1, nvars + 1), rng.randint(1, 3))]
+		expected = [model for model in all_models if all(model[abs(lit)] == (lit > 0) for lit in assumptions)]
+		assert solver.solve(assumptions) == bool(expected), (clauses, assumptions)
+		if expected:
+			model = dict((v, solver.model_value(v)) for v in range(1, nvars + 1))
+			assert satisfies(model, clauses) and all(model[abs(lit)] == (lit > 0) for lit in assumptions)
+
+	lits = [v * sign for v in range(1, nvars + 1) for sign in (1, -1)]
+	entailed = set(lit for lit in lits if all(model[abs(lit)] == (lit > 0) for model in all_models))
+	assert sat_solver.entailed_literals(solver, lits) == entailed
+	for lit in lits:
+		if solver.root_value(lit) == 1: assert lit in entailed
+	assert all(lit in entailed for lit in solver.root_literals())
+
+
+
+#-------------------------------------------------------------------------------
+# CDCLSolver
+#-------------------------------------------------------------------------------
+def test_cdcl_solver_answers_like_brute_force():
+	rng = random.Random(1)
+	nvars = 10
+
+
+	for i in range(150):
+		clauses = random_cnf(rng, nvars, rng.randint(5, 50))
+		solver = new_solver()
+		for clause in clauses: solver.add_clause(clause)
+		check(solver, clauses, nvars, rng)
+
+
+
+def test_clauses_added_between_solves():
+	rng = random.Random(2)
+	nvars = 10
+
+
+	for i in range(60):
+		solver = new_solver()
+		clauses = []
+		while len(clauses) < 60:
+			more = random_cnf(rng, nvars, rng.randint(1, 10))
+			for clause in more: solver.add_clause(clause)
+			clauses.extend(more)
+			check(solver, clauses, nvars, rng)
+			if not solver.ok: break
+
+
+
+def test_duplicate_and_tautological_literals():
+	solver = sat_solver.CDCLSolver()
+
+
+	assert solver.add_clause([1, 1, -2, 1])
+	assert solver.add_clause([3, -3])
+	assert solver.clauses == [[1, -2]]
+	assert solver.add_clause([2, 2]) and solver.root_value(1) == 1
+	assert not solver.add_clause([-1, -1]) and not solver.solve()
+
+
+
+def test_unsatisfiable_clauses_entail_every_literal():
+	# 1 is fixed at the root level before the conflict is found by search.
+	solver = sat_solver.CDCLSolver()
+	for clause in ([1], [2, 3], [2, -3], [-2, 3], [-2, -3]): solver.add_clause(clause)
+
+
+	assert solver.root_value(-1) == -1
+	assert sat_solver.entailed_literals(solver, [1, -1, 2, -2, 4]) == set([1, -1, 2, -2, 4])
+
+
+
+#-------------------------------------------------------------------------------
+# NativeSolver
+#-------------------------------------------------------------------------------
+@pytest.mark.skipif(not sat_solver.native_available(), reason='python-sat is not installed')
+def test_native_solver_answers_like_brute_force():
+	rng = random.Random(3)
+	nvars = 10
+
+
+	for i in range(60):
+		solver = sat_solver.NativeSolver()
+		clauses = []
+		while len(clauses) < 40:
+			more = random_cnf(rng, nvars, rng.randint(1, 10), rng.choice((1, 3)))
+			for clause in more: solver.add_clause(clause)
+			clauses.extend(more)
+			check(solver, clauses, nvars, rng)
+			if not solver.solve(): break
+
+
+
+@pytest.mark.skipif(not sat_solver.native_available(), reason='python-sat is not installed')
+def test_native_root_literals_follow_unit_clauses():
+	solver = sat_solver.NativeSolver()
+	for clause in ([-1, 2], [-2, -3, 4], [1], [3, 3]): solver.add_clause(clause)
+
+
+	assert solver.root_literals() == [1, 2, 3, 4]
+	assert solver.root_value(-4) == -1 and solver.root_value(5) == 0
+	solver.add_clause([-4])
+	assert solver.root_literals() == [] and not solver.ok and not solver.solve()
@@ -0,0 +1,56 @@
+# test_wumpus_batch.py
+# --------------------
+# Tests of the batch runner (see wumpus_batch.py): the static clauses must
+# read back from shared memory as generated, and episodes played over them
+# must go as they do over a KB of their own.
+#
+#	python -m pytest test_wumpus_batch.py
+import pytest
+
+import wumpus_batch
+import wumpus_kb
+import wumpus_world
+
+
+
+
+#-------------------------------------------------------------------------------
+# Shared clauses
+#-------------------------------------------------------------------------------
+def test_shared_clauses_round_trip():
+	reg = wumpus_kb.grid_registry(3, 3)
+	for clauses in ([], [()], [(1, -2), (), (3,), (-4, 5, -6, 7)],
+			[tuple(clause) for clause in wumpus_kb.static_wumpus_clauses(3, 3, reg)]):
+		shared = wumpus_batch.SharedClauses(clauses)
+		attached = wumpus_batch.SharedClauses.attach(shared.name, len(shared))
+
+
+		assert len(shared) == len(attached) == len(clauses)
+		assert list(shared) == list(attached) == clauses
+		attached.close()
+		assert list(shared) == clauses
+		shared.close()
+		with pytest.raises(FileNotFoundError): wumpus_batch.SharedClauses.attach(shared.name, len(clauses))
+
+
+
+#-------------------------------------------------------------------------------
+# Batches
+#-------------------------------------------------------------------------------
+def episode_outcomes(rows):
+	return [(row['seed'], row['outcome'], row['steps'], row['queries']) for row in rows]
+
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_batch_episodes_match_standalone_episodes(processes):
+	seeds = range(6)
+	expected = []
+	for seed in seeds:
+		stats = wumpus_world.run_episode(*wumpus_world.new_episode(4, 4, seed, 0.2, backend='python'), max_steps=30)
+		stats['seed'] = seed
+		expected.append(stats)
+
+
+	rows = wumpus_batch.run_batch(4, 4, seeds, processes, max_steps=30, backend='python')
+	assert episode_outcomes(rows) == episode_outcomes(expected)
@@ -0,0 +1,115 @@
+# test_wumpus_belief.py
+# ---------------------
+# Tests of the belief grid (see wumpus_belief.py): its Pit and Wumpus
+# marginals against brute-force enumeration of the worlds consistent with
+# the percepts, on small random worlds.
+#
+#	python -m pytest test_wumpus_belief.py
+import itertools
+import random
+
+import pytest
+
+import wumpus_belief
+import wumpus_kb
+
+
+pytestmark = pytest.mark.skipif(not wumpus_belief.numpy_available(), reason='numpy is not installed')
+
+
+
+
+#-------------------------------------------------------------------------------
+# Brute force
+#-------------------------------------------------------------------------------
+def neighbourhood(x, y, width, height):
+	return set(wumpus_kb._neighbour_cells(x, y, 1, width, 1, height))
+
+
+
+def random_walk(rng, width, height, steps):
+	# The locations visited by a random walk from 1,1.
+	x, y = 1, 1
+	visited = [(x, y)]
+
+
+	for i in range(steps):
+		x, y = rng.choice(sorted(neighbourhood(x, y, width, height)))
+		if (x, y) not in visited: visited.append((x, y))
+
+	return visited
+
+
+
+def pit_marginals(width, height, visited, breezes, p):
+	"""
+	{(x, y): probability of a Pit}, summing the prior weight of every Pit
+	layout with no Pit at the visited locations and a Breeze exactly where
+	one was perceived.
+	"""
+	cells = [cell for cell in wumpus_kb.locations(1, width, 1, height) if cell not in visited]
+	totals = dict((cell, 0.0) for cell in cells)
+	norm = 0.0
+
+
+	for values in itertools.product((False, True), repeat=len(cells)):
+		pits = set(cell for cell, pit in zip(cells, values) if pit)
+		if any(bool(pits & neighbourhood(x, y, width, height)) != breezes[(x, y)] for x, y in visited): continue
+		weight = p ** len(pits) * (1 - p) ** (len(cells) - len(pits))
+		norm += weight
+		for cell in pits: totals[cell] += weight
+
+	marginals = dict((cell, 0.0) for cell in visited)
+	marginals.update((cell, total / norm) for cell, total in totals.items())
+	return marginals
+
+
+
+def wumpus_marginals(width, height, visited, stenches):
+	# One Wumpus, uniformly likely at any location consistent with the
+	# Stenches perceived.
+	cells = [cell for cell in wumpus_kb.locations(1, width, 1, height) if cell not in visited
+		and all((cell in neighbourhood(x, y, width, height)) == stenches[(x, y)] for x, y in visited)]
+
+
+	return dict((cell, (1.0 / len(cells) if cell in cells else 0.0)) for cell in wumpus_kb.locations(1, width, 1, height))
+
+
+
+#-------------------------------------------------------------------------------
+# Marginals
+#-------------------------------------------------------------------------------
+def test_marginals_match_brute_force():
+	rng = random.Random(3)
+
+
+	for i in range(40):
+		width, height, p = rng.choice(((3, 3), (4, 3), (3, 4))) + (rng.choice((0.1, 0.2, 0.4)),)
+		world = [cell for cell in wumpus_kb.locations(1, width, 1, height) if cell != (1, 1)]
+		pits = set(cell for cell in world if rng.random() < p)
+		wumpus = rng.choice(world)
+		visited = [cell for cell in random_walk(rng, width, height, rng.randint(0, 6)) if cell not in pits]
+		if (1, 1) not in visited: visited.insert(0, (1, 1))
+		breezes = dict((cell, bool(pits & neighbourhood(cell[0], cell[1], width, height))) for cell in visited)
+		stenches = dict((cell, wumpus in neighbourhood(cell[0], cell[1], width, height)) for cell in visited)
+
+		grid = wumpus_belief.BeliefGrid(width, height, p)
+		for x, y in visited: grid.observe(x, y, [stenches[(x, y)], breezes[(x, y)], False, False, False])
+		expected_pits = pit_marginals(width, height, visited, breezes, p)
+		expected_wumpus = wumpus_marginals(width, height, visited, stenches)
+		for x, y in wumpus_kb.locations(1, width, 1, height):
+			assert abs(grid.pit_grid()[x - 1, y - 1] - expected_pits[(x, y)]) < 1e-9, (i, x, y)
+			assert abs(grid.wumpus_grid()[x - 1, y - 1] - expected_wumpus[(x, y)]) < 1e-9, (i, x, y)
+
+
+
+def test_components_are_solved_apart():
+	# Two Breezes far apart make two components, each explained by one
+	# location only; a dead Wumpus is no risk.
+	grid = wumpus_belief.BeliefGrid(7, 1, 0.2)
+	for x, breeze in ((1, True), (4, False), (7, True)): grid.observe(x, 1, [False, breeze, False, False, x == 7])
+
+
+	assert [round(value, 12) for value in grid.pit_grid()[:, 0]] == [0.0, 1.0, 0.0, 0.0, 0.0, 1.0, 0.0]
+	assert not grid.wumpus_grid().any()
+	assert grid.least_risky() == ((3, 1), 0.0)
@@ -0,0 +1,63 @@
+# test_wumpus_bench.py
+# --------------------
+# Tests of the benchmark harness (see wumpus_bench.py): its phases must build
+# the same KB, so that their timings compare like with like.
+#
+#	python -m pytest test_wumpus_bench.py
+import json
+
+import wumpus_bench
+import wumpus_kb
+
+
+
+
+#-------------------------------------------------------------------------------
+# KB generation
+#-------------------------------------------------------------------------------
+def test_template_steps_match_generated_steps():
+	reg = wumpus_kb.grid_registry(4, 3)
+
+
+	for t in (0, 1, 15, 16, 40):
+		for x, y, heading in ((1, 1, 'east'), (2, 3, 'south')):
+			assert sorted(wumpus_bench.step_template_clauses(t, x, y, 4, 3, heading, reg)) \
+				== sorted(wumpus_bench.step_clauses(t, x, y, 4, 3, heading, reg))
+
+
+
+def test_generation_phases_count_the_same_kb():
+	rows = wumpus_bench.bench_generation((3, 5), (2, 17), memory=False)
+	clause_rows = {}
+
+
+	assert len(rows) == 2 * 2 * len(wumpus_bench.generation_phases)
+	for row in rows:
+		assert row['wall_time'] == row['initial_time'] + row['step_time'] and row['peak_bytes'] is None
+		if row['phase'] == 'strings':
+			assert row['axioms'] > 0 and row['string_bytes'] > 0 and row['clauses'] is None
+		else:
+			clause_rows.setdefault((row['size'], row['horizon']), set()).add((row['clauses'], row['literals']))
+	assert all(len(counts) == 1 for counts in clause_rows.values())
+
+	kept = wumpus_bench.bench_generation((3,), (2,), ['streams'], keep=True)
+	assert kept[0]['peak_bytes'] > 0 and (kept[0]['clauses'], kept[0]['literals']) in clause_rows[(3, 2)]
+
+
+
+#-------------------------------------------------------------------------------
+# Cardinality encodings and reports
+#-------------------------------------------------------------------------------
+def test_cardinality_rows(tmp_path):
+	rows = wumpus_bench.bench_cardinality((7, 16), backend='python')
+	path = tmp_path / 'cardinality.json'
+
+
+	assert [(row['n'], row['encoding']) for row in rows] == [(n, encoding) for n in (7, 16)
+		for encoding in wumpus_kb.amo_encodings]
+	assert [sum(row['default'] for row in rows if row['n'] == n) for n in (7, 16)] == [1, 1]
+	assert all(row['aux_vars'] == 0 for row in rows if row['encoding'] == 'pairwise')
+
+	wumpus_bench.write_json(str(path), 'cardinality', rows)
+	report = json.loads(path.read_text())
+	assert report['benchmark'] == 'cardinality' and report['rows'] == rows
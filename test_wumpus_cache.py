@@ -0,0 +1,88 @@
+# test_wumpus_cache.py
+# --------------------
+# Tests of the query cache (see wumpus_cache.py): the answers a session takes
+# from a cache shared with other episodes must be those its solver gives.
+#
+#	python -m pytest test_wumpus_cache.py
+import itertools
+
+import wumpus_cache
+import wumpus_session
+
+
+
+
+#-------------------------------------------------------------------------------
+# Scripted episodes
+#
+# The agent stays at 1,1 next to the Wumpus, perceiving a Stench and no
+# Breeze: it either shoots it at time shot (Scream at shot + 1) or turns
+# left instead, so that both episodes have the same evidence at every step.
+#-------------------------------------------------------------------------------
+headings = ['east', 'north', 'west', 'south']
+
+
+
+def play(cache, shot=None, steps=4):
+	"""
+	Returns the safety answers of the whole world at every time step,
+	[{(x, y): True/False/None}].
+	"""
+	session = wumpus_session.KBSession(1, 1, 4, 4, 'east', cache=cache)
+	heading = 0
+	answers = []
+
+
+	for t in range(steps):
+		session.tell_percept(t, [True, False, False, False, shot is not None and t == shot + 1])
+		session.tell_step(t, 1, 1, headings[heading])
+		answers.append(session.ask_all_safety(t))
+		session.tell_action(t, ('Shoot' if t == shot else 'TurnLeft'))
+		if t != shot: heading = (heading + 1) % 4
+
+	return answers
+
+
+
+def test_cached_answers_match_solver_around_scream():
+	episodes = [None, 0, 1, 2]
+	expected = dict((shot, play(None, shot)) for shot in episodes)
+
+
+	# The Wumpus is dead from the Scream on, and its location is then OK.
+	for shot in episodes[1:]:
+		assert [answers[(2, 1)] for answers in expected[shot]] == [None] * (shot + 1) + [True] * (3 - shot)
+	for order in itertools.permutations(episodes):
+		cache = wumpus_cache.QueryCache()
+		for shot in order: assert play(cache, shot) == expected[shot], (order, shot)
+		assert cache.stats['hits'] > 0
+
+
+
+def test_keys_at_scream_are_those_of_a_dead_wumpus():
+	evidence = {(1, 1): (True, False)}
+	keys = lambda t, scream: wumpus_cache.safety_keys([(2, 1)], t, 4, 4, (1, 1), evidence, scream)[(2, 1)]
+
+
+	assert keys(1, 2) == keys(1, None)
+	assert keys(2, 2) == keys(5, 2) != keys(2, None)
+
+
+
+def test_steps_after_a_gap_are_not_cached():
+	# Percepts told for step 5 but not yet for step 3, whose Scream is still
+	# to come: the safety queries of step 5 must not be keyed as if the
+	# Wumpus were alive.
+	session = wumpus_session.KBSession(1, 1, 4, 4, 'east', cache=wumpus_cache.QueryCache())
+	ok = session.var('OK', 2, 1, 5)
+	for t in (0, 1, 2, 4, 5):
+		session.tell_percept(t, [True, False, False, False, False])
+		session.tell_step(t, 1, 1, 'east')
+
+
+	assert session.perceived == 2 and session.cache_keys([session.var('OK', 2, 1, 2), ok]) \
+		== {session.var('OK', 2, 1, 2): wumpus_cache.safety_keys([(2, 1)], 2, 4, 4, (1, 1), session.evidence, None)[(2, 1)]}
+	session.tell_percept(3, [True, False, False, False, True])
+	session.tell_step(3, 1, 1, 'east')
+	assert session.perceived == 5 and session.scream == 3
+	assert session.cache_keys([ok]) == {ok: wumpus_cache.safety_keys([(2, 1)], 5, 4, 4, (1, 1), session.evidence, 3)[(2, 1)]}
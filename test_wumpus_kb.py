@@ -0,0 +1,314 @@
+# test_wumpus_kb.py
+# -----------------
+# Truth-table tests of the clause generators of wumpus_kb against the
+# string axioms they stand for: for every assignment of the propositions an
+# axiom mentions, the axiom is True iff the clauses can be satisfied by some
+# assignment of their Tseitin (and cardinality) auxiliaries.
+#
+#	python -m pytest test_wumpus_kb.py
+import itertools
+import re
+
+import pytest
+
+import sat_solver
+import wumpus_kb
+
+
+
+
+#-------------------------------------------------------------------------------
+# Evaluating string axioms
+#
+# The axioms are in the syntax of AIMA's logic.expr, which borrows Python's
+# operators (and precedence): <=> is written % before evaluating them.
+#-------------------------------------------------------------------------------
+class Value(object):
+	__slots__ = ('value',)
+
+
+	def __init__(self, value):
+		self.value = bool(value)
+
+
+	def __and__(self, other): return Value(self.value and other.value)
+	def __or__(self, other): return Value(self.value or other.value)
+	def __invert__(self): return Value(not self.value)
+	def __rshift__(self, other): return Value(not self.value or other.value)
+	def __lshift__(self, other): return Value(self.value or not other.value)
+	def __mod__(self, other): return Value(self.value == other.value)
+
+
+
+_symbol = re.compile(r'[A-Za-z_][A-Za-z_0-9]*')
+
+
+
+def compile_axiom(axiom):
+	"""
+	(names, evaluate): the propositions axiom mentions, and a function of
+	{name: True/False} giving its truth value.
+	"""
+	source = axiom.replace('<=>', '%')
+	names = sorted(set(_symbol.findall(source)))
+	code = compile(source, '<axiom>', 'eval')
+
+
+	return names, lambda values: eval(code, dict((name, Value(values[name])) for name in names)).value
+
+
+
+def check_equivalent(axiom, clauses, reg):
+	"""
+	Asserts that clauses (over reg) are equivalent to the string axiom once
+	the propositions the axiom doesn't mention are projected out.
+	"""
+	names, evaluate = compile_axiom(axiom)
+	variables = [reg.lookup(name) for name in names]
+	mentioned = set(abs(lit) for clause in clauses for lit in clause)
+	assert mentioned >= set(variables) or not clauses
+	solver = sat_solver.CDCLSolver()
+	for clause in clauses: solver.add_clause(clause)
+
+
+	for values in itertools.product((False, True), repeat=len(names)):
+		assumptions = [(v if value else -v) for v, value in zip(variables, values) if v in mentioned]
+		expected = evaluate(dict(zip(names, values)))
+		assert solver.solve(assumptions) == expected, (axiom, dict(zip(names, values)))
+
+
+
+#-------------------------------------------------------------------------------
+# Generator pairs
+#-------------------------------------------------------------------------------
+def test_percept_and_initial_axioms():
+	reg = wumpus_kb.PropositionRegistry()
+
+
+	for tvec in ([False, True, False, True, True], [True, False, True, False, False]):
+		check_equivalent(wumpus_kb.axiom_generator_percept_sentence(3, tvec),
+			wumpus_kb.clause_generator_percept_sentence(3, tvec, reg), reg)
+	check_equivalent(wumpus_kb.axiom_generator_initial_location_assertions(1, 1),
+		wumpus_kb.clause_generator_initial_location_assertions(1, 1, reg), reg)
+	check_equivalent(wumpus_kb.axiom_generator_only_in_one_location(2, 1, 1, 3, 1, 3, 4),
+		wumpus_kb.clause_generator_only_in_one_location(2, 1, 1, 3, 1, 3, 4, reg), reg)
+	check_equivalent(wumpus_kb.axiom_generator_only_one_heading('south', 2),
+		wumpus_kb.clause_generator_only_one_heading('south', 2, reg), reg)
+	check_equivalent(wumpus_kb.axiom_generator_have_arrow_and_wumpus_alive(0),
+		wumpus_kb.clause_generator_have_arrow_and_wumpus_alive(0, reg), reg)
+
+
+
+def test_pit_and_wumpus_axioms():
+	reg = wumpus_kb.PropositionRegistry()
+
+
+	for x, y in ((1, 1), (2, 1), (2, 2)):
+		check_equivalent(wumpus_kb.axiom_generator_pits_and_breezes(x, y, 1, 4, 1, 4),
+			wumpus_kb.clause_generator_pits_and_breezes(x, y, 1, 4, 1, 4, reg), reg)
+		check_equivalent(wumpus_kb.axiom_generator_wumpus_and_stench(x, y, 1, 4, 1, 4),
+			wumpus_kb.clause_generator_wumpus_and_stench(x, y, 1, 4, 1, 4, reg), reg)
+	check_equivalent(wumpus_kb.axiom_generator_at_least_one_wumpus(1, 3, 1, 3),
+		wumpus_kb.clause_generator_at_least_one_wumpus(1, 3, 1, 3, reg), reg)
+
+
+
+def test_at_most_one_encodings():
+	# Every encoding against the pairwise axiom, which has no auxiliaries.
+	reg = wumpus_kb.PropositionRegistry()
+	pairwise = wumpus_kb.axiom_generator_at_most_one_wumpus(1, 3, 1, 3, 'pairwise')
+
+
+	for encoding in wumpus_kb.amo_encodings:
+		check_equivalent(pairwise, wumpus_kb.clause_generator_at_most_one_wumpus(1, 3, 1, 3, reg, encoding), reg)
+		check_equivalent(wumpus_kb.axiom_generator_only_one_action_axioms(3, 'pairwise'),
+			wumpus_kb.clause_generator_only_one_action_axioms(3, reg, encoding), reg)
+
+
+
+def cnf_clauses(axiom, reg):
+	# The clauses of an axiom written as a conjunction of clauses, e.g.
+	# '(~A|B)&(A|~C)'.
+	lit = lambda name: (-reg.lookup(name[1:]) if name.startswith('~') else reg.lookup(name))
+
+
+	return [tuple(lit(name) for name in clause.strip('()').split('|')) for clause in axiom.split('&')]
+
+
+
+def test_string_generators_default_to_linear_encodings():
+	reg = wumpus_kb.PropositionRegistry()
+
+
+	for axiom in (wumpus_kb.axiom_generator_at_most_one_wumpus(1, 3, 1, 3),
+			wumpus_kb.axiom_generator_only_one_action_axioms(3)):
+		assert '~(' not in axiom
+	check_equivalent(wumpus_kb.axiom_generator_at_most_one_wumpus(1, 3, 1, 3, 'pairwise'),
+		cnf_clauses(wumpus_kb.axiom_generator_at_most_one_wumpus(1, 3, 1, 3), reg), reg)
+	check_equivalent(wumpus_kb.axiom_generator_only_one_action_axioms(3, 'pairwise'),
+		cnf_clauses(wumpus_kb.axiom_generator_only_one_action_axioms(3), reg), reg)
+	assert len(list(wumpus_kb.iter_at_most_one_wumpus_axioms(1, 32, 1, 32))) < 4 * 32 * 32
+
+
+
+def test_per_step_location_axioms():
+	reg = wumpus_kb.PropositionRegistry()
+
+
+	check_equivalent(wumpus_kb.axiom_generator_location_OK(2, 3, 5), wumpus_kb.clause_generator_location_OK(2, 3, 5, reg), reg)
+	check_equivalent(wumpus_kb.axiom_generator_breeze_percept_and_location_property(2, 3, 5),
+		wumpus_kb.clause_generator_breeze_percept_and_location_property(2, 3, 5, reg), reg)
+	check_equivalent(wumpus_kb.axiom_generator_stench_percept_and_location_property(2, 3, 5),
+		wumpus_kb.clause_generator_stench_percept_and_location_property(2, 3, 5, reg), reg)
+
+
+
+def test_successor_state_axioms():
+	reg = wumpus_kb.PropositionRegistry()
+
+
+	check_equivalent(wumpus_kb.axiom_generator_at_location_ssa(4, 2, 2, 1, 4, 1, 4),
+		wumpus_kb.clause_generator_at_location_ssa(4, 2, 2, 1, 4, 1, 4, reg), reg)
+	check_equivalent(wumpus_kb.axiom_generator_have_arrow_ssa(3), wumpus_kb.clause_generator_have_arrow_ssa(3, reg), reg)
+	check_equivalent(wumpus_kb.axiom_generator_wumpus_alive_ssa(3), wumpus_kb.clause_generator_wumpus_alive_ssa(3, reg),
+		reg)
+	for heading in wumpus_kb.headings:
+		check_equivalent(getattr(wumpus_kb, 'axiom_generator_heading_{0}_ssa'.format(heading))(3),
+			getattr(wumpus_kb, 'clause_generator_heading_{0}_ssa'.format(heading))(3, reg), reg)
+		check_equivalent(getattr(wumpus_kb, 'axiom_generator_heading_only_{0}'.format(heading))(3),
+			wumpus_kb.clause_generator_heading_only(heading, 3, reg), reg)
+
+
+
+def test_compact_location_axioms():
+	reg = wumpus_kb.PropositionRegistry()
+
+
+	check_equivalent('&'.join('(' + axiom + ')' for axiom in wumpus_kb.generate_move_axioms(3)),
+		wumpus_kb.generate_move_clauses(3, reg), reg)
+	for x, y in ((1, 1), (2, 2), (3, 2)):
+		check_equivalent(wumpus_kb.axiom_generator_compact_at_location_ssa(3, x, y, 1, 3, 1, 3),
+			wumpus_kb.clause_generator_compact_at_location_ssa(3, x, y, 1, 3, 1, 3, reg), reg)
+
+
+
+#-------------------------------------------------------------------------------
+# Proposition registry
+#-------------------------------------------------------------------------------
+def test_registry_round_trip():
+	reg = wumpus_kb.grid_registry(3, 3)
+	keys = [('P', 2, 3, None), ('L', 1, 1, 4), ('OK', 3, 2, 17), ('Forward', None, None, 4), ('HaveArrow', None, None, 0),
+		('PlanGoal', 2, 0, 5), ('WumpusAlive', None, None, 33)]
+
+
+	ids = [reg.var(*key) for key in keys]
+	assert len(set(ids)) == len(ids)
+	for key, vid in zip(keys, ids):
+		name = wumpus_kb.proposition_str(*key)
+		assert reg.var(*key) == vid and reg.key(vid) == key and reg.key(-vid) == key
+		assert reg.name(vid) == name and reg.lookup(name) == vid
+		assert wumpus_kb.parse_proposition(name) == key
+	assert reg.literal_str(-ids[1]) == '~L1_1_4'
+	assert reg.lookup('B3_3') == reg.var('B', 3, 3)
+
+
+
+def test_retired_steps_are_recycled():
+	reg = wumpus_kb.PropositionRegistry([('L', 1, 1), ('L', 2, 1), ('Forward', None, None)], step_chunk=4)
+	plan = dict((t, reg.var('Plan', None, None, t)) for t in range(12))
+	pit = reg.var('P', 1, 1)
+	before = set(reg.step_base(t) for t in range(12))
+
+
+	reg.retire_steps(9)
+	for t in range(9):
+		if t < 8: assert reg.step_bases[t] is None
+		assert ('Plan', None, None, t) not in reg.ids and plan[t] not in reg.keys
+	assert reg.key(reg.var('L', 2, 1, 9)) == ('L', 2, 1, 9)
+
+	# The two retired chunks go to the next steps, and every live ID still
+	# maps back to its own proposition.
+	count = len(reg)
+	recycled = set(reg.step_base(t) for t in range(12, 20))
+	assert len(reg) == count and recycled == set(base for base in before if base < reg.step_bases[8])
+	live = [('L', x, 1, t) for x in (1, 2) for t in range(8, 20)] + [('Forward', None, None, t) for t in range(8, 20)]
+	live += [('Plan', None, None, t) for t in (9, 10, 11)] + [('P', 1, 1, None)]
+	ids = [reg.var(*key) for key in live]
+	assert len(set(ids)) == len(ids)
+	for key, vid in zip(live, ids):
+		assert reg.key(vid) == key and reg.lookup(reg.name(vid)) == vid
+	assert reg.var('P', 1, 1) == pit and reg.var('Plan', None, None, 10) == plan[10]
+	with pytest.raises(ValueError): reg.step_base(3)
+
+
+
+#-------------------------------------------------------------------------------
+# World geometry
+#-------------------------------------------------------------------------------
+def test_world_geometry_matches_direct_lookups(monkeypatch):
+	# Against the lookups worked out cell by cell, as on maps too big for a
+	# WorldGeometry.
+	bounds = [(1, 4, 1, 3), (0, 2, -1, 1), (1, 1, 1, 1), (2, 5, 3, 3)]
+	headings = wumpus_kb.headings + ['up']
+	geometries = [wumpus_kb.world_geometry(*bound) for bound in bounds]
+
+
+	def lookups(bound):
+		cells = list(wumpus_kb.locations(*bound))
+		return [(wumpus_kb._neighbour_cells(x, y, *bound), [wumpus_kb._forward_cell(x, y, *(bound + (heading,)))
+			for heading in headings]) for x, y in cells]
+
+	dense = [lookups(bound) for bound in bounds]
+	monkeypatch.setattr(wumpus_kb, 'max_geometry_cells', 0)
+	for bound, geometry, expected in zip(bounds, geometries, dense):
+		assert wumpus_kb.world_geometry(*bound) is geometry
+		assert geometry.cells == list(wumpus_kb.locations(*bound))
+		assert [geometry.index[cell] for cell in geometry.cells] == list(range(len(geometry.cells)))
+		assert expected == lookups(bound)
+		assert [geometry.neighbour_cells(i) for i in range(len(geometry.cells))] == [cells for cells, forward in expected]
+		assert [[geometry.forward_cell(x, y, heading) for heading in headings] for x, y in geometry.cells] \
+			== [forward for cells, forward in expected]
+	assert geometries[0].forward_cell(4, 2, 'east') is None and geometries[0].forward_cell(9, 9, 'east') is None
+
+
+
+def test_cell_ids_are_cached_per_registry():
+	geometry = wumpus_kb.world_geometry(1, 3, 1, 2)
+	regs = [wumpus_kb.grid_registry(3, 2), wumpus_kb.grid_registry(3, 2)]
+	regs[1].var('Plan', None, None, 0)
+
+
+	for reg in regs:
+		ids = geometry.cell_ids('W', reg)
+		assert list(ids) == [reg.var('W', x, y) for x, y in geometry.cells]
+		assert geometry.cell_ids('W', reg) is ids and geometry.cell_ids('P', reg) is not ids
+	assert geometry.cell_ids('P', regs[0]) is not geometry.cell_ids('P', regs[1])
+
+
+
+#-------------------------------------------------------------------------------
+# Time templates
+#-------------------------------------------------------------------------------
+def test_templates_match_direct_generation():
+	# Steps within a chunk, across chunk boundaries (whose blocks stop being
+	# adjacent once other IDs are allocated in between), and after retired
+	# chunks are reused; on the dense layout and the sparse one, where OK
+	# and L have no slots.
+	generators = [(wumpus_kb.generate_non_location_ssa_clauses, (), {}),
+		(wumpus_kb.generate_mutually_exclusive_clauses, (), {}),
+		(wumpus_kb.generate_mutually_exclusive_clauses, (), {'encoding': 'pairwise'}),
+		(wumpus_kb.generate_square_OK_clauses, (1, 4, 1, 3), {}),
+		(wumpus_kb.generate_breeze_percept_and_location_clauses, (1, 4, 1, 3), {}),
+		(wumpus_kb.generate_stench_percept_and_location_clauses, (1, 4, 1, 3), {'cells': frozenset([(1, 1), (2, 1)])}),
+		(wumpus_kb.generate_full_at_location_ssa_clauses, (1, 4, 1, 3), {})]
+
+
+	for sparse in (False, True):
+		reg = wumpus_kb.PropositionRegistry(wumpus_kb.step_proposition_slots(4, 3, sparse=sparse), step_chunk=4)
+		for t in (0, 2, 3, 5, 7, 13, 15, 20, 22, 23):
+			if t == 13: reg.retire_steps(12)
+			for generator, args, kwargs in generators:
+				template = wumpus_kb.time_template(generator, *args, reg=reg, **kwargs)
+				direct = generator(t, *args, reg=reg, **kwargs)
+				assert sorted(template.instantiate(t)) == sorted(direct), (sparse, t, generator.__name__)
+				reg.var('Plan', None, None, t)
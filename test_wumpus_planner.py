@@ -0,0 +1,107 @@
+# test_wumpus_planner.py
+# ----------------------
+# Tests of the safe route planner (see wumpus_planner.py) against
+# breadth-first search over (x, y, heading) states on random safe sets: its
+# routes must be valid, stay on safe locations and be shortest, cached or
+# not.
+#
+#	python -m pytest test_wumpus_planner.py
+import collections
+import random
+
+import wumpus_kb
+import wumpus_planner
+
+
+
+
+#-------------------------------------------------------------------------------
+# Brute force
+#-------------------------------------------------------------------------------
+def shortest_length(planner, x, y, heading, goals):
+	# Breadth-first search with the same moves; None if no goal is reached.
+	start = ((x, y), wumpus_kb.headings.index(heading))
+	goals = set(goal for goal in goals if goal in planner.safe)
+	lengths = {start: 0}
+	queue = collections.deque([start])
+
+
+	if not goals: return None
+	while queue:
+		state = queue.popleft()
+		cell, heading = state
+		if cell in goals: return lengths[state]
+		nxt = planner.forward(cell, heading)
+		for succ in (((nxt, heading) if nxt in planner.safe else None), (cell, (heading - 1) % 4), (cell, (heading + 1) % 4)):
+			if succ is not None and succ not in lengths:
+				lengths[succ] = lengths[state] + 1
+				queue.append(succ)
+
+	return None
+
+
+
+def follow(planner, x, y, heading, route):
+	# The location and heading a route ends in, checking each move is safe.
+	cells = planner.route_cells(x, y, heading, route)
+	heading = wumpus_kb.headings.index(heading)
+
+
+	assert all(cell in planner.safe for cell in cells)
+	assert len(cells) == route.count('Forward')
+	heading = (heading + route.count('TurnRight') - route.count('TurnLeft')) % 4
+
+	return (cells[-1] if cells else (x, y)), heading
+
+
+
+#-------------------------------------------------------------------------------
+# Routes
+#-------------------------------------------------------------------------------
+def test_routes_are_shortest_and_safe():
+	rng = random.Random(5)
+
+
+	for i in range(200):
+		width, height = rng.randint(1, 6), rng.randint(1, 6)
+		planner = wumpus_planner.SafeRoutePlanner(width, height)
+		cells = list(wumpus_kb.locations(1, width, 1, height))
+		planner.add_safe(rng.sample(cells, rng.randint(1, len(cells))) + [(0, 1), (width + 1, height)])
+		assert all(planner.inside(*cell) for cell in planner.safe)
+		x, y = rng.choice(cells)
+		heading = rng.choice(wumpus_kb.headings)
+		goals = rng.sample(cells, rng.randint(1, min(3, len(cells))))
+
+		route = planner.plan(x, y, heading, goals)
+		expected = shortest_length(planner, x, y, heading, goals)
+		assert (route is None) == (expected is None), (i, route, expected)
+		if route is not None:
+			assert len(route) == expected
+			end, end_heading = follow(planner, x, y, heading, route)
+			assert end in goals and end in planner.safe
+			# Asking again from any state along the route follows the rest of it.
+			cell, h = (x, y), wumpus_kb.headings.index(heading)
+			for i, action in enumerate(route):
+				assert planner.plan(cell[0], cell[1], wumpus_kb.headings[h], goals) == route[i:]
+				if action == 'Forward': cell = planner.forward(cell, h)
+				else: h = (h + (1 if action == 'TurnRight' else -1)) % 4
+			assert (cell, h) == (end, end_heading)
+
+
+
+def test_route_cache_follows_the_safe_set():
+	planner = wumpus_planner.SafeRoutePlanner(4, 1)
+	planner.add_safe([(1, 1), (2, 1), (3, 1)])
+
+
+	assert planner.plan(1, 1, 'east', [(3, 1)]) == ['Forward', 'Forward']
+	assert planner.plan(2, 1, 'east', [(3, 1)]) == ['Forward'] and planner.stats['searches'] == 1
+	assert planner.plan(3, 1, 'west', [(3, 1)]) == []
+	assert planner.plan(1, 1, 'north', [(4, 1)]) is None
+
+	planner.remove_safe([(2, 1)])
+	assert planner.plan(1, 1, 'east', [(3, 1)]) is None
+	planner.update({(2, 1): True, (4, 1): True, (3, 1): None})
+	assert planner.plan(1, 1, 'north', [(4, 1)]) == ['TurnRight', 'Forward', 'Forward', 'Forward']
+	planner.update({(3, 1): False})
+	assert planner.plan(1, 1, 'north', [(4, 1)]) is None and planner.stats['invalidations'] == 3
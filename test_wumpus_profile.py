@@ -0,0 +1,84 @@
+# test_wumpus_profile.py
+# ----------------------
+# Tests of the opt-in instrumentation (see wumpus_profile.py): enabling it
+# must not change what is generated or compiled, its counters must agree
+# with the sessions' own, and disabling it must put everything back.
+#
+#	python -m pytest test_wumpus_profile.py
+import json
+
+import sat_solver
+import wumpus_kb
+import wumpus_profile
+import wumpus_session
+import wumpus_world
+
+
+
+
+#-------------------------------------------------------------------------------
+# Instrumentation
+#-------------------------------------------------------------------------------
+def test_disable_restores_the_originals():
+	originals = (wumpus_kb.generate_square_OK_clauses, wumpus_kb.TimeTemplate.instantiate, wumpus_session.KBSession.tell,
+		wumpus_session.KBSession.tell_step, sat_solver.CDCLSolver.solve)
+
+
+	with wumpus_profile.profiling() as profiler:
+		assert wumpus_profile.profiler is profiler
+		assert wumpus_kb.generate_square_OK_clauses is not originals[0]
+		assert wumpus_kb.generate_square_OK_clauses.__wrapped__ is originals[0]
+	assert wumpus_profile.profiler is None
+	assert (wumpus_kb.generate_square_OK_clauses, wumpus_kb.TimeTemplate.instantiate, wumpus_session.KBSession.tell,
+		wumpus_session.KBSession.tell_step, sat_solver.CDCLSolver.solve) == originals
+
+
+
+def test_templates_compiled_before_profiling_are_reused():
+	reg = wumpus_kb.grid_registry(4, 4)
+	expected = wumpus_kb.generate_step_clauses_from_templates(1, 1, 4, 1, 4, reg)
+	templates = dict(reg.templates)
+
+
+	with wumpus_profile.profiling() as profiler:
+		assert wumpus_kb.generate_step_clauses_from_templates(1, 1, 4, 1, 4, reg) == expected
+	assert reg.templates == templates
+	assert profiler.generators['TimeTemplate.instantiate']['calls'] == len(templates)
+	assert 'generate_square_OK_clauses' not in profiler.generators
+
+
+
+def test_iterators_are_counted_as_consumed():
+	reg = wumpus_kb.grid_registry(3, 3)
+	expected = list(wumpus_kb.iter_pit_and_breeze_clauses(1, 3, 1, 3, reg))
+
+
+	with wumpus_profile.profiling() as profiler:
+		assert list(wumpus_kb.iter_pit_and_breeze_clauses(1, 3, 1, 3, reg)) == expected
+	stats = profiler.generators['iter_pit_and_breeze_clauses']
+	assert (stats['calls'], stats['clauses'], stats['literals']) == (1, len(expected), sum(map(len, expected)))
+
+
+
+#-------------------------------------------------------------------------------
+# Episodes
+#-------------------------------------------------------------------------------
+def test_episode_counters_agree_with_the_session(tmp_path):
+	with wumpus_profile.profiling(trace=True, step_budget=0.0) as profiler:
+		world, agent = wumpus_world.new_episode(4, 4, 6, backend='python')
+		wumpus_world.run_episode(world, agent, 10)
+	session = agent.session
+	stats = profiler.stats()
+
+
+	assert stats['solves']['calls'] == session.solver.stats['solves'] == sum(stats['solves']['histogram'].values())
+	assert stats['solves']['sat'] + stats['solves']['unsat'] == stats['solves']['calls']
+	assert sorted(map(int, stats['steps'])) == sorted(session.states)
+	assert stats['step_summary']['over_budget'] == sorted(session.states)
+	assert stats['sessions']['ask_all']['calls'] > 0
+
+	path = tmp_path / 'trace.json'
+	profiler.export_chrome_trace(str(path))
+	events = json.loads(path.read_text())['traceEvents']
+	assert len(events) > 0 and set(event['cat'] for event in events) >= set(['generate', 'session', 'step', 'solve'])
+	assert json.loads(json.dumps(stats)) == stats
@@ -0,0 +1,134 @@
+# test_wumpus_satplan.py
+# ----------------------
+# Tests of SATPlan over a KB session (see wumpus_satplan.py): plans must be
+# as short as the safe routes of wumpus_planner, which make the same moves
+# through the same locations, and what planning adds to the session's
+# solver must be true or guarded.
+#
+#	python -m pytest test_wumpus_satplan.py
+import random
+
+import wumpus_kb
+import wumpus_satplan
+import wumpus_world
+
+
+
+
+#-------------------------------------------------------------------------------
+# Episodes
+#-------------------------------------------------------------------------------
+def planned_episode(seed, check, max_steps=30):
+	"""
+	Plays the seeded episode of an agent, calling check(agent, satplanner,
+	t) at each step once the agent has decided its action, and before the
+	KB is told of it.
+	"""
+	world, agent = wumpus_world.new_episode(4, 4, seed, backend='python')
+	session = agent.session
+	satplanner = wumpus_satplan.SATPlanner(session)
+
+
+	while not world.done and agent.t < max_steps:
+		t, percept = agent.t, world.percept()
+		session.tell_percept(t, percept)
+		session.tell_step(t, agent.x, agent.y, agent.heading)
+		action = agent.decide(percept, ([] if percept[2] and not agent.have_gold else agent.safe_neighbours()))
+		check(agent, satplanner, t)
+		session.tell_action(t, action)
+		agent.advance(action)
+		world.execute(action)
+
+	return satplanner
+
+
+
+def answers(session, t):
+	cells = [(x, y) for x in range(1, session.width + 1) for y in range(1, session.height + 1)]
+
+
+	return session.ask_all(session.var(base, x, y, t) for base in ('L', 'OK') for x, y in cells)
+
+
+
+#-------------------------------------------------------------------------------
+# Plans
+#-------------------------------------------------------------------------------
+def test_plans_are_as_short_as_safe_routes():
+	rng = random.Random(8)
+	compared = []
+
+
+	def check(agent, satplanner, t):
+		planner = agent.planner
+		for goal in rng.sample(sorted(planner.safe), min(3, len(planner.safe))) + [(4, 4)]:
+			route = planner.plan(agent.x, agent.y, agent.heading, [goal])
+			plan = satplanner.plan(t, wumpus_satplan.location_goal(goal), planner.safe)
+			assert (plan is None) == (route is None), (t, goal, plan, route)
+			if plan is not None:
+				cells = planner.route_cells(agent.x, agent.y, agent.heading, plan)
+				assert len(plan) == len(route) and (cells[-1] if cells else (agent.x, agent.y)) == goal
+				assert all(cell in planner.safe for cell in cells)
+			compared.append(goal)
+
+	for seed in (0, 5, 6):
+		assert planned_episode(seed, check).stats['found'] > 0
+	assert len(compared) > 40
+
+
+
+def test_planning_adds_only_transition_axioms_and_guarded_clauses():
+	# The start the plans are pinned to, the restrictions on the moves and
+	# the goals are all guarded: only the transition axioms unrolled are
+	# facts, true ones, which may decide more queries but never change an
+	# answer.
+	guard_bases = set(['PlanStart', 'PlanStep', 'PlanAvoid', 'PlanGoal'])
+
+
+	def check(agent, satplanner, t):
+		session = agent.session
+		added = []
+		satplanner.add_clauses = lambda clauses: added.extend(clauses) or wumpus_satplan.SATPlanner.add_clauses(satplanner,
+			clauses)
+		before = answers(session, t)
+		satplanner.plan(t, wumpus_satplan.location_goal(agent.start), agent.planner.safe)
+		satplanner.plan(t, wumpus_satplan.climb_goal(*agent.start), agent.planner.safe)
+		after = answers(session, t)
+
+		transition = set()
+		for s in satplanner.unrolled:
+			for generator, args in ((wumpus_kb.generate_non_location_ssa_clauses, ()),
+					(wumpus_kb.generate_mutually_exclusive_clauses, ()),
+					(wumpus_kb.generate_full_at_location_ssa_clauses, (1, session.width, 1, session.height))):
+				transition.update(tuple(clause) for clause in generator(s, *args, reg=session.reg))
+		for clause in added:
+			assert tuple(clause) in transition or any(lit < 0 and session.reg.key(lit)[0] in guard_bases for lit in clause)
+		assert all(after[lit] == answer for lit, answer in before.items() if answer is not None)
+		for x, y in wumpus_kb.locations(1, session.width, 1, session.height):
+			assert after[session.var('L', x, y, t)] in (None, (x, y) == (agent.x, agent.y))
+
+	for seed in (0, 6):
+		planned_episode(seed, check)
+
+
+
+def test_assumptions_are_one_per_guard():
+	# The start, then one restriction guard and one avoidance guard per step
+	# of the horizon, then the goal; and the default horizon only covers
+	# the safe locations the agent can reach.
+	sizes = []
+
+
+	def check(agent, satplanner, t):
+		if t != 4: return
+		solver = agent.session.solver
+		solve = solver.solve
+		solver.solve = lambda assumptions=(): sizes.append(len(assumptions)) or solve(assumptions)
+		assert satplanner.plan(t, wumpus_satplan.location_goal((4, 4)), agent.planner.safe) is None
+		assert satplanner.plan(t, wumpus_satplan.location_goal((4, 4)), [(agent.x, agent.y)]) is None
+		del solver.solve
+		reachable = satplanner.reachable((agent.x, agent.y), agent.planner.safe)
+		assert sizes == [2 + 2 * k for k in range(3 * len(reachable) - 2)] + [2]
+
+	planned_episode(0, check, 5)
+	assert sizes
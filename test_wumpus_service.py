@@ -0,0 +1,83 @@
+# test_wumpus_service.py
+# ----------------------
+# Tests of the asyncio agent service (see wumpus_service.py).
+#
+#	python -m pytest test_wumpus_service.py
+import asyncio
+
+import wumpus_service
+
+
+
+
+#-------------------------------------------------------------------------------
+# Session options
+#-------------------------------------------------------------------------------
+def test_sparse_sessions_skip_static_clauses():
+	async def run():
+		service = wumpus_service.AgentService(8, 8, max_workers=1, sparse=True)
+		try:
+			session = await service.open(0, 1, 1)
+			await service.tell_step(0, 0, [None, None, None, None, None], 1, 1, 'east')
+			return service.static, session.sparse, await service.ask_safety(0, 0, [(1, 1), (2, 1)])
+		finally:
+			service.shutdown()
+
+
+	static, sparse, answers = asyncio.run(run())
+	assert static is None and sparse
+	assert answers == {(1, 1): True, (2, 1): True}
+
+
+
+#-------------------------------------------------------------------------------
+# Coalescing and backpressure
+#-------------------------------------------------------------------------------
+async def open_agent(service):
+	# Agent 0 at 1,1 on a map with no percepts at step 0, so that the cells
+	# next to it are OK.
+	await service.open(0, 1, 1)
+	await service.tell_step(0, 0, [None, None, None, None, None], 1, 1, 'east')
+
+
+
+def test_concurrent_queries_share_one_dispatch():
+	async def run():
+		service = wumpus_service.AgentService(4, 4, max_workers=2)
+		try:
+			await open_agent(service)
+			answers = await asyncio.gather(service.ask_safety(0, 0, [(1, 1)]), service.ask_safety(0, 0, [(2, 1)]),
+				service.ask_safety(0, 0, [(1, 2), (3, 3)]))
+			return answers, dict(service.stats)
+		finally:
+			service.shutdown()
+
+
+	answers, stats = asyncio.run(run())
+	assert answers == [{(1, 1): True}, {(2, 1): True}, {(1, 2): True, (3, 3): None}]
+	assert stats['dispatched'] == 1 and stats['coalesced'] == 2
+
+
+
+def test_pending_limit_makes_callers_wait():
+	async def run():
+		service = wumpus_service.AgentService(4, 4, max_workers=2, max_pending=1)
+		try:
+			await open_agent(service)
+			# Holding the agent's lock keeps the first query in flight.
+			async with service.agents[0].lock:
+				first = asyncio.ensure_future(service.ask_safety(0, 0, [(1, 1)]))
+				second = asyncio.ensure_future(service.ask_safety(0, 0, [(2, 1)]))
+				for i in range(5): await asyncio.sleep(0)
+				waiting = (service.pending.locked(), first.done(), second.done(), service.stats['coalesced'])
+			return waiting, await first, await second, dict(service.stats)
+		finally:
+			service.shutdown()
+
+
+	waiting, first, second, stats = asyncio.run(run())
+	# The second query couldn't join the first one's batch: it waited for
+	# the first to finish, then was dispatched on its own.
+	assert waiting == (True, False, False, 0)
+	assert first == {(1, 1): True} and second == {(2, 1): True}
+	assert stats['dispatched'] == 2 and stats['coalesced'] == 0
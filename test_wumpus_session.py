@@ -0,0 +1,138 @@
+# test_wumpus_session.py
+# ----------------------
+# Regression tests of the KBSession modes (see wumpus_session.py): over
+# whole episodes on seeded random maps, a session in a restricted mode must
+# answer the same queries as one holding every axiom.
+#
+#	python -m pytest test_wumpus_session.py
+import pytest
+
+import sat_solver
+import wumpus_kb
+import wumpus_world
+
+
+
+
+#-------------------------------------------------------------------------------
+# Comparing sessions
+#-------------------------------------------------------------------------------
+def compare_episodes(width, height, seeds, max_steps=40, stronger=False, **kwargs):
+	"""
+	Plays each seeded episode with an agent over a full session, telling a
+	KBSession(**kwargs) the same percepts, steps and actions, and asserts
+	that both answer the safety (OK) and location (L) queries of every
+	location alike at every step.  Returns the number of answers compared.
+
+	stronger := the other session may also decide queries the full one
+		leaves unknown (compaction asserts the whole location fluent of the
+		step it compacts at, which the local SSAs leave open far from the
+		agent); default=False
+	"""
+	compared = 0
+
+
+	for seed in seeds:
+		world, agent = wumpus_world.new_episode(width, height, seed)
+		other = wumpus_world.new_episode(width, height, seed, **kwargs)[1].session
+		cells = [(x, y) for x in range(1, width + 1) for y in range(1, height + 1)]
+		while not world.done and agent.t < max_steps:
+			t, percept = agent.t, world.percept()
+			action = agent.step(percept)
+			other.tell_percept(t, percept)
+			other.tell_step(t, *agent.session.states[t])
+			other.tell_action(t, action)
+			for base in ('OK', 'L'):
+				full = agent.session.ask_all(agent.session.var(base, x, y, t) for x, y in cells)
+				answers = other.ask_all(other.var(base, x, y, t) for x, y in cells)
+				for x, y in cells:
+					expected, answer = full[agent.session.var(base, x, y, t)], answers[other.var(base, x, y, t)]
+					assert answer == expected or stronger and expected is None, (seed, t, base, x, y, expected, answer)
+				compared += len(cells)
+			world.execute(action)
+
+	return compared
+
+
+
+#-------------------------------------------------------------------------------
+# Frontier mode
+#-------------------------------------------------------------------------------
+def test_frontier_answers_match_full_generation():
+	assert compare_episodes(4, 4, range(12), frontier=True) > 0
+
+
+
+def test_lazy_frontier_answers_match_full_generation():
+	assert compare_episodes(5, 5, range(12, 20), lazy=True, frontier=True) > 0
+
+
+
+#-------------------------------------------------------------------------------
+# Compaction
+#-------------------------------------------------------------------------------
+backends = ['python', pytest.param('native', marks=pytest.mark.skipif(not sat_solver.native_available(),
+	reason='python-sat is not installed'))]
+
+
+
+@pytest.mark.parametrize('backend', backends)
+def test_compacted_answers_match_full_kb(backend):
+	assert compare_episodes(4, 4, range(20, 32), backend=backend, window=3, stronger=True) > 0
+	assert compare_episodes(5, 5, range(32, 38), backend=backend, window=2, lazy=True, frontier=True,
+		stronger=True) > 0
+
+
+
+def test_compaction_does_not_depend_on_root_propagation(monkeypatch):
+	# What a solver fixes by unit propagation is only a shortcut: the facts
+	# compaction keeps must hold without it.
+	monkeypatch.setattr(sat_solver.CDCLSolver, 'root_literals', lambda solver: [])
+
+
+	assert compare_episodes(4, 4, range(20, 32), backend='python', window=3, stronger=True) > 0
+
+
+
+#-------------------------------------------------------------------------------
+# Frontier layout
+#-------------------------------------------------------------------------------
+def test_frontier_sessions_allocate_location_fluents_on_demand():
+	# The OK and L of a step get IDs as the frontier uses them, rather than
+	# 2 per location of the map at every step.
+	world, agent = wumpus_world.new_episode(16, 16, 4, pit_prob=0.05, backend='python', frontier=True)
+	while not world.done and agent.t < 40: world.execute(agent.step(world.percept()))
+	session = agent.session
+
+
+	located = [key for key in session.reg.ids if key[0] in ('L', 'OK') and key[3] is not None]
+	assert agent.t == 40 and ('L', 1, 1) not in session.reg.slots
+	assert 0 < len(located) <= 2 * len(session.frontier) * (agent.t + 1)
+	assert session.solver.nvars < 2 * 16 * 16 * agent.t // 4
+
+
+
+#-------------------------------------------------------------------------------
+# Root fast path
+#-------------------------------------------------------------------------------
+@pytest.mark.parametrize('backend', backends)
+def test_unit_propagation_answers_location_queries(backend):
+	# The initial state and the actions told are unit facts, and the SSAs
+	# carry them forward: the location and heading of every step are fixed
+	# by unit propagation alone, with no solve.
+	world, agent = wumpus_world.new_episode(4, 4, 6, backend=backend)
+	session = agent.session
+	asked = 0
+
+
+	while not world.done and agent.t < 20:
+		t = agent.t
+		action = agent.step(world.percept())
+		x, y, heading = session.states[t]
+		heading_lit = session.var(wumpus_kb.heading_bases[wumpus_kb.headings.index(heading)], t=t)
+		solves, roots = session.solve_count, session.root_count
+		assert session.ask(session.var('L', x, y, t)) is True and session.ask(heading_lit) is True
+		assert (session.solve_count, session.root_count) == (solves, roots + 2)
+		asked += 2
+		world.execute(action)
+	assert asked >= 8
@@ -0,0 +1,104 @@
+# test_wumpus_snapshot.py
+# -----------------------
+# Tests of the KB snapshot format (see wumpus_snapshot.py): clauses and names
+# must read back as written, across appended segments, and damaged files
+# must fail loudly.
+#
+#	python -m pytest test_wumpus_snapshot.py
+import io
+import os
+
+import pytest
+
+import wumpus_kb
+import wumpus_snapshot
+
+
+
+
+#-------------------------------------------------------------------------------
+# Round trips
+#-------------------------------------------------------------------------------
+def kb_segments(reg):
+	# Atemporal axioms, then the axioms of steps 0 and 1.
+	return [(None, wumpus_kb.generate_pit_and_breeze_clauses(1, 4, 1, 4, reg))] \
+		+ [(t, wumpus_kb.generate_step_clauses_from_templates(t, 1, 4, 1, 4, reg)) for t in (0, 1)]
+
+
+
+def test_clauses_and_names_read_back(tmp_path):
+	reg = wumpus_kb.grid_registry(4, 4)
+	segments = kb_segments(reg)
+	path = str(tmp_path / 'kb.wkbs')
+	clauses = [tuple(clause) for t, step in segments for clause in step]
+
+
+	with wumpus_snapshot.SnapshotWriter(path, reg) as writer:
+		writer.write(segments[0][1])
+	for t, step in segments[1:]:
+		with wumpus_snapshot.SnapshotWriter(path, reg, append=True) as writer: writer.write(step, t)
+
+	with wumpus_snapshot.Snapshot(path) as snapshot:
+		assert list(snapshot) == clauses and len(snapshot) == len(clauses)
+		assert [snapshot.clause(i) for i in (0, len(clauses) // 2, len(clauses) - 1)] \
+			== [clauses[0], clauses[len(clauses) // 2], clauses[-1]]
+		assert snapshot.steps() == [(t, len(step)) for t, step in segments]
+		names = snapshot.names()
+		assert names == dict((abs(lit), reg.name(abs(lit))) for clause in clauses for lit in clause)
+		assert snapshot.nvars == max(names)
+		assert snapshot.solver('python').solve()
+		with pytest.raises(IndexError): snapshot.clause(len(clauses))
+
+
+
+def pits(reg):
+	return [reg.var('P', x, y) for x, y in ((1, 2), (2, 1), (2, 2))]
+
+
+
+def test_dimacs_export(tmp_path):
+	reg = wumpus_kb.grid_registry(2, 2)
+	p, q, r = pits(reg)
+	path = str(tmp_path / 'kb.wkbs')
+	wumpus_snapshot.save_snapshot(path, [(p, -q), (q,), (-p, q, r)], reg, 0)
+	out = io.StringIO()
+
+
+	with wumpus_snapshot.Snapshot(path) as snapshot: snapshot.to_dimacs(out)
+	assert out.getvalue() == ''.join('c {0} {1}\n'.format(v, reg.name(v)) for v in sorted((p, q, r))) \
+		+ 'p cnf {0} 3\n{1} -{2} 0\n{2} 0\n-{1} {2} {3} 0\n'.format(max(p, q, r), p, q, r)
+
+
+
+#-------------------------------------------------------------------------------
+# Empty and damaged files
+#-------------------------------------------------------------------------------
+def test_empty_file_is_an_empty_snapshot(tmp_path):
+	reg = wumpus_kb.grid_registry(2, 2)
+	p = pits(reg)[0]
+	path = str(tmp_path / 'kb.wkbs')
+	open(path, 'wb').close()
+
+
+	with wumpus_snapshot.Snapshot(path) as snapshot:
+		assert len(snapshot) == 0 and list(snapshot) == [] and snapshot.names() == {}
+	with wumpus_snapshot.SnapshotWriter(path, reg, append=True) as writer: writer.write([(p,)])
+	with wumpus_snapshot.Snapshot(path) as snapshot: assert list(snapshot) == [(p,)]
+
+
+
+def test_truncated_files_raise(tmp_path):
+	reg = wumpus_kb.grid_registry(2, 2)
+	p, q, r = pits(reg)
+	path = str(tmp_path / 'kb.wkbs')
+	wumpus_snapshot.save_snapshot(path, [(p, -q), (q,)], reg)
+	with open(path, 'rb') as f: data = f.read()
+
+
+	# Cut inside the file header, a segment header and a segment payload.
+	for size in (6, len(data) - 30, len(data) - 4):
+		with open(path, 'wb') as f: f.write(data[:size])
+		with pytest.raises(ValueError, match='truncated'): wumpus_snapshot.Snapshot(path)
+	with open(path, 'wb') as f: f.write(b'XXXX' + data[4:])
+	with pytest.raises(ValueError, match='not a KB snapshot'): wumpus_snapshot.Snapshot(path)
+	os.remove(path)
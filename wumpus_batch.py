@@ -0,0 +1,253 @@
+# wumpus_batch.py
+# ---------------
+# Runs many wumpus episodes (see wumpus_world) across a pool of worker
+# processes.
+#
+# Every episode on a map of a given size starts from the same static axioms
+# (wumpus_kb.static_wumpus_clauses); only the initial state clauses differ.
+# The static clauses are generated once, in the parent, and put in a
+# shared memory block as flat int32 arrays (clause offsets, then literals),
+# which the workers map read-only instead of regenerating them.  What is
+# shared is their generation and one copy of them: the sessions only refer
+# to the block, but each episode's solver still loads them into its own
+# clause database.  Episodes
+# are independent, so throughput scales with the number of processes.  With
+# a cache file, the workers share answers to safety queries through it (see
+# wumpus_cache), across batches too.
+#
+# Usage:
+#	python wumpus_batch.py WIDTH HEIGHT EPISODES [--processes N] [--max-steps N] [--cache FILE] [--json FILE]
+import argparse
+import array
+import collections
+import json
+import multiprocessing
+import sys
+import time
+from multiprocessing import shared_memory
+from multiprocessing import util
+
+import wumpus_cache
+import wumpus_kb
+import wumpus_world
+
+
+
+
+#-------------------------------------------------------------------------------
+# Shared static clauses
+#-------------------------------------------------------------------------------
+class SharedClauses(object):
+	"""
+	Clauses held in a shared memory block: uint32 offsets[count + 1], then
+	int32 literals[offsets[count]]; clause i is literals[offsets[i]:offsets[i + 1]].
+
+	SharedClauses(clauses) creates the block, SharedClauses.attach(name,
+	count) maps an existing one (e.g. in a worker process).
+	"""
+	def __init__(self, clauses):
+		clauses = list(clauses)
+		offsets = array.array('I', [0])
+		for clause in clauses: offsets.append(offsets[-1] + len(clause))
+		literals = array.array('i', [lit for clause in clauses for lit in clause])
+		size = 4 * (len(offsets) + len(literals))
+
+
+		shm = shared_memory.SharedMemory(create=True, size=size)
+		shm.buf[:size] = offsets.tobytes() + literals.tobytes()
+		self.map(shm, len(clauses), True)
+
+
+	@classmethod
+	def attach(cls, name, count):
+		clauses = cls.__new__(cls)
+		clauses.map(shared_memory.SharedMemory(name=name), count, False)
+
+		return clauses
+
+
+	def map(self, shm, count, owner):
+		self.shm = shm
+		self.name = shm.name
+		self.count = count
+		self.owner = owner
+
+
+		self.offsets = shm.buf[:4 * (count + 1)].cast('I')
+		self.literals = shm.buf[4 * (count + 1):4 * (count + 1 + self.offsets[count])].cast('i')
+
+
+	def __len__(self):
+		return self.count
+
+
+	def __iter__(self):
+		offsets, literals = self.offsets, self.literals
+
+
+		for i in range(self.count):
+			yield tuple(literals[offsets[i]:offsets[i + 1]])
+
+
+	def close(self):
+		self.offsets.release()
+		self.literals.release()
+		self.shm.close()
+		if self.owner: self.shm.unlink()
+
+
+
+class StaticKB(object):
+	"""
+	The static clauses of a width x height map, generated once and shared
+	(see wumpus_kb.static_wumpus_clauses), with the registry they are over.
+
+	frontier := lay the registry out for frontier sessions (see
+		wumpus_kb.step_proposition_slots); default=False
+	"""
+	def __init__(self, width, height, frontier=False):
+		self.width = width
+		self.height = height
+		self.reg = wumpus_kb.grid_registry(width, height, sparse=frontier)
+		self.clauses = SharedClauses(wumpus_kb.static_wumpus_clauses(width, height, self.reg))
+
+
+	def spec(self):
+		"""
+		What a worker needs to attach: the registry is small and pickled, the
+		clauses stay in shared memory.
+		"""
+		return (self.width, self.height, self.reg, self.clauses.name, len(self.clauses))
+
+
+	def close(self):
+		self.clauses.close()
+
+
+
+#-------------------------------------------------------------------------------
+# Workers
+#-------------------------------------------------------------------------------
+_worker = {}
+
+
+
+def _init_worker(spec, options, finalize=True):
+	# In a pool worker, _close_worker runs when the worker exits (see
+	# run_batch); in this process, the caller runs it.
+	width, height, reg, name, count = spec
+	clauses = SharedClauses.attach(name, count)
+
+
+	_worker.update(width=width, height=height, static=(reg, clauses), options=dict(options))
+	if options.get('cache') is not None: _worker['options']['cache'] = wumpus_cache.QueryCache(options['cache'])
+	if finalize: util.Finalize(None, _close_worker, exitpriority=10)
+
+
+
+def _run_seed(seed):
+	options = dict(_worker['options'])
+	max_steps = options.pop('max_steps')
+	pit_prob = options.pop('pit_prob')
+
+
+	world, agent = wumpus_world.new_episode(_worker['width'], _worker['height'], seed, pit_prob,
+		_worker['static'], **options)
+	stats = wumpus_world.run_episode(world, agent, max_steps)
+	stats['seed'] = seed
+
+	return stats
+
+
+
+def _close_worker():
+	if 'static' in _worker: _worker.pop('static')[1].close()
+	cache = _worker.pop('options', {}).get('cache')
+	if cache is not None: cache.close()
+
+
+
+#-------------------------------------------------------------------------------
+# Batches
+#-------------------------------------------------------------------------------
+def run_batch(width, height, seeds, processes=None, max_steps=200, pit_prob=0.2, chunksize=None, cache=None, **kwargs):
+	"""
+	Runs one episode per seed on random width x height worlds and returns
+	the list of their stats (see wumpus_world.run_episode), in seed order.
+
+	processes := number of worker processes; default=os.cpu_count(), and 1
+		runs the episodes in this process
+	cache := path of a wumpus_cache.QueryCache file shared by the workers;
+		default=None
+	kwargs := passed on to KBSession (e.g. backend, window, frontier)
+	"""
+	seeds = list(seeds)
+	options = dict(kwargs, max_steps=max_steps, pit_prob=pit_prob, cache=cache)
+	static = StaticKB(width, height, bool(kwargs.get('frontier')))
+	processes = processes or multiprocessing.cpu_count()
+
+
+	try:
+		if processes == 1:
+			_init_worker(static.spec(), options, False)
+			try: return [_run_seed(seed) for seed in seeds]
+			finally: _close_worker()
+
+		# Closed and joined rather than terminated, so that the workers exit
+		# normally and close their mappings and cache connections.
+		chunksize = chunksize or max(1, len(seeds) // (4 * processes))
+		with multiprocessing.Pool(processes, _init_worker, (static.spec(), options)) as pool:
+			rows = pool.map(_run_seed, seeds, chunksize)
+			pool.close()
+			pool.join()
+		return rows
+	finally:
+		static.close()
+
+
+
+def summarize(rows, wall_time=None):
+	"""
+	Aggregates the stats of a batch of episodes.
+	"""
+	steps = sum(row['steps'] for row in rows)
+	summary = {'episodes': len(rows), 'outcomes': dict(collections.Counter(row['outcome'] for row in rows)),
+		'steps': steps, 'mean_steps': (steps / len(rows) if rows else 0.0)}
+
+
+	for key in ('queries', 'solves', 'root_answers', 'cached', 'clauses'):
+		summary['mean_' + key] = (sum(row[key] for row in rows) / len(rows) if rows else 0.0)
+	summary['step_time'] = (sum(row['time'] for row in rows) / steps if steps else 0.0)
+	summary['max_step_time'] = max([row['max_step_time'] for row in rows] or [0.0])
+	if wall_time is not None:
+		summary['wall_time'] = wall_time
+		summary['episodes_per_second'] = (len(rows) / wall_time if wall_time else 0.0)
+
+	return summary
+
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Runs wumpus episodes in parallel')
+	parser.add_argument('width', type=int)
+	parser.add_argument('height', type=int)
+	parser.add_argument('episodes', type=int)
+	parser.add_argument('--processes', type=int, default=None)
+	parser.add_argument('--max-steps', type=int, default=200)
+	parser.add_argument('--pit-prob', type=float, default=0.2)
+	parser.add_argument('--first-seed', type=int, default=0)
+	parser.add_argument('--cache', metavar='FILE', help='share safety query answers through this file')
+	parser.add_argument('--json', metavar='FILE', help="write the stats as JSON ('-' for stdout)")
+	args = parser.parse_args()
+
+	start = time.perf_counter()
+	rows = run_batch(args.width, args.height, range(args.first_seed, args.first_seed + args.episodes),
+		args.processes, args.max_steps, args.pit_prob, cache=args.cache)
+	summary = summarize(rows, time.perf_counter() - start)
+	if args.json == '-':
+		json.dump({'summary': summary, 'episodes': rows}, sys.stdout, indent=1)
+		print()
+	else:
+		if args.json:
+			with open(args.json, 'w') as f: json.dump({'summary': summary, 'episodes': rows}, f, indent=1)
+		for key, value in summary.items(): print('{0}\t{1}'.format(key, value))
@@ -0,0 +1,260 @@
+# wumpus_belief.py
+# ----------------
+# A probabilistic belief over Pit and Wumpus locations, kept alongside the
+# logical KB.
+#
+# The KB can only prove locations OK or not OK; when nothing is provable the
+# agent still has to pick the least risky location to explore.  BeliefGrid
+# keeps per-location Pit and Wumpus marginals for that, over the same
+# neighbourhoods as the pit/breeze and wumpus/stench axioms (a location and
+# its 4-neighbours, see wumpus_kb.axiom_generator_pits_and_breezes), stored
+# as NumPy adjacency masks so that percept updates are array operations.
+# The masks are dense (width * height squared booleans), which is fine up to
+# 64x64 or so.
+#
+# Pit marginals are exact: the unknown locations next to a Breeze are split
+# into connected components (locations sharing a Breeze constraint), and each
+# component's assignments are enumerated as one bit matrix.  Components too
+# large to enumerate fall back to an approximation, see BeliefGrid.update_pits.
+#
+# BeliefGrid is standalone: the agents of wumpus_world only ever move to
+# locations their KB proves OK, so a caller that is willing to take risks
+# feeds it the percepts and the KB's answers itself (see observe and
+# tell_safety) and picks from least_risky.
+#
+# NumPy is optional for the rest of the package; BeliefGrid needs it.
+import collections
+
+import wumpus_kb
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+
+
+
+#-------------------------------------------------------------------------------
+# Belief Grid
+#-------------------------------------------------------------------------------
+def numpy_available():
+	return numpy is not None
+
+
+
+class BeliefGrid(object):
+	"""
+	width,height := dimensions of world
+	pit_prior := prior probability of a Pit at any location; default=0.2
+	max_component := largest component of Breeze-constrained locations whose
+		Pit assignments are enumerated exactly; default=16
+
+	Locations are indexed (x - 1) * height + (y - 1); the *_grid methods
+	return width x height arrays, so that grid[x - 1, y - 1] is location x,y.
+	"""
+	def __init__(self, width, height, pit_prior=0.2, max_component=16):
+		if numpy is None: raise ImportError('BeliefGrid requires numpy')
+
+
+		self.width = width
+		self.height = height
+		self.size = width * height
+		self.pit_prior = pit_prior
+		self.max_component = max_component
+
+		# adjacency[i, j]: location j is in the neighbourhood of location i
+		# (which includes i itself), i.e. a Pit at j makes a Breeze at i.
+		self.adjacency = numpy.zeros((self.size, self.size), dtype=bool)
+		for x, y in wumpus_kb.locations(1, width, 1, height):
+			for nx, ny in wumpus_kb._neighbour_cells(x, y, 1, width, 1, height):
+				self.adjacency[self.index(x, y), self.index(nx, ny)] = True
+
+		# -1 unknown, 0 False, 1 True
+		self.pits = numpy.full(self.size, -1, dtype=numpy.int8)
+		self.breezes = numpy.full(self.size, -1, dtype=numpy.int8)
+		self.stenches = numpy.full(self.size, -1, dtype=numpy.int8)
+		self.no_wumpus = numpy.zeros(self.size, dtype=bool)
+		self.wumpus = None
+		self.wumpus_alive = True
+		self.visited = set()
+
+		self.pit_marginals = None
+		self.wumpus_marginals = None
+
+
+	def index(self, x, y):
+		return (x - 1) * self.height + (y - 1)
+
+
+	def location(self, i):
+		return (i // self.height + 1, i % self.height + 1)
+
+
+	#----------------------------------
+	# Updates
+	#----------------------------------
+	def observe(self, x, y, tvec):
+		"""
+		Updates the belief with the percepts perceived at location x,y.
+
+		tvec := percept vector (<stench>,<breeze>,<glitter>,<bump>,<scream>),
+			as passed to wumpus_kb.axiom_generator_percept_sentence
+		"""
+		i = self.index(x, y)
+		stench, breeze, scream = tvec[0], tvec[1], tvec[4]
+
+
+		self.visited.add((x, y))
+		self.pits[i] = 0
+		self.no_wumpus[i] = True
+		self.breezes[i] = int(bool(breeze))
+		self.stenches[i] = int(bool(stench))
+		if not breeze: self.pits[self.adjacency[i]] = 0
+		if not stench: self.no_wumpus[self.adjacency[i]] = True
+		if scream: self.wumpus_alive = False
+		self.pit_marginals = self.wumpus_marginals = None
+
+
+	def tell(self, x, y, pit=None, wumpus=None):
+		"""
+		Asserts what the KB proved about location x,y: pit and wumpus are
+		True, False, or None (unknown).
+		"""
+		i = self.index(x, y)
+
+
+		if pit is not None: self.pits[i] = int(bool(pit))
+		if wumpus is False: self.no_wumpus[i] = True
+		if wumpus: self.wumpus = i
+		self.pit_marginals = self.wumpus_marginals = None
+
+
+	def tell_safety(self, safety):
+		"""
+		safety := {(x, y): True/False/None}, as returned by
+			wumpus_session.KBSession.ask_all_safety; the locations proven OK
+			hold neither a Pit nor a live Wumpus
+		"""
+		for (x, y), ok in safety.items():
+			if ok: self.tell(x, y, pit=False, wumpus=(False if self.wumpus_alive else None))
+
+
+	def update_pits(self):
+		"""
+		Recomputes the Pit marginals from the Breezes perceived so far.
+
+		A perceived Breeze that no known Pit explains constrains the unknown
+		locations of its neighbourhood to hold at least one Pit.  Unknown
+		locations under such constraints are grouped into components that
+		share constraints, and each component is solved on its own: with k
+		locations, its 2^k assignments are the rows of a bit matrix, the
+		consistent ones are weighted by the prior, and the marginals are the
+		weighted column means.  A component of more than max_component
+		locations instead gets, at each location, the largest marginal that
+		any one of its constraints would give it on its own.
+		"""
+		p = self.pit_prior
+		marginals = numpy.where(self.pits >= 0, self.pits, p).astype(float)
+		unknown = (self.pits < 0)
+		explained = (self.adjacency & (self.pits == 1)).any(axis=1)
+
+
+		constraints = self.adjacency[(self.breezes == 1) & ~explained][:, unknown]
+		cells = numpy.flatnonzero(unknown)
+		if constraints.shape[0]:
+			frontier = constraints.any(axis=0)
+			constraints, cells = constraints[:, frontier], cells[frontier]
+			shared = (constraints.T.astype(int) @ constraints.astype(int)) > 0
+
+			# Components by breadth-first search over shared, each location
+			# being labelled (and its row scanned) once.
+			labels = numpy.full(len(cells), -1)
+			for seed in range(len(cells)):
+				if labels[seed] >= 0: continue
+				labels[seed] = seed
+				queue = collections.deque([seed])
+				while queue:
+					fresh = numpy.flatnonzero(shared[queue.popleft()] & (labels < 0))
+					labels[fresh] = seed
+					queue.extend(fresh)
+
+			for label in numpy.unique(labels):
+				members = (labels == label)
+				rows = constraints[:, members][constraints[:, members].any(axis=1)]
+				k = int(members.sum())
+				if k <= self.max_component:
+					assignments = ((numpy.arange(2 ** k)[:, None] >> numpy.arange(k)) & 1).astype(bool)
+					consistent = ((assignments.astype(int) @ rows.T.astype(int)) > 0).all(axis=1)
+					count = assignments.sum(axis=1)
+					weights = numpy.where(consistent, p ** count * (1 - p) ** (k - count), 0.0)
+					marginals[cells[members]] = (weights @ assignments) / weights.sum()
+				else:
+					alone = p / (1 - (1 - p) ** rows.sum(axis=1))
+					marginals[cells[members]] = numpy.where(rows, alone[:, None], 0.0).max(axis=0)
+		self.pit_marginals = marginals
+
+		return marginals
+
+
+	def update_wumpus(self):
+		"""
+		Recomputes the Wumpus marginals: there is exactly one Wumpus (see
+		wumpus_kb.axiom_generator_at_least_one_wumpus), uniformly likely at
+		every location not ruled out and in the neighbourhood of every
+		perceived Stench.  A dead Wumpus poses no risk: its marginals are 0.
+		"""
+		marginals = numpy.zeros(self.size)
+
+
+		if not self.wumpus_alive: pass
+		elif self.wumpus is not None: marginals[self.wumpus] = 1.0
+		else:
+			candidates = ~self.no_wumpus & self.adjacency[self.stenches == 1].all(axis=0)
+			if candidates.any(): marginals[candidates] = 1.0 / candidates.sum()
+		self.wumpus_marginals = marginals
+
+		return marginals
+
+
+	#----------------------------------
+	# Queries
+	#----------------------------------
+	def pit_grid(self):
+		marginals = (self.update_pits() if self.pit_marginals is None else self.pit_marginals)
+
+		return marginals.reshape(self.width, self.height)
+
+
+	def wumpus_grid(self):
+		marginals = (self.update_wumpus() if self.wumpus_marginals is None else self.wumpus_marginals)
+
+		return marginals.reshape(self.width, self.height)
+
+
+	def risk_grid(self):
+		"""
+		Probability that each location holds a Pit or a live Wumpus.
+		"""
+		return 1 - (1 - self.pit_grid()) * (1 - self.wumpus_grid())
+
+
+	def risk(self, x, y):
+		return float(self.risk_grid()[x - 1, y - 1])
+
+
+	def least_risky(self, cells=None):
+		"""
+		Returns ((x, y), risk) for the least risky of cells (default: the
+		unvisited locations next to a visited one), or None if there are none.
+		"""
+		if cells is None:
+			cells = wumpus_kb.frontier_cells(self.visited, 1, self.width, 1, self.height) - self.visited
+		cells = sorted(cells)
+
+
+		if not cells: return None
+		risk = self.risk_grid().reshape(-1)[[self.index(x, y) for x, y in cells]]
+		best = int(risk.argmin())
+
+		return cells[best], float(risk[best])
@@ -0,0 +1,248 @@
+# wumpus_bench.py
+# ---------------
+# Benchmarks for the wumpus_kb axiom and clause generators.
+#
+# Usage:
+#	python wumpus_bench.py generation [--sizes 4,8,16,32,64] [--horizons 10,100,1000] [--json FILE]
+#	python wumpus_bench.py cardinality [--sizes 7,16,64,256,1024] [--json FILE]
+#
+# Results are printed as a table, and written as JSON with --json so runs of
+# different versions can be compared.
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import sat_solver
+import wumpus_kb
+
+
+
+
+#-------------------------------------------------------------------------------
+# KB generation
+#-------------------------------------------------------------------------------
+def step_axioms(t, x, y, width, height, heading):
+	"""
+	The temporal axioms an agent at x,y facing heading adds at time step t.
+	"""
+	axioms = wumpus_kb.generate_square_OK_axioms(t, 1, width, 1, height)
+	axioms.extend(wumpus_kb.generate_breeze_percept_and_location_axioms(t, 1, width, 1, height))
+	axioms.extend(wumpus_kb.generate_stench_percept_and_location_axioms(t, 1, width, 1, height))
+	axioms.extend(wumpus_kb.generate_at_location_ssa(t, x, y, 1, width, 1, height, heading))
+	axioms.extend(wumpus_kb.generate_non_location_ssa(t))
+	axioms.extend(wumpus_kb.generate_mutually_exclusive_axioms(t))
+
+	return axioms
+
+
+
+def step_clauses(t, x, y, width, height, heading, reg):
+	"""
+	CNF of step_axioms, from the clause generators.
+	"""
+	clauses = wumpus_kb.generate_square_OK_clauses(t, 1, width, 1, height, reg)
+	clauses.extend(wumpus_kb.generate_breeze_percept_and_location_clauses(t, 1, width, 1, height, reg))
+	clauses.extend(wumpus_kb.generate_stench_percept_and_location_clauses(t, 1, width, 1, height, reg))
+	clauses.extend(wumpus_kb.generate_at_location_ssa_clauses(t, x, y, 1, width, 1, height, heading, reg))
+	clauses.extend(wumpus_kb.generate_non_location_ssa_clauses(t, reg))
+	clauses.extend(wumpus_kb.generate_mutually_exclusive_clauses(t, reg))
+
+	return clauses
+
+
+
+def step_template_clauses(t, x, y, width, height, heading, reg):
+	"""
+	Same clauses as step_clauses, with the location-independent families
+	instantiated from time templates.
+	"""
+	clauses = wumpus_kb.generate_step_clauses_from_templates(t, 1, width, 1, height, reg)
+	clauses.extend(wumpus_kb.generate_at_location_ssa_clauses(t, x, y, 1, width, 1, height, heading, reg))
+
+	return clauses
+
+
+
+def _generate(phase, size, horizon, keep):
+	"""
+	Builds the KB of one phase: the initial axioms, then horizon time steps
+	for an agent standing at 1,1 facing east.  Returns (initial time, step
+	loop time, item count, string bytes, literal count).
+	"""
+	x, y, heading = 1, 1, 'east'
+	reg = wumpus_kb.grid_registry(size, size)
+	kb = []
+
+
+	# The initial KB is counted as it is generated, so that the streamed
+	# version is never held as a whole unless keep is set.
+	start = time.perf_counter()
+	if phase == 'strings': initial = wumpus_kb.initial_wumpus_axioms(x, y, size, size, heading)
+	elif phase == 'streams': initial = wumpus_kb.iter_initial_wumpus_clauses(x, y, size, size, heading, reg)
+	else: initial = wumpus_kb.initial_wumpus_clauses(x, y, size, size, heading, reg)
+	if keep: kb.extend(initial)
+	items, size_bytes = wumpus_kb.count_clauses(kb if keep else initial)
+	initial_time = time.perf_counter() - start
+
+	start = time.perf_counter()
+	for t in range(horizon):
+		if phase == 'strings': step = step_axioms(t, x, y, size, size, heading)
+		elif phase == 'clauses': step = step_clauses(t, x, y, size, size, heading, reg)
+		else: step = step_template_clauses(t, x, y, size, size, heading, reg)
+		items += len(step)
+		size_bytes += sum(len(item) for item in step)
+		if keep: kb.extend(step)
+	step_time = time.perf_counter() - start
+
+	if phase == 'strings': return initial_time, step_time, items, size_bytes, None
+	return initial_time, step_time, items, None, size_bytes
+
+
+
+generation_phases = ['strings', 'clauses', 'templates', 'streams']
+
+
+
+def bench_generation(sizes=(4, 8, 16, 32, 64), horizons=(10, 100, 1000), phases=None, keep=False, memory=True):
+	"""
+	Times the generation of a size x size KB over horizon time steps, for
+	every size and horizon: the initial axioms, then the temporal axioms of
+	each step for an agent standing at 1,1 facing east.
+
+	phases := which generators to run, from generation_phases: the axiom
+		strings ('strings'), the clause generators ('clauses'), the clause
+		generators with time templates ('templates'), or time templates with
+		the initial clauses streamed from wumpus_kb.iter_initial_wumpus_clauses
+		('streams'); default=all
+	keep := hold the whole KB in memory, as an agent would, instead of
+		dropping each step once counted; default=False (peak memory is then
+		the initial KB plus one step)
+	memory := measure peak memory in a second, tracemalloc-traced run (so it
+		does not skew the timings); default=True
+
+	Returns a list of dicts, one per (size, horizon, phase).  String rows
+	report string_bytes, the total length of the axioms; clause rows report
+	clauses and literals, the size of the KB after CNF conversion.
+	"""
+	rows = []
+
+
+	for size in sizes:
+		for horizon in horizons:
+			for phase in (phases or generation_phases):
+				initial_time, step_time, items, string_bytes, literals = _generate(phase, size, horizon, keep)
+				peak = None
+				if memory:
+					tracemalloc.start()
+					_generate(phase, size, horizon, keep)
+					peak = tracemalloc.get_traced_memory()[1]
+					tracemalloc.stop()
+
+				rows.append({'size': size, 'horizon': horizon, 'phase': phase, 'initial_time': initial_time,
+					'step_time': step_time, 'wall_time': initial_time + step_time, 'peak_bytes': peak,
+					'axioms': (items if phase == 'strings' else None), 'string_bytes': string_bytes,
+					'clauses': (None if phase == 'strings' else items), 'literals': literals})
+
+	return rows
+
+
+
+#-------------------------------------------------------------------------------
+# Cardinality encodings
+#-------------------------------------------------------------------------------
+def bench_cardinality(sizes=(7, 16, 64, 256, 1024), encodings=None, backend=None):
+	"""
+	Builds an exactly-one constraint over n fresh literals with each
+	encoding and reports clause, literal and auxiliary variable counts,
+	generation time, and the time to solve it under two assumption sets:
+	one literal True (satisfiable) and two literals True (unsatisfiable).
+
+	Returns a list of dicts, one per (n, encoding).
+	"""
+	rows = []
+
+
+	for n in sizes:
+		for encoding in (encodings or wumpus_kb.amo_encodings):
+			reg = wumpus_kb.PropositionRegistry()
+			lits = [reg.var('X', 0, i) for i in range(n)]
+
+			start = time.perf_counter()
+			clauses = wumpus_kb.clauses_exactly_one(lits, encoding, 'Amo', reg=reg)
+			elapsed = time.perf_counter() - start
+
+			solve_start = time.perf_counter()
+			solver = sat_solver.new_solver(backend)
+			for clause in clauses: solver.add_clause(clause)
+			assert solver.solve([lits[n // 2]]) and not solver.solve([lits[0], lits[-1]])
+			solve_elapsed = time.perf_counter() - solve_start
+
+			rows.append({'n': n, 'encoding': encoding, 'default': encoding == wumpus_kb.default_amo_encoding(n),
+				'clauses': len(clauses), 'literals': sum(len(clause) for clause in clauses),
+				'aux_vars': len(reg) - n, 'gen_time': elapsed, 'solve_time': solve_elapsed})
+
+	return rows
+
+
+
+#-------------------------------------------------------------------------------
+# Reporting
+#-------------------------------------------------------------------------------
+def print_rows(rows):
+	columns = list(rows[0].keys())
+
+
+	print('\t'.join(columns))
+	for row in rows:
+		print('\t'.join(('{0:.6f}'.format(row[c]) if isinstance(row[c], float) else str(row[c])) for c in columns))
+
+
+
+def write_json(path, benchmark, rows):
+	"""
+	Writes rows to path (or stdout for '-') along with what produced them.
+	"""
+	report = {'benchmark': benchmark, 'python': platform.python_version(), 'platform': platform.platform(),
+		'solver': ('native' if sat_solver.native_available() else 'cdcl'), 'time': time.time(), 'rows': rows}
+
+
+	if path == '-':
+		json.dump(report, sys.stdout, indent=1)
+		print()
+	else:
+		with open(path, 'w') as f: json.dump(report, f, indent=1)
+
+
+
+def _ints(value):
+	return [int(n) for n in value.split(',') if n]
+
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='wumpus_kb benchmarks')
+	commands = parser.add_subparsers(dest='benchmark')
+	generation = commands.add_parser('generation', help='KB generation over grid sizes and horizons')
+	generation.add_argument('--sizes', type=_ints, default=[4, 8, 16, 32, 64])
+	generation.add_argument('--horizons', type=_ints, default=[10, 100, 1000])
+	generation.add_argument('--phases', type=lambda value: value.split(','), default=None)
+	generation.add_argument('--keep', action='store_true', help='hold the whole KB in memory')
+	generation.add_argument('--no-memory', dest='memory', action='store_false', help='skip the tracemalloc run')
+	generation.add_argument('--json', metavar='FILE', help="write the results as JSON ('-' for stdout)")
+	cardinality = commands.add_parser('cardinality', help='at-most-one encodings')
+	cardinality.add_argument('--sizes', type=_ints, default=[7, 16, 64, 256, 1024])
+	cardinality.add_argument('--json', metavar='FILE', help="write the results as JSON ('-' for stdout)")
+	args = parser.parse_args()
+
+	if args.benchmark == 'generation':
+		rows = bench_generation(args.sizes, args.horizons, args.phases, args.keep, args.memory)
+	elif args.benchmark == 'cardinality':
+		rows = bench_cardinality(args.sizes)
+	else:
+		parser.print_usage()
+		sys.exit(2)
+	if args.json: write_json(args.json, args.benchmark, rows)
+	if args.json != '-': print_rows(rows)
@@ -0,0 +1,211 @@
+# wumpus_cache.py
+# ---------------
+# A cache of safety query answers shared across episodes (and processes),
+# so that a question already answered over the same local evidence skips the
+# solver.
+#
+# Whether OK{x}_{y}_{t} is entailed only depends on the percepts at the
+# visited locations near x,y, and on a summary of the Wumpus evidence
+# elsewhere (see safety_keys), so the answer is keyed on a canonical hash of
+# that evidence, with locations relative to x,y: "breeze at (1,2), no breeze
+# at (2,1), is (2,2) OK?" gets the same key wherever on the map it is asked,
+# as long as the walls are as far.
+#
+# QueryCache keeps the answers in an in-memory LRU in front of an optional
+# SQLite file, bounded in size, least recently used answers going first;
+# any number of processes can share the file.
+#
+#	cache = wumpus_cache.QueryCache('answers.db', max_entries=1000000)
+#	session = wumpus_session.KBSession(1, 1, 4, 4, cache=cache)
+import collections
+import hashlib
+import sqlite3
+import threading
+import time
+
+import wumpus_kb
+
+
+
+
+#-------------------------------------------------------------------------------
+# Evidence keys
+#
+# Over the pit/breeze axioms, P{x}_{y} is entailed false iff a visited
+# neighbour (or x,y itself) has no Breeze, and true iff a visited neighbour
+# has a Breeze and every other location of its neighbourhood is entailed
+# pit-free: so only the Breeze percepts within three moves of x,y matter
+# (and where the walls and the start are, within that distance).  Over the
+# Wumpus axioms, W{x}_{y} is entailed false iff x,y is ruled out (it is the
+# start, a visited location within one move has no Stench, or a Stench was
+# perceived somewhere not next to it), and true iff every other location is:
+# two bits that summarize the Stench percepts.  After a Scream, OK only
+# depends on the pits.
+#-------------------------------------------------------------------------------
+# Version of the key layout; bump it when the keys change meaning.
+key_version = 1
+
+# How far from the query location percepts are part of its key.
+evidence_radius = 3
+
+
+
+def _wumpus_candidates(evidence, start, width, height):
+	"""
+	(candidates, excluded): the locations the Wumpus can be in, or None if
+	no Stench was perceived (it can then be anywhere but the excluded
+	locations), and the locations ruled out by the lack of a Stench.
+	"""
+	excluded = set([start])
+	stenches = [cell for cell, (stench, breeze) in evidence.items() if stench]
+
+
+	for cell, (stench, breeze) in evidence.items():
+		if not stench: excluded.update(wumpus_kb.frontier_cells([cell], 1, width, 1, height))
+	if not stenches: return None, excluded
+
+	candidates = wumpus_kb.frontier_cells(stenches[:1], 1, width, 1, height)
+	for cell in stenches[1:]: candidates &= wumpus_kb.frontier_cells([cell], 1, width, 1, height)
+	return candidates - excluded, excluded
+
+
+
+def safety_keys(cells, t, width, height, start, evidence, scream=None):
+	"""
+	The cache keys of the safety queries OK{x}_{y}_{t} for x,y in cells.
+
+	start := the agent's initial location (asserted pit and Wumpus free)
+	evidence := {(x, y): (stench, breeze)}, the percepts at the visited
+		locations
+	scream := the first time step a Scream was perceived, if any
+	Returns {(x, y): key}.
+	"""
+	r = evidence_radius
+	# A Scream at time s makes WumpusAlive_s false (see
+	# wumpus_kb.axiom_generator_wumpus_alive_ssa), so from s on OK only
+	# depends on the pits.
+	alive = (scream is None or t < scream)
+	candidates, excluded = (_wumpus_candidates(evidence, start, width, height) if alive else (None, None))
+	area = width * height
+	keys = {}
+
+
+	for x, y in cells:
+		breezes = tuple(sorted((ex - x, ey - y, bool(breeze)) for (ex, ey), (stench, breeze) in evidence.items()
+			if abs(ex - x) + abs(ey - y) <= r))
+		walls = (min(x - 1, r), min(width - x, r), min(y - 1, r), min(height - y, r))
+		origin = ((start[0] - x, start[1] - y) if abs(start[0] - x) + abs(start[1] - y) <= r else None)
+		wumpus = None
+		if alive and candidates is None:
+			wumpus = ((x, y) in excluded, area - len(excluded | set([(x, y)])) > 0)
+		elif alive:
+			wumpus = ((x, y) not in candidates, bool(candidates - set([(x, y)])))
+		canonical = repr((key_version, breezes, walls, origin, alive, wumpus))
+		keys[(x, y)] = hashlib.sha1(canonical.encode('ascii')).hexdigest()
+
+	return keys
+
+
+
+#-------------------------------------------------------------------------------
+# Cache
+#-------------------------------------------------------------------------------
+# Answers as stored: True/False/None (unknown) <-> 1/0/-1.
+_encode = {True: 1, False: 0, None: -1}
+_decode = {1: True, 0: False, -1: None}
+
+
+
+class QueryCache(object):
+	"""
+	path := SQLite file the answers are kept in, shared with any other
+		process opening it; default=None (in memory only)
+	max_entries := most answers kept in the file (checked every
+		check_every stores); default=1000000
+	memory_entries := most answers kept in memory; default=65536
+	check_every := see max_entries; default=64
+
+	get_many(keys) returns {key: answer} for the keys with a cached answer
+	(True, False or None), put_many({key: answer}) stores answers.  Safe to
+	share between threads.
+	"""
+	def __init__(self, path=None, max_entries=1000000, memory_entries=65536, check_every=64):
+		self.path = path
+		self.max_entries = max_entries
+		self.memory_entries = memory_entries
+		self.check_every = check_every
+		self.puts = 0
+		self.memory = collections.OrderedDict()
+		self.lock = threading.Lock()
+		self.db = None
+		self.stats = {'lookups': 0, 'hits': 0, 'disk_hits': 0, 'stores': 0, 'evictions': 0}
+
+
+		if path is not None:
+			self.db = sqlite3.connect(path, timeout=60, check_same_thread=False)
+			self.db.execute('CREATE TABLE IF NOT EXISTS answers (key TEXT PRIMARY KEY, answer INTEGER, used REAL)')
+			self.db.execute('CREATE INDEX IF NOT EXISTS answers_used ON answers (used)')
+			self.db.commit()
+
+
+	def remember(self, key, answer):
+		self.memory[key] = answer
+		self.memory.move_to_end(key)
+		if len(self.memory) > self.memory_entries: self.memory.popitem(last=False)
+
+
+	def get_many(self, keys):
+		keys = list(keys)
+		found = {}
+
+
+		with self.lock:
+			self.stats['lookups'] += len(keys)
+			for key in keys:
+				if key in self.memory:
+					self.memory.move_to_end(key)
+					found[key] = self.memory[key]
+			missing = [key for key in keys if key not in found]
+			if self.db is not None and missing:
+				rows = []
+				for i in range(0, len(missing), 500):
+					chunk = missing[i:i + 500]
+					rows.extend(self.db.execute('SELECT key, answer FROM answers WHERE key IN ({0})'.format(
+						','.join('?' * len(chunk))), chunk).fetchall())
+				if rows:
+					self.db.executemany('UPDATE answers SET used = ? WHERE key = ?', [(time.time(), key) for key, answer in rows])
+					self.db.commit()
+				for key, answer in rows:
+					found[key] = _decode[answer]
+					self.remember(key, found[key])
+				self.stats['disk_hits'] += len(rows)
+			self.stats['hits'] += len(found)
+
+		return found
+
+
+	def put_many(self, answers):
+		answers = dict(answers)
+
+
+		if not answers: return
+		with self.lock:
+			self.stats['stores'] += len(answers)
+			for key, answer in answers.items(): self.remember(key, answer)
+			if self.db is None: return
+			now = time.time()
+			self.db.executemany('INSERT OR REPLACE INTO answers (key, answer, used) VALUES (?, ?, ?)',
+				[(key, _encode[answer], now) for key, answer in answers.items()])
+			self.puts += 1
+			excess = (self.db.execute('SELECT COUNT(*) FROM answers').fetchone()[0] - self.max_entries
+				if self.puts % self.check_every == 0 else 0)
+			if excess > 0:
+				self.db.execute('DELETE FROM answers WHERE key IN (SELECT key FROM answers ORDER BY used LIMIT ?)', (excess,))
+				self.stats['evictions'] += excess
+			self.db.commit()
+
+
+	def close(self):
+		with self.lock:
+			if self.db is not None: self.db.close()
+			self.db = None
@@ -15,6 +15,14 @@
 # The file ['minisat.py'] implements a slim system call wrapper to the minisat
 # (see http://minisat.se) SAT solver, and is directly based on the satispy
 # python project, see https://github.com/netom/satispy .
+import array
+import bisect
+import functools
+import itertools
+import operator
+import re
+import weakref
+
 import utils
 
 
@@ -105,10 +113,13 @@ def state_loc_str(x, y, t):
 
 # Utility to convert location propositions to location (x,y) tuples
 # Used by HybridWumpusAgent for internal bookkeeping.
+# Accepts a proposition name or a variable ID of the propositions registry;
+# names are only parsed the first time they are seen.
 def loc_proposition_to_tuple(loc_prop):
-	parts = loc_prop.split('_')
+	if isinstance(loc_prop, int): key = propositions.key(loc_prop)
+	else: key = propositions.key(propositions.lookup(loc_prop))
 
-	return (int(parts[0][1:]), int(parts[1]))
+	return (key[1], key[2])
 
 
 
@@ -208,6 +219,350 @@ proposition_bases_all = [proposition_bases_atemporal_location, proposition_bases
 
 
 
+#-------------------------------------------------------------------------------
+# Proposition Registry (integer variable IDs)
+#-------------------------------------------------------------------------------
+
+# Generic form of the *_str helpers above: x,y and/or t are None for
+# propositions without a location and/or a time stamp.
+def proposition_str(base, x=None, y=None, t=None):
+	if x is None: return (base if t is None else add_time_stamp(base, t))
+	if t is None: return '{0}{1}_{2}'.format(base, x, y)
+
+	return '{0}{1}_{2}_{3}'.format(base, x, y, t)
+
+
+
+_proposition_pattern = re.compile(r'^([A-Za-z]+)(-?\d+)?(?:_(-?\d+))?(?:_(-?\d+))?$')
+
+
+
+# Inverse of proposition_str: 'L1_2_3' -> ('L', 1, 2, 3), 'Breeze4' -> ('Breeze', None, None, 4)
+def parse_proposition(name):
+	match = _proposition_pattern.match(name)
+	if match is None: raise ValueError('Not a proposition name: {0!r}'.format(name))
+
+	base, a, b, c = match.groups()
+	if a is None: return (base, None, None, None)
+	if b is None: return (base, None, None, int(a))
+	if c is None: return (base, int(a), int(b), None)
+
+	return (base, int(a), int(b), int(c))
+
+
+
+class PropositionRegistry(object):
+	"""
+	Interns propositions as dense integer variable IDs (1, 2, 3, ...) so that
+	axioms can be emitted as clauses of signed integer literals (DIMACS
+	style: -v is the negation of v), and maps IDs back to the proposition
+	names used by the string axioms.
+
+	Propositions are keyed on (base, x, y, t), with None for the parts a
+	proposition doesn't have:
+		('P', 2, 3, None)          <->  'P2_3'
+		('L', 1, 1, 4)             <->  'L1_1_4'
+		('Forward', None, None, 4) <->  'Forward4'
+
+	step_slots := optional list of (base, x, y) triples of temporal
+		propositions laid out per time step: the IDs of all of them at time t
+		form one contiguous block, so the ID of (base, x, y, t) is
+		step_base(t) + slot.  Blocks are reserved step_chunk steps at a time,
+		which keeps consecutive steps adjacent (see TimeTemplate).  Every
+		other proposition gets the next free ID when first seen.
+		Chunks of steps that are no longer needed can be handed back with
+		retire_steps, and their IDs are then reused for later steps.
+	"""
+	def __init__(self, step_slots=None, step_chunk=16):
+		self.ids = {}
+		self.keys = {}
+		self.names = {}
+		self.name_ids = {}
+		self.count = 0
+
+		self.slot_keys = list(step_slots or [])
+		self.slots = dict((key, slot) for slot, key in enumerate(self.slot_keys))
+		self.stride = len(self.slot_keys)
+		self.step_bases = []
+		self.step_chunk = step_chunk
+		self.chunk_starts = []
+		self.chunk_steps = {}
+		self.free_chunks = []
+
+		self.templates = {}
+
+
+	def __len__(self):
+		return self.count
+
+
+	def copy(self):
+		"""
+		An independent registry with the same IDs (and no time templates),
+		e.g. to start each episode from a registry holding the static axioms.
+		"""
+		reg = PropositionRegistry(self.slot_keys, self.step_chunk)
+
+
+		reg.ids, reg.keys = dict(self.ids), dict(self.keys)
+		reg.names, reg.name_ids = dict(self.names), dict(self.name_ids)
+		reg.count = self.count
+		reg.step_bases, reg.chunk_starts = list(self.step_bases), list(self.chunk_starts)
+		reg.chunk_steps, reg.free_chunks = dict(self.chunk_steps), list(self.free_chunks)
+
+		return reg
+
+
+	def var(self, base, x=None, y=None, t=None):
+		"""
+		Returns the ID of proposition (base, x, y, t), allocating one if new.
+		"""
+		key = (base, x, y, t)
+		vid = self.ids.get(key)
+		if vid is None:
+			slot = self.slots.get((base, x, y)) if t is not None else None
+			if slot is not None: return self.step_base(t) + slot
+
+			self.count += 1
+			vid = self.count
+			self.ids[key] = vid
+			self.keys[vid] = key
+
+		return vid
+
+
+	def step_base(self, t):
+		"""
+		Returns the first ID of the block of step_slots propositions at time t.
+		"""
+		while len(self.step_bases) <= t:
+			if self.free_chunks:
+				start = self.free_chunks.pop()
+			else:
+				start = self.count + 1
+				self.count += self.stride * self.step_chunk
+			bisect.insort(self.chunk_starts, start)
+			self.chunk_steps[start] = len(self.step_bases)
+			self.step_bases.extend(start + i * self.stride for i in range(self.step_chunk))
+
+		base = self.step_bases[t]
+		if base is None: raise ValueError('Time step {0} has been retired'.format(t))
+
+		return base
+
+
+	def retire_steps(self, t):
+		"""
+		Releases the ID blocks of every chunk of steps entirely before time
+		t, for reuse by later steps, and forgets the temporal propositions
+		before t that are not laid out in step slots.  The caller must make
+		sure no clause over those propositions is still in use.
+		"""
+		size = self.stride * self.step_chunk
+
+
+		for vid in [vid for vid, key in self.keys.items() if key[3] is not None and key[3] < t]:
+			del self.ids[self.keys.pop(vid)]
+			name = self.names.pop(vid, None)
+			if name is not None: del self.name_ids[name]
+
+		for start in list(self.chunk_starts):
+			first = self.chunk_steps[start]
+			if first + self.step_chunk > t: continue
+
+			self.chunk_starts.remove(start)
+			del self.chunk_steps[start]
+			self.free_chunks.append(start)
+			for step in range(first, first + self.step_chunk): self.step_bases[step] = None
+			for vid in [vid for vid in self.names if start <= vid < start + size]:
+				del self.name_ids[self.names.pop(vid)]
+
+
+	def key(self, lit):
+		vid = abs(lit)
+		key = self.keys.get(vid)
+		if key is None:
+			i = bisect.bisect_right(self.chunk_starts, vid) - 1
+			offset = (vid - self.chunk_starts[i] if i >= 0 else -1)
+			if offset < 0 or offset >= self.stride * self.step_chunk:
+				raise KeyError('Unknown variable ID: {0}'.format(vid))
+			step, slot = divmod(offset, self.stride)
+			key = self.slot_keys[slot] + (self.chunk_steps[self.chunk_starts[i]] + step,)
+
+		return key
+
+
+	def name(self, lit):
+		"""
+		Returns the proposition name of a variable ID (or of a literal's variable).
+		"""
+		vid = abs(lit)
+		name = self.names.get(vid)
+		if name is None:
+			name = proposition_str(*self.key(vid))
+			self.names[vid] = name
+			self.name_ids[name] = vid
+
+		return name
+
+
+	def literal_str(self, lit):
+		return ('~' if lit < 0 else '') + self.name(lit)
+
+
+	def clause_str(self, clause):
+		return '(' + '|'.join(self.literal_str(lit) for lit in clause) + ')'
+
+
+	def lookup(self, name):
+		"""
+		Returns the ID of a proposition given its name, allocating one if new.
+		"""
+		vid = self.name_ids.get(name)
+		if vid is None:
+			vid = self.var(*parse_proposition(name))
+			self.names[vid] = name
+			self.name_ids[name] = vid
+
+		return vid
+
+
+
+# Registry used by the clause generators unless they are given one.
+propositions = PropositionRegistry()
+
+
+
+#-------------------------------------------------------------------------------
+# World Geometry
+#
+# The cells of a world and their neighbourhoods only depend on its bounds, so
+# they are worked out once per world size and shared by all the generators
+# (and across episodes on the same map size), instead of re-running the
+# bounds checks and cell loops on every call.
+#-------------------------------------------------------------------------------
+class WorldGeometry(object):
+	"""
+	xmin, xmax, ymin, ymax := the bounds of the environment
+
+	Cells are numbered in x-major order, the order of locations():
+		cells[i] := the location x,y of cell i
+		index := {(x, y): i}
+		neighbour_starts, neighbours := the neighbourhood of cell i is
+			neighbours[neighbour_starts[i]:neighbour_starts[i + 1]], in the
+			order the generators list it: west, east, south, north (those
+			within the bounds), then the cell itself
+		forward := {heading: array of the cell that moving forward from cell
+			i with that heading leads to, or -1 if it bumps into a wall}
+
+	Use world_geometry() rather than building one directly.
+	"""
+	__slots__ = ('xmin', 'xmax', 'ymin', 'ymax', 'cells', 'index', 'neighbour_starts', 'neighbours', 'forward',
+		'cell_ids_cache')
+
+	def __init__(self, xmin, xmax, ymin, ymax):
+		self.xmin, self.xmax, self.ymin, self.ymax = xmin, xmax, ymin, ymax
+		self.cells = [(x, y) for x in range(xmin, xmax + 1) for y in range(ymin, ymax + 1)]
+		self.index = dict((cell, i) for i, cell in enumerate(self.cells))
+		self.neighbour_starts = array.array('i', [0])
+		self.neighbours = array.array('i')
+		self.forward = {}
+		self.cell_ids_cache = weakref.WeakKeyDictionary()
+
+
+		for x, y in self.cells:
+			if x - 1 >= xmin: self.neighbours.append(self.index[(x - 1, y)])
+			if x + 1 <= xmax: self.neighbours.append(self.index[(x + 1, y)])
+			if y - 1 >= ymin: self.neighbours.append(self.index[(x, y - 1)])
+			if y + 1 <= ymax: self.neighbours.append(self.index[(x, y + 1)])
+			self.neighbours.append(self.index[(x, y)])
+			self.neighbour_starts.append(len(self.neighbours))
+
+		for heading, (dx, dy) in (('north', (0, 1)), ('east', (1, 0)), ('south', (0, -1)), ('west', (-1, 0))):
+			self.forward[heading] = array.array('i', [self.index.get((x + dx, y + dy), -1) for x, y in self.cells])
+
+
+	def neighbour_cells(self, i):
+		return [self.cells[j] for j in self.neighbours[self.neighbour_starts[i]:self.neighbour_starts[i + 1]]]
+
+
+	def forward_cell(self, x, y, heading):
+		"""
+		The location moving forward from x,y with heading leads to, or None.
+		"""
+		i = self.index.get((x, y))
+		j = (self.forward[heading][i] if i is not None and heading in self.forward else -1)
+
+
+		return (self.cells[j] if j >= 0 else None)
+
+
+	def cell_ids(self, base, reg=None):
+		"""
+		The IDs of atemporal proposition base (e.g. 'P') at every cell, in
+		cell order; cached per registry.
+		"""
+		reg = _registry(reg)
+		ids = self.cell_ids_cache.setdefault(reg, {})
+
+
+		if base not in ids: ids[base] = array.array('i', [reg.var(base, x, y) for x, y in self.cells])
+		return ids[base]
+
+
+
+@functools.lru_cache(maxsize=64)
+def world_geometry(xmin, xmax, ymin, ymax):
+	"""
+	The WorldGeometry of the given bounds, built once per world size.
+	"""
+	return WorldGeometry(xmin, xmax, ymin, ymax)
+
+
+
+# Worlds with more cells than this (e.g. the sparse worlds of KBSession) have
+# their single-location lookups worked out directly rather than from a
+# WorldGeometry, which costs memory in proportion to the map's area.
+max_geometry_cells = 1 << 16
+
+
+
+def _dense(xmin, xmax, ymin, ymax):
+	return (xmax - xmin + 1) * (ymax - ymin + 1) <= max_geometry_cells
+
+
+
+def _neighbour_cells(x, y, xmin, xmax, ymin, ymax):
+	# Same order as the string generators: west, east, south, north, then the cell itself.
+	if _dense(xmin, xmax, ymin, ymax):
+		geometry = world_geometry(xmin, xmax, ymin, ymax)
+		i = geometry.index.get((x, y))
+		if i is not None: return geometry.neighbour_cells(i)
+
+
+	cells = []
+	if x - 1 >= xmin: cells.append((x - 1, y))
+	if x + 1 <= xmax: cells.append((x + 1, y))
+	if y - 1 >= ymin: cells.append((x, y - 1))
+	if y + 1 <= ymax: cells.append((x, y + 1))
+	cells.append((x, y))
+
+	return cells
+
+
+
+def _forward_cell(x, y, xmin, xmax, ymin, ymax, heading):
+	# WorldGeometry.forward_cell, without the geometry on big maps.
+	if _dense(xmin, xmax, ymin, ymax): return world_geometry(xmin, xmax, ymin, ymax).forward_cell(x, y, heading)
+
+
+	dx, dy = {'north': (0, 1), 'east': (1, 0), 'south': (0, -1), 'west': (-1, 0)}.get(heading, (0, 0))
+	if (dx or dy) and xmin <= x + dx <= xmax and ymin <= y + dy <= ymax: return (x + dx, y + dy)
+
+	return None
+
+
+
 #-------------------------------------------------------------------------------
 # Axiom Generator: Current Percept Sentence
 #-------------------------------------------------------------------------------
@@ -270,23 +625,26 @@ def axiom_generator_pits_and_breezes(x, y, xmin, xmax, ymin, ymax):
 	axiom = breeze_str(x, y) + '<=>('
 
 
-	if x - 1 >= xmin: axiom += pit_str(x - 1, y) + '|'
-	if x + 1 <= xmax: axiom += pit_str(x + 1, y) + '|'
-	if y - 1 >= ymin: axiom += pit_str(x, y - 1) + '|'
-	if y + 1 <= ymax: axiom += pit_str(x, y + 1) + '|'
-	axiom += pit_str(x, y) + ')'
+	axiom += '|'.join(pit_str(nx, ny) for nx, ny in _neighbour_cells(x, y, xmin, xmax, ymin, ymax)) + ')'
 
 	return axiom
 
 
 
-def generate_pit_and_breeze_axioms(xmin, xmax, ymin, ymax):
-	axioms = []
+def iter_pit_and_breeze_axioms(xmin, xmax, ymin, ymax):
+	"""
+	Lazy version of generate_pit_and_breeze_axioms: yields the axioms one
+	at a time, skipping empty ones.
+	"""
+	for x, y in world_geometry(xmin, xmax, ymin, ymax).cells:
+		axiom = axiom_generator_pits_and_breezes(x, y, xmin, xmax, ymin, ymax)
+		if axiom: yield axiom
+
 
 
-	for x in range(xmin, xmax + 1):
-		for y in range(ymin, ymax + 1):
-			axioms.append(axiom_generator_pits_and_breezes(x, y, xmin, xmax, ymin, ymax))
+def generate_pit_and_breeze_axioms(xmin, xmax, ymin, ymax):
+	axioms = list(iter_pit_and_breeze_axioms(xmin, xmax, ymin, ymax))
+
 
 	if utils.all_empty_strings(axioms):
 		utils.print_not_implemented('axiom_generator_pits_and_breezes')
@@ -311,23 +669,26 @@ def axiom_generator_wumpus_and_stench(x, y, xmin, xmax, ymin, ymax):
 	axiom = stench_str(x, y) + '<=>('
 
 
-	if x - 1 >= xmin: axiom += wumpus_str(x - 1, y) + '|'
-	if x + 1 <= xmax: axiom += wumpus_str(x + 1, y) + '|'
-	if y - 1 >= ymin: axiom += wumpus_str(x, y - 1) + '|'
-	if y + 1 <= ymax: axiom += wumpus_str(x, y + 1) + '|'
-	axiom += wumpus_str(x, y) + ')'
+	axiom += '|'.join(wumpus_str(nx, ny) for nx, ny in _neighbour_cells(x, y, xmin, xmax, ymin, ymax)) + ')'
 
 	return axiom
 
 
 
-def generate_wumpus_and_stench_axioms(xmin, xmax, ymin, ymax):
-	axioms = []
+def iter_wumpus_and_stench_axioms(xmin, xmax, ymin, ymax):
+	"""
+	Lazy version of generate_wumpus_and_stench_axioms: yields the axioms one
+	at a time, skipping empty ones.
+	"""
+	for x, y in world_geometry(xmin, xmax, ymin, ymax).cells:
+		axiom = axiom_generator_wumpus_and_stench(x, y, xmin, xmax, ymin, ymax)
+		if axiom: yield axiom
+
 
 
-	for x in range(xmin, xmax + 1):
-		for y in range(ymin, ymax + 1):
-			axioms.append(axiom_generator_wumpus_and_stench(x, y, xmin, xmax, ymin, ymax))
+def generate_wumpus_and_stench_axioms(xmin, xmax, ymin, ymax):
+	axioms = list(iter_wumpus_and_stench_axioms(xmin, xmax, ymin, ymax))
+
 
 	if utils.all_empty_strings(axioms):
 		utils.print_not_implemented('axiom_generator_wumpus_and_stench')
@@ -345,9 +706,8 @@ def axiom_generator_at_least_one_wumpus(xmin, xmax, ymin, ymax):
 	symbols = []
 
 
-	for x in range(xmin, xmax + 1):
-		for y in range(ymin, ymax + 1):
-			symbols.append(wumpus_str(x, y))
+	for x, y in world_geometry(xmin, xmax, ymin, ymax).cells:
+		symbols.append(wumpus_str(x, y))
 
 	axiom = '|'.join(str(symbol) for symbol in symbols)
 
@@ -355,29 +715,39 @@ def axiom_generator_at_least_one_wumpus(xmin, xmax, ymin, ymax):
 
 
 
-def axiom_generator_at_most_one_wumpus(xmin, xmax, ymin, ymax):
+def axiom_generator_at_most_one_wumpus(xmin, xmax, ymin, ymax, encoding=None):
 	"""
 	Assert that there is at at most one Wumpus.
 
 	xmin, xmax, ymin, ymax := the bounds of the environment.
+	encoding := one of amo_encodings (see Cardinality encodings); default
+		picked by the number of locations (see default_amo_encoding)
 	"""
-	clauses = []
-	symbols = []
+	axiom = '&'.join(iter_at_most_one_wumpus_axioms(xmin, xmax, ymin, ymax, encoding))
 
 
-	for x in range(xmin, xmax + 1):
-		for y in range(ymin, ymax + 1):
-			symbols.append(wumpus_str(x, y))
+	return axiom
 
 
-	for lhsIndex, lhsSymbol in enumerate(symbols[:-1]):
-		for rhsSymbol in symbols[lhsIndex + 1:]:
-			clauses.append('~(' + lhsSymbol + '&' + rhsSymbol + ')')
 
+def iter_at_most_one_wumpus_axioms(xmin, xmax, ymin, ymax, encoding=None):
+	"""
+	The conjuncts of axiom_generator_at_most_one_wumpus, one at a time: the
+	pairwise encoding is quadratic in the number of locations, so on big
+	maps this avoids building the whole conjunction.
+	"""
+	if encoding is None: encoding = default_amo_encoding((xmax - xmin + 1) * (ymax - ymin + 1))
+	if encoding != 'pairwise':
+		for clause in clause_generator_at_most_one_wumpus(xmin, xmax, ymin, ymax, encoding=encoding):
+			yield propositions.clause_str(clause)
+		return
+
+	symbols = [wumpus_str(x, y) for x, y in world_geometry(xmin, xmax, ymin, ymax).cells]
 
-	axiom = '&'.join(str(clause) for clause in clauses)
 
-	return axiom
+	for lhsIndex in range(len(symbols) - 1):
+		for rhsIndex in range(lhsIndex + 1, len(symbols)):
+			yield '~(' + symbols[lhsIndex] + '&' + symbols[rhsIndex] + ')'
 
 
 
@@ -392,13 +762,12 @@ def axiom_generator_only_in_one_location(xi, yi, xmin, xmax, ymin, ymax, t=0):
 	symbols = []
 
 
-	for x in range(xmin, xmax + 1):
-		for y in range(ymin, ymax + 1):
-			symbol = state_loc_str(x, y, t)
+	for x, y in world_geometry(xmin, xmax, ymin, ymax).cells:
+		symbol = state_loc_str(x, y, t)
 
 
-			if (x == xi and y == yi): symbols.append(symbol)
-			else: symbols.append('~' + symbol)
+		if (x == xi and y == yi): symbols.append(symbol)
+		else: symbols.append('~' + symbol)
 
 	axiom = '&'.join(str(symbol) for symbol in symbols)
 
@@ -448,17 +817,25 @@ def axiom_generator_have_arrow_and_wumpus_alive(t=0):
 
 
 
-def initial_wumpus_axioms(xi, yi, width, height, heading='east'):
+def initial_wumpus_axioms(xi, yi, width, height, heading='east', lazy=False):
 	"""
 	Generate all of the initial wumpus axioms
 	
 	xi,yi = initial location
 	width,height = dimensions of world
 	heading = str representation of the initial agent heading
+	lazy = only generate the pit/breeze and wumpus/stench axioms of the
+		initial location and its neighbours; the agent must then add
+		generate_cell_axioms for the other locations as it gets next to them
+		(see generate_cell_axioms)
 	"""
 	axioms = [axiom_generator_initial_location_assertions(xi, yi)]
-	axioms.extend(generate_pit_and_breeze_axioms(1, width, 1, height))
-	axioms.extend(generate_wumpus_and_stench_axioms(1, width, 1, height))
+	if lazy:
+		for x, y in locations(1, width, 1, height, frontier_cells([(xi, yi)], 1, width, 1, height)):
+			axioms.extend(generate_cell_axioms(x, y, width, height))
+	else:
+		axioms.extend(generate_pit_and_breeze_axioms(1, width, 1, height))
+		axioms.extend(generate_wumpus_and_stench_axioms(1, width, 1, height))
 	
 	axioms.append(axiom_generator_at_least_one_wumpus(1, width, 1, height))
 	axioms.append(axiom_generator_at_most_one_wumpus(1, width, 1, height))
@@ -472,9 +849,93 @@ def initial_wumpus_axioms(xi, yi, width, height, heading='east'):
 
 
 
+def iter_initial_wumpus_axioms(xi, yi, width, height, heading='east', lazy=False):
+	"""
+	Lazy version of initial_wumpus_axioms, for consumers that take the
+	axioms one at a time: the at most one Wumpus axiom comes conjunct by
+	conjunct (see iter_at_most_one_wumpus_axioms).
+	"""
+	yield axiom_generator_initial_location_assertions(xi, yi)
+	if lazy:
+		for x, y in locations(1, width, 1, height, frontier_cells([(xi, yi)], 1, width, 1, height)):
+			yield from generate_cell_axioms(x, y, width, height)
+	else:
+		yield from iter_pit_and_breeze_axioms(1, width, 1, height)
+		yield from iter_wumpus_and_stench_axioms(1, width, 1, height)
+
+	yield axiom_generator_at_least_one_wumpus(1, width, 1, height)
+	yield from iter_at_most_one_wumpus_axioms(1, width, 1, height)
+	yield axiom_generator_only_in_one_location(xi, yi, 1, width, 1, height)
+	yield axiom_generator_only_one_heading(heading)
+	yield axiom_generator_have_arrow_and_wumpus_alive()
+
+
+
+def generate_cell_axioms(x, y, width, height):
+	"""
+	The atemporal axioms of a single location: its breeze <=> pits and
+	stench <=> wumpi axioms.
+
+	Breeze and Stench of a location are only constrained by the percept
+	links (see generate_breeze_percept_and_location_axioms), which bear on
+	Pits and Wumpi once the agent has been there, and on the location
+	fluents of the agent's neighbourhood.  So the axioms of a location can
+	be left out until the agent visits it or one of its neighbours (or a
+	query asks about its Breeze, Stench or location fluent).  This keeps
+	the KB small on big, sparsely explored maps.
+	"""
+	return [axiom_generator_pits_and_breezes(x, y, 1, width, 1, height),
+		axiom_generator_wumpus_and_stench(x, y, 1, width, 1, height)]
+
+
+
 #-------------------------------------------------------------------------------
 # Axiom Generators: Temporal Axioms (added at each time step)
 #-------------------------------------------------------------------------------
+def locations(xmin, xmax, ymin, ymax, cells=None):
+	"""
+	The locations within the bounds, in x-major order: all of them, or only
+	those in cells (e.g. a frontier_cells set) when given.
+	"""
+	if cells is None and _dense(xmin, xmax, ymin, ymax): return list(world_geometry(xmin, xmax, ymin, ymax).cells)
+
+
+	if cells is None: return [(x, y) for x in range(xmin, xmax + 1) for y in range(ymin, ymax + 1)]
+	return sorted((x, y) for x, y in cells if xmin <= x <= xmax and ymin <= y <= ymax)
+
+
+
+def _iter_locations(xmin, xmax, ymin, ymax, cells=None):
+	# locations() without copying the geometry's cell list.
+	if cells is None and _dense(xmin, xmax, ymin, ymax): return world_geometry(xmin, xmax, ymin, ymax).cells
+
+
+	return locations(xmin, xmax, ymin, ymax, cells)
+
+
+
+def frontier_cells(visited, xmin, xmax, ymin, ymax):
+	"""
+	The visited locations and their neighbours within the bounds.
+
+	Passed as cells to generate_square_OK_axioms and the percept link
+	generators, this restricts the per-step axioms to the locations current
+	queries can depend on: the agent is only ever in a visited location,
+	and only Pits and Wumpi next to a visited location are constrained by
+	percepts.  The per-step axioms of any other location only define
+	propositions that nothing else constrains, so they can be added when a
+	query first asks about that location without changing any answer.
+	"""
+	cells = set()
+
+
+	for x, y in visited:
+		cells.update(_neighbour_cells(x, y, xmin, xmax, ymin, ymax))
+
+	return cells
+
+
+
 def axiom_generator_location_OK(x, y, t):
 	"""
 	Assert the conditions under which a location is safe for the Agent.
@@ -490,14 +951,18 @@ def axiom_generator_location_OK(x, y, t):
 
 
 
-def generate_square_OK_axioms(t, xmin, xmax, ymin, ymax):
-	axioms = []
-	for x in range(xmin, xmax + 1):
-		for y in range(ymin, ymax + 1):
-			axioms.append(axiom_generator_location_OK(x, y, t))
+def iter_square_OK_axioms(t, xmin, xmax, ymin, ymax, cells=None):
+	for x, y in _iter_locations(xmin, xmax, ymin, ymax, cells):
+		axiom = axiom_generator_location_OK(x, y, t)
+		if axiom: yield axiom
+
+
+
+def generate_square_OK_axioms(t, xmin, xmax, ymin, ymax, cells=None):
+	axioms = list(iter_square_OK_axioms(t, xmin, xmax, ymin, ymax, cells))
 	if utils.all_empty_strings(axioms):
 		utils.print_not_implemented('axiom_generator_location_OK')
-	return list(filter(lambda s: s != '', axioms))
+	return axioms
 
 
 
@@ -519,14 +984,18 @@ def axiom_generator_breeze_percept_and_location_property(x, y, t):
 
 
 
-def generate_breeze_percept_and_location_axioms(t, xmin, xmax, ymin, ymax):
-	axioms = []
-	for x in range(xmin, xmax + 1):
-		for y in range(ymin, ymax + 1):
-			axioms.append(axiom_generator_breeze_percept_and_location_property(x, y, t))
+def iter_breeze_percept_and_location_axioms(t, xmin, xmax, ymin, ymax, cells=None):
+	for x, y in _iter_locations(xmin, xmax, ymin, ymax, cells):
+		axiom = axiom_generator_breeze_percept_and_location_property(x, y, t)
+		if axiom: yield axiom
+
+
+
+def generate_breeze_percept_and_location_axioms(t, xmin, xmax, ymin, ymax, cells=None):
+	axioms = list(iter_breeze_percept_and_location_axioms(t, xmin, xmax, ymin, ymax, cells))
 	if utils.all_empty_strings(axioms):
 		utils.print_not_implemented('axiom_generator_breeze_percept_and_location_property')
-	return list(filter(lambda s: s != '', axioms))
+	return axioms
 
 
 
@@ -545,14 +1014,18 @@ def axiom_generator_stench_percept_and_location_property(x, y, t):
 
 
 
-def generate_stench_percept_and_location_axioms(t, xmin, xmax, ymin, ymax):
-	axioms = []
-	for x in range(xmin, xmax + 1):
-		for y in range(ymin, ymax + 1):
-			axioms.append(axiom_generator_stench_percept_and_location_property(x, y, t))
+def iter_stench_percept_and_location_axioms(t, xmin, xmax, ymin, ymax, cells=None):
+	for x, y in _iter_locations(xmin, xmax, ymin, ymax, cells):
+		axiom = axiom_generator_stench_percept_and_location_property(x, y, t)
+		if axiom: yield axiom
+
+
+
+def generate_stench_percept_and_location_axioms(t, xmin, xmax, ymin, ymax, cells=None):
+	axioms = list(iter_stench_percept_and_location_axioms(t, xmin, xmax, ymin, ymax, cells))
 	if utils.all_empty_strings(axioms):
 		utils.print_not_implemented('axiom_generator_stench_percept_and_location_property')
-	return list(filter(lambda s: s != '', axioms))
+	return axioms
 
 
 
@@ -603,20 +1076,153 @@ def generate_at_location_ssa(t, x, y, xmin, xmax, ymin, ymax, heading):
 	forward on the next turn).
 	This is sufficient for tracking the current location, which will be the
 	single L location that evaluates to True; however, the other locations
-	may be False or Unknown.
-	"""
-	axioms = [axiom_generator_at_location_ssa(t, x, y, xmin, xmax, ymin, ymax)]
-	if heading == 'west' and x - 1 >= xmin:
-		axioms.append(axiom_generator_at_location_ssa(t, x - 1, y, xmin, xmax, ymin, ymax))
-	if heading == 'east' and x + 1 <= xmax:
-		axioms.append(axiom_generator_at_location_ssa(t, x + 1, y, xmin, xmax, ymin, ymax))
-	if heading == 'south' and y - 1 >= ymin:
-		axioms.append(axiom_generator_at_location_ssa(t, x, y - 1, xmin, xmax, ymin, ymax))
-	if heading == 'north' and y + 1 <= ymax:
-		axioms.append(axiom_generator_at_location_ssa(t, x, y + 1, xmin, xmax, ymin, ymax))
+	may be False or Unknown (see generate_full_at_location_ssa for an
+	encoding that is small enough to cover every location).
+	"""
+	axioms = list(iter_at_location_ssa_axioms(t, x, y, xmin, xmax, ymin, ymax, heading))
 	if utils.all_empty_strings(axioms):
 		utils.print_not_implemented('axiom_generator_at_location_ssa')
-	return list(filter(lambda s: s != '', axioms))
+	return axioms
+
+
+
+def iter_at_location_ssa_axioms(t, x, y, xmin, xmax, ymin, ymax, heading):
+	"""
+	Lazy version of generate_at_location_ssa: yields the axioms one at a
+	time, skipping empty ones.
+	"""
+	axiom = axiom_generator_at_location_ssa(t, x, y, xmin, xmax, ymin, ymax)
+	if axiom: yield axiom
+
+
+	ahead = _forward_cell(x, y, xmin, xmax, ymin, ymax, heading)
+	if ahead is not None:
+		axiom = axiom_generator_at_location_ssa(t, ahead[0], ahead[1], xmin, xmax, ymin, ymax)
+		if axiom: yield axiom
+
+
+
+#----------------------------------
+# Compact at_location SSA
+#
+# The disjuncts of the at_location SSA share their conditions across
+# locations, so they are named once per step by auxiliary fluents:
+#	MoveForward{t} <=> Forward{t} & ~Bump{t+1}
+#	MoveNorth{t} <=> MoveForward{t} & HeadingNorth{t}, etc.
+# and the SSA of each location becomes a conjunction of short implications
+# over in-bounds locations only.  Given that the agent is in one location at
+# time t, it is equivalent to axiom_generator_at_location_ssa, and cheap
+# enough to be generated for every location (full-grid location tracking).
+at_location_move_bases = ['MoveForward', 'MoveNorth', 'MoveEast', 'MoveSouth', 'MoveWest']
+
+
+
+# Moved forward (no bump) at time <t>
+def move_forward_str(t):
+	return 'MoveForward{0}'.format(t)
+
+
+
+# Moved one location towards heading at time <t>
+def move_heading_str(heading, t):
+	return 'Move{0}{1}'.format(heading.capitalize(), t)
+
+
+
+def axiom_generator_move_forward(t):
+	"""
+	Assert that the agent moves at time t iff it goes Forward without
+	bumping into a wall.
+
+	t := time
+	"""
+	axiom = move_forward_str(t) + '<=>(' + action_forward_str(t) + '&~' + percept_bump_str(t + 1) + ')'
+
+
+	return axiom
+
+
+
+def axiom_generator_move_heading(heading, t):
+	"""
+	Assert that the agent moves towards heading at time t iff it moves while
+	facing heading.
+
+	heading := 'north', 'east', 'south' or 'west'
+	t := time
+	"""
+	axiom = move_heading_str(heading, t) + '<=>(' + move_forward_str(t) + '&' + add_time_stamp('Heading' + heading.capitalize(), t) + ')'
+
+
+	return axiom
+
+
+
+def generate_move_axioms(t):
+	axioms = [axiom_generator_move_forward(t)]
+	axioms.extend(axiom_generator_move_heading(heading, t) for heading in ('north', 'east', 'south', 'west'))
+
+
+	return axioms
+
+
+
+def _at_location_sources(x, y, xmin, xmax, ymin, ymax):
+	"""
+	[(x', y', move)] for each way of being at x,y one step later: staying at
+	x,y (move None, i.e. not MoveForward), or moving in from an in-bounds
+	neighbour x',y' towards the heading move.
+	"""
+	sources = [(x, y, None)]
+
+
+	for dx, dy, heading in ((1, 0, 'west'), (-1, 0, 'east'), (0, 1, 'south'), (0, -1, 'north')):
+		if xmin <= x + dx <= xmax and ymin <= y + dy <= ymax: sources.append((x + dx, y + dy, heading))
+
+	return sources
+
+
+
+def axiom_generator_compact_at_location_ssa(t, x, y, xmin, xmax, ymin, ymax):
+	"""
+	The at_location SSA of location x,y over the move fluents (see
+	generate_move_axioms):
+		(L{x}_{y}_{t} & ~MoveForward{t}) >> L{x}_{y}_{t+1},
+		(L{x+1}_{y}_{t} & MoveWest{t}) >> L{x}_{y}_{t+1}, etc.
+		L{x}_{y}_{t+1} >> (L{x}_{y}_{t} | L{x+1}_{y}_{t} | ...)
+		(L{x}_{y}_{t+1} & L{x}_{y}_{t}) >> ~MoveForward{t}, etc.
+
+	x,y := location
+	t := time
+	xmin, xmax, ymin, ymax := the bounds of the environment.
+	"""
+	loc = state_loc_str(x, y, t + 1)
+	sources = [(state_loc_str(sx, sy, t), ('~' + move_forward_str(t) if move is None else move_heading_str(move, t)))
+		for sx, sy, move in _at_location_sources(x, y, xmin, xmax, ymin, ymax)]
+
+
+	implications = ['(' + src + '&' + cond + ')>>' + loc for src, cond in sources]
+	implications.append(loc + '>>(' + '|'.join(src for src, cond in sources) + ')')
+	implications.extend('(' + loc + '&' + src + ')>>' + cond for src, cond in sources)
+	axiom = '&'.join('(' + implication + ')' for implication in implications)
+
+	return axiom
+
+
+
+def generate_full_at_location_ssa(t, xmin, xmax, ymin, ymax):
+	"""
+	The move axioms and the compact at_location SSA of every location: the
+	agent's location at t+1 is then entailed wherever it is entailed at t,
+	and so is every location it is not in.
+	"""
+	axioms = generate_move_axioms(t)
+
+
+	for x, y in locations(xmin, xmax, ymin, ymax):
+		axioms.append(axiom_generator_compact_at_location_ssa(t, x, y, xmin, xmax, ymin, ymax))
+
+	return axioms
 
 
 
@@ -737,11 +1343,18 @@ def generate_non_location_ssa(t):
 	"""
 	Generate all non-location-based SSAs
 	"""
-	axioms = [] # all_state_loc_ssa(t, xmin, xmax, ymin, ymax)
-	axioms.append(axiom_generator_have_arrow_ssa(t))
-	axioms.append(axiom_generator_wumpus_alive_ssa(t))
-	axioms.extend(generate_heading_ssa(t))
-	return list(filter(lambda s: s != '', axioms))
+	return list(iter_non_location_ssa_axioms(t))
+
+
+
+def iter_non_location_ssa_axioms(t):
+	"""
+	Lazy version of generate_non_location_ssa: yields the axioms one at a
+	time, skipping empty ones.
+	"""
+	for axiom in itertools.chain([axiom_generator_have_arrow_ssa(t), axiom_generator_wumpus_alive_ssa(t)],
+			generate_heading_ssa(t)):
+		if axiom: yield axiom
 
 
 
@@ -802,18 +1415,29 @@ def axiom_generator_heading_only_west(t):
 
 
 
-def generate_heading_only_one_direction_axioms(t):
+def generate_heading_only_one_direction_axioms(t, encoding=None):
+	# With an encoding (see Cardinality encodings), the four axioms are
+	# replaced by a single exactly-one constraint in that encoding.
+	if encoding is not None:
+		return [clauses_str(generate_heading_only_one_direction_clauses(t, encoding=encoding))]
+
 	return [axiom_generator_heading_only_north(t), axiom_generator_heading_only_east(t),
 		axiom_generator_heading_only_south(t), axiom_generator_heading_only_west(t)]
 
 
 
-def axiom_generator_only_one_action_axioms(t):
+def axiom_generator_only_one_action_axioms(t, encoding=None):
 	"""
 	Assert that only one axiom can be executed at a time.
 	
 	t := time
+	encoding := one of amo_encodings (see Cardinality encodings); default
+		picked by the number of actions (see default_amo_encoding)
 	"""
+	if encoding is None: encoding = default_amo_encoding(len(proposition_bases_actions))
+	if encoding != 'pairwise':
+		return clauses_str(clause_generator_only_one_action_axioms(t, encoding=encoding))
+
 	clauses = []
 	symbols = [action_forward_str(t), action_grab_str(t), action_shoot_str(t), action_climb_str(t),
 			action_turn_left_str(t), action_turn_right_str(t), action_wait_str(t)]
@@ -833,14 +1457,945 @@ def axiom_generator_only_one_action_axioms(t):
 
 def generate_mutually_exclusive_axioms(t):
 	# Generate all time-based mutually exclusive axioms.
-	axioms = []
+	return list(iter_mutually_exclusive_axioms(t))
 
+
+
+def iter_mutually_exclusive_axioms(t):
+	"""
+	Lazy version of generate_mutually_exclusive_axioms: yields the axioms one
+	at a time, skipping empty ones.
+	"""
 	# must be t+1 to constrain which direction could be heading _next_
-	axioms.extend(generate_heading_only_one_direction_axioms(t + 1))
+	for axiom in generate_heading_only_one_direction_axioms(t + 1):
+		if axiom: yield axiom
 
 	# actions occur in current time, after percept
-	axioms.append(axiom_generator_only_one_action_axioms(t))
+	axiom = axiom_generator_only_one_action_axioms(t)
+	if axiom: yield axiom
+
+#-------------------------------------------------------------------------------
 
-	return list(filter(lambda s: s != '', axioms))
 
+
+#-------------------------------------------------------------------------------
+# Clause Generators
+#
+# CNF counterparts of the axiom generators above.  Each clause_generator_*
+# returns the same axiom as its axiom_generator_* twin, but as a list of
+# clauses, each clause a tuple of signed integer literals over the IDs of a
+# PropositionRegistry (the module-level 'propositions' unless reg is given).
+# This skips parsing the infix strings and the generic CNF conversion; the
+# string API stays available for debugging (see clauses_str).
 #-------------------------------------------------------------------------------
+def _registry(reg):
+	return propositions if reg is None else reg
+
+
+
+def clauses_str(clauses, reg=None):
+	"""
+	Renders a list of clauses as an infix string, for debugging.
+	"""
+	reg = _registry(reg)
+
+
+	return '&'.join(reg.clause_str(clause) for clause in clauses)
+
+
+
+def count_clauses(clauses):
+	"""
+	(number of clauses, number of literals) of an iterable of clauses,
+	consumed without being held (e.g. one of the iter_* generators).
+	"""
+	count = literals = 0
+
+
+	for clause in clauses:
+		count += 1
+		literals += len(clause)
+
+	return count, literals
+
+
+
+def clauses_iff_or(lhs, rhs):
+	"""
+	CNF of lhs <=> (rhs[0] | rhs[1] | ...), for literals lhs and rhs.
+	"""
+	clauses = [(-lhs,) + tuple(rhs)]
+
+
+	clauses.extend((lhs, -lit) for lit in rhs)
+
+	return clauses
+
+
+
+def clauses_iff_dnf(lhs, terms):
+	"""
+	CNF of lhs <=> (T0 | T1 | ...), where each term Ti is a tuple of
+	literals read as a conjunction.  The lhs => ... direction is expanded by
+	distribution, dropping tautological clauses, so only use this when the
+	terms are few and short (see clause_generator_at_location_ssa for the
+	Tseitin alternative).
+	"""
+	products = [(-lhs,)]
+
+
+	for term in terms:
+		products = [clause + (lit,) for clause in products for lit in term
+			if -lit not in clause]
+
+	clauses = [tuple(dict.fromkeys(clause)) for clause in products]
+	clauses.extend((lhs,) + tuple(-lit for lit in term) for term in terms)
+
+	return clauses
+
+
+
+#----------------------------------
+# Cardinality encodings
+#
+# At-most-one constraints over n literals, with the auxiliary propositions
+# of the non-pairwise encodings keyed (<aux><role>, 0, i, t), <aux> being a
+# base name chosen by the caller (e.g. 'WumpusAmo'):
+#	pairwise   - n(n-1)/2 binary clauses, no auxiliaries
+#	sequential - sequential counter (Sinz 2005), 3n-4 clauses, n-1 auxiliaries
+#	commander  - commander encoding (Klieber & Kwon 2007) with groups of 3,
+#				~3.5n clauses, ~n/2 auxiliaries
+#	product    - 2-product encoding (Chen 2010), ~2n+4sqrt(n) clauses,
+#				~2sqrt(n) auxiliaries
+#----------------------------------
+amo_encodings = ['pairwise', 'sequential', 'commander', 'product']
+
+
+
+def default_amo_encoding(n):
+	"""
+	Pairwise is smallest up to a handful of literals; the sequential counter
+	propagates best for medium n; the product encoding has the fewest
+	clauses and auxiliaries on large grids.
+	"""
+	if n <= 6: return 'pairwise'
+	if n <= 64: return 'sequential'
+
+	return 'product'
+
+
+
+def clauses_at_most_one(lits, encoding=None, aux=None, t=None, reg=None):
+	"""
+	Clauses asserting that at most one of lits is True.
+
+	lits := list of literals
+	encoding := one of amo_encodings; default=default_amo_encoding(len(lits))
+	aux := base name for auxiliary propositions (required unless pairwise)
+	t := time stamp of the auxiliary propositions; default=None (atemporal)
+	"""
+	lits = list(lits)
+	if encoding is None: encoding = default_amo_encoding(len(lits))
+
+
+	if len(lits) <= 1: return []
+	if encoding == 'pairwise' or len(lits) == 2:
+		return [(-lhs, -rhs) for i, lhs in enumerate(lits) for rhs in lits[i + 1:]]
+	if aux is None: raise ValueError('The {0} encoding needs an aux base name'.format(encoding))
+
+	v = _registry(reg).var
+	if encoding == 'sequential':
+		s = [v(aux + 'Seq', 0, i, t) for i in range(len(lits) - 1)]
+		clauses = [(-lits[0], s[0])]
+		for i in range(1, len(lits) - 1):
+			clauses.extend([(-lits[i], s[i]), (-s[i - 1], s[i]), (-lits[i], -s[i - 1])])
+		clauses.append((-lits[-1], -s[-1]))
+
+		return clauses
+
+	if encoding == 'commander':
+		if len(lits) <= 3: return clauses_at_most_one(lits, 'pairwise')
+
+		clauses = []
+		commanders = []
+		for i in range(0, len(lits), 3):
+			group = lits[i:i + 3]
+			commander = v(aux + 'Cmd', 0, i // 3, t)
+			commanders.append(commander)
+			clauses.extend(clauses_at_most_one(group, 'pairwise'))
+			clauses.extend((-lit, commander) for lit in group)
+			clauses.append((-commander,) + tuple(group))
+		clauses.extend(clauses_at_most_one(commanders, 'commander', aux + 'Cmd', t, reg))
+
+		return clauses
+
+	if encoding == 'product':
+		if len(lits) <= 6: return clauses_at_most_one(lits, 'pairwise')
+
+		p = 1
+		while p * p < len(lits): p += 1
+		q = (len(lits) + p - 1) // p
+		rows = [v(aux + 'Row', 0, i, t) for i in range((len(lits) + q - 1) // q)]
+		cols = [v(aux + 'Col', 0, j, t) for j in range(q)]
+		clauses = []
+		for k, lit in enumerate(lits):
+			clauses.extend([(-lit, rows[k // q]), (-lit, cols[k % q])])
+		clauses.extend(clauses_at_most_one(rows, 'product', aux + 'Row', t, reg))
+		clauses.extend(clauses_at_most_one(cols, 'product', aux + 'Col', t, reg))
+
+		return clauses
+
+	raise ValueError('Unknown at-most-one encoding: {0!r}'.format(encoding))
+
+
+
+def iter_at_most_one(lits, encoding=None, aux=None, t=None, reg=None):
+	"""
+	Lazy version of clauses_at_most_one: the pairwise encoding, quadratic in
+	the number of literals, is yielded clause by clause.
+	"""
+	lits = list(lits)
+	if encoding is None: encoding = default_amo_encoding(len(lits))
+
+
+	if encoding != 'pairwise' and len(lits) > 2:
+		yield from clauses_at_most_one(lits, encoding, aux, t, reg)
+		return
+	for i in range(len(lits) - 1):
+		lhs = -lits[i]
+		for j in range(i + 1, len(lits)): yield (lhs, -lits[j])
+
+
+
+def clauses_exactly_one(lits, encoding=None, aux=None, t=None, reg=None):
+	lits = list(lits)
+
+
+	return [tuple(lits)] + clauses_at_most_one(lits, encoding, aux, t, reg)
+
+
+
+def clause_generator_percept_sentence(t, tvec, reg=None):
+	"""
+	Unit clauses for each percept proposition at time t; see
+	axiom_generator_percept_sentence.
+	"""
+	v = _registry(reg).var
+
+
+	return [((lit if true else -lit),) for lit, true in zip((v('Stench', t=t), v('Breeze', t=t),
+		v('Glitter', t=t), v('Bump', t=t), v('Scream', t=t)), tvec)]
+
+
+
+def clause_generator_initial_location_assertions(x, y, reg=None):
+	v = _registry(reg).var
+
+
+	return [(-v('P', x, y),), (-v('W', x, y),)]
+
+
+
+def clause_generator_pits_and_breezes(x, y, xmin, xmax, ymin, ymax, reg=None):
+	v = _registry(reg).var
+
+
+	return clauses_iff_or(v('B', x, y), [v('P', nx, ny) for nx, ny in _neighbour_cells(x, y, xmin, xmax, ymin, ymax)])
+
+
+
+def _iter_neighbourhood_iff_or(lhs_base, rhs_base, xmin, xmax, ymin, ymax, reg):
+	# lhs_base{x}_{y} <=> (rhs_base over the neighbourhood of x,y), for every
+	# location, in the clause order of clauses_iff_or.
+	geometry = world_geometry(xmin, xmax, ymin, ymax)
+	lhs, rhs = geometry.cell_ids(lhs_base, reg), geometry.cell_ids(rhs_base, reg)
+	starts, neighbours = geometry.neighbour_starts, geometry.neighbours
+
+
+	for i in range(len(geometry.cells)):
+		lits = [rhs[j] for j in neighbours[starts[i]:starts[i + 1]]]
+		yield (-lhs[i],) + tuple(lits)
+		for lit in lits: yield (lhs[i], -lit)
+
+
+
+def iter_pit_and_breeze_clauses(xmin, xmax, ymin, ymax, reg=None):
+	"""
+	Lazy version of generate_pit_and_breeze_clauses.
+	"""
+	return _iter_neighbourhood_iff_or('B', 'P', xmin, xmax, ymin, ymax, reg)
+
+
+
+def generate_pit_and_breeze_clauses(xmin, xmax, ymin, ymax, reg=None):
+	return list(iter_pit_and_breeze_clauses(xmin, xmax, ymin, ymax, reg))
+
+
+
+def clause_generator_wumpus_and_stench(x, y, xmin, xmax, ymin, ymax, reg=None):
+	v = _registry(reg).var
+
+
+	return clauses_iff_or(v('S', x, y), [v('W', nx, ny) for nx, ny in _neighbour_cells(x, y, xmin, xmax, ymin, ymax)])
+
+
+
+def iter_wumpus_and_stench_clauses(xmin, xmax, ymin, ymax, reg=None):
+	"""
+	Lazy version of generate_wumpus_and_stench_clauses.
+	"""
+	return _iter_neighbourhood_iff_or('S', 'W', xmin, xmax, ymin, ymax, reg)
+
+
+
+def generate_wumpus_and_stench_clauses(xmin, xmax, ymin, ymax, reg=None):
+	return list(iter_wumpus_and_stench_clauses(xmin, xmax, ymin, ymax, reg))
+
+
+
+def _wumpus_vars(xmin, xmax, ymin, ymax, reg):
+	return list(world_geometry(xmin, xmax, ymin, ymax).cell_ids('W', reg))
+
+
+
+def clause_generator_at_least_one_wumpus(xmin, xmax, ymin, ymax, reg=None):
+	return [tuple(_wumpus_vars(xmin, xmax, ymin, ymax, reg))]
+
+
+
+def clause_generator_at_most_one_wumpus(xmin, xmax, ymin, ymax, reg=None, encoding=None):
+	"""
+	encoding := one of amo_encodings; default picked by the number of cells
+	"""
+	lits = _wumpus_vars(xmin, xmax, ymin, ymax, reg)
+
+
+	return clauses_at_most_one(lits, encoding, 'WumpusAmo', None, reg)
+
+
+
+def iter_at_most_one_wumpus_clauses(xmin, xmax, ymin, ymax, reg=None, encoding=None):
+	"""
+	Lazy version of clause_generator_at_most_one_wumpus.
+	"""
+	return iter_at_most_one(_wumpus_vars(xmin, xmax, ymin, ymax, reg), encoding, 'WumpusAmo', None, reg)
+
+
+
+def clause_generator_only_in_one_location(xi, yi, xmin, xmax, ymin, ymax, t=0, reg=None, cells=None):
+	"""
+	cells := only assert the location fluents of these locations (e.g.
+		sparse_location_cells); default=None (every location)
+	"""
+	v = _registry(reg).var
+
+
+	return [((v('L', x, y, t) if (x == xi and y == yi) else -v('L', x, y, t)),)
+		for x, y in _iter_locations(xmin, xmax, ymin, ymax, cells)]
+
+
+
+headings = ['north', 'east', 'south', 'west']
+heading_bases = ['HeadingNorth', 'HeadingEast', 'HeadingSouth', 'HeadingWest']
+
+
+
+def clause_generator_only_one_heading(heading='north', t=0, reg=None):
+	v = _registry(reg).var
+
+
+	return [((v(base, t=t) if heading == name else -v(base, t=t)),)
+		for name, base in zip(headings, heading_bases)]
+
+
+
+def clause_generator_have_arrow_and_wumpus_alive(t=0, reg=None):
+	v = _registry(reg).var
+
+
+	return [(v('HaveArrow', t=t),), (v('WumpusAlive', t=t),)]
+
+
+
+def generate_cell_clauses(x, y, width, height, reg=None):
+	"""
+	CNF counterpart of generate_cell_axioms.
+	"""
+	clauses = clause_generator_pits_and_breezes(x, y, 1, width, 1, height, reg)
+	clauses.extend(clause_generator_wumpus_and_stench(x, y, 1, width, 1, height, reg))
+
+
+	return clauses
+
+
+
+def initial_wumpus_clauses(xi, yi, width, height, heading='east', reg=None, lazy=False):
+	"""
+	CNF counterpart of initial_wumpus_axioms: static_wumpus_clauses (only
+	those of the initial location and its neighbours when lazy), then
+	initial_state_clauses.
+	"""
+	return list(iter_initial_wumpus_clauses(xi, yi, width, height, heading, reg, lazy))
+
+
+
+def iter_initial_wumpus_clauses(xi, yi, width, height, heading='east', reg=None, lazy=False):
+	"""
+	Lazy version of initial_wumpus_clauses: yields the clauses one at a time
+	straight into a consumer (e.g. KBSession.tell or a solver's add_clause),
+	so the initial KB is never held as a list.
+	"""
+	if lazy:
+		for x, y in locations(1, width, 1, height, frontier_cells([(xi, yi)], 1, width, 1, height)):
+			yield from generate_cell_clauses(x, y, width, height, reg)
+		yield from clause_generator_at_least_one_wumpus(1, width, 1, height, reg)
+		yield from iter_at_most_one_wumpus_clauses(1, width, 1, height, reg)
+	else:
+		yield from iter_static_wumpus_clauses(width, height, reg)
+	yield from initial_state_clauses(xi, yi, width, height, heading, reg)
+
+
+
+def static_wumpus_clauses(width, height, reg=None):
+	"""
+	The part of the initial clauses that is the same in every episode on a
+	width x height map: the pit/breeze and wumpus/stench axioms and the
+	exactly-one Wumpus constraint.
+	"""
+	return list(iter_static_wumpus_clauses(width, height, reg))
+
+
+
+def iter_static_wumpus_clauses(width, height, reg=None):
+	"""
+	Lazy version of static_wumpus_clauses.
+	"""
+	yield from iter_pit_and_breeze_clauses(1, width, 1, height, reg)
+	yield from iter_wumpus_and_stench_clauses(1, width, 1, height, reg)
+	yield from clause_generator_at_least_one_wumpus(1, width, 1, height, reg)
+	yield from iter_at_most_one_wumpus_clauses(1, width, 1, height, reg)
+
+
+
+def initial_state_clauses(xi, yi, width, height, heading='east', reg=None, cells=None):
+	"""
+	The rest of the initial clauses, that depend on the episode: the agent's
+	initial location (safe, and the only one, among cells if given, see
+	clause_generator_only_in_one_location), heading, arrow and Wumpus.
+	"""
+	clauses = clause_generator_initial_location_assertions(xi, yi, reg)
+	clauses.extend(clause_generator_only_in_one_location(xi, yi, 1, width, 1, height, reg=reg, cells=cells))
+	clauses.extend(clause_generator_only_one_heading(heading, reg=reg))
+	clauses.extend(clause_generator_have_arrow_and_wumpus_alive(reg=reg))
+
+
+	return clauses
+
+
+
+#----------------------------------
+# Sparse worlds
+#
+# On big maps nothing is enumerated over the whole grid.  A location is
+# materialized (its propositions first used) when the agent gets near it or
+# a query asks about it, and everything about the other locations is left
+# unconstrained, which doesn't change any answer (see generate_cell_axioms
+# and frontier_cells).  The two axioms that span the whole grid are kept
+# symbolically:
+#	exactly one Wumpus - over the materialized locations and
+#		WumpusRest0_{i}, "the Wumpus is in a location not materialized
+#		by stage i".  The constraint starts as WumpusRest0_0, and the i-th
+#		location materialized splits it (sparse_wumpus_split_clauses):
+#			WumpusRest0_{i} <=> W{x}_{y} | WumpusRest0_{i+1}
+#			~W{x}_{y} | ~WumpusRest0_{i+1}
+#	only in one location - only asserted over the locations the
+#		at_location SSAs of the next step can mention
+#		(sparse_location_cells); as on a dense map, the location fluents
+#		of later steps are only constrained by the SSAs
+#----------------------------------
+def sparse_wumpus_rest(i, reg=None):
+	return _registry(reg).var('WumpusRest', 0, i)
+
+
+
+def sparse_wumpus_split_clauses(x, y, i, last=False, reg=None):
+	"""
+	The clauses materializing W{x}_{y}, the i-th location into the exactly
+	one Wumpus constraint; last := it is the last location of the world,
+	so no Wumpus is left elsewhere.
+	"""
+	rest, nxt, wumpus = sparse_wumpus_rest(i, reg), sparse_wumpus_rest(i + 1, reg), _registry(reg).var('W', x, y)
+	clauses = clauses_iff_or(rest, [wumpus, nxt])
+
+
+	clauses.append((-wumpus, -nxt))
+	if last: clauses.append((-nxt,))
+
+	return clauses
+
+
+
+def sparse_location_cells(x, y, width, height):
+	"""
+	The locations within two moves of x,y: those the at_location SSAs of an
+	agent at x,y can mention.
+	"""
+	return frontier_cells(frontier_cells([(x, y)], 1, width, 1, height), 1, width, 1, height)
+
+
+
+#----------------------------------
+def clause_generator_location_OK(x, y, t, reg=None):
+	"""
+	OK <=> (~P & ~(W & WumpusAlive))
+	"""
+	v = _registry(reg).var
+	ok, pit, wumpus, alive = v('OK', x, y, t), v('P', x, y), v('W', x, y), v('WumpusAlive', t=t)
+
+
+	return [(-ok, -pit), (-ok, -wumpus, -alive), (ok, pit, wumpus), (ok, pit, alive)]
+
+
+
+def iter_square_OK_clauses(t, xmin, xmax, ymin, ymax, reg=None, cells=None):
+	for x, y in _iter_locations(xmin, xmax, ymin, ymax, cells):
+		yield from clause_generator_location_OK(x, y, t, reg)
+
+
+
+def generate_square_OK_clauses(t, xmin, xmax, ymin, ymax, reg=None, cells=None):
+	return list(iter_square_OK_clauses(t, xmin, xmax, ymin, ymax, reg, cells))
+
+
+
+def clause_generator_breeze_percept_and_location_property(x, y, t, reg=None):
+	"""
+	L >> (Breeze <=> B)
+	"""
+	v = _registry(reg).var
+	loc, percept, breeze = v('L', x, y, t), v('Breeze', t=t), v('B', x, y)
+
+
+	return [(-loc, -percept, breeze), (-loc, percept, -breeze)]
+
+
+
+def iter_breeze_percept_and_location_clauses(t, xmin, xmax, ymin, ymax, reg=None, cells=None):
+	for x, y in _iter_locations(xmin, xmax, ymin, ymax, cells):
+		yield from clause_generator_breeze_percept_and_location_property(x, y, t, reg)
+
+
+
+def generate_breeze_percept_and_location_clauses(t, xmin, xmax, ymin, ymax, reg=None, cells=None):
+	return list(iter_breeze_percept_and_location_clauses(t, xmin, xmax, ymin, ymax, reg, cells))
+
+
+
+def clause_generator_stench_percept_and_location_property(x, y, t, reg=None):
+	"""
+	L >> (Stench <=> S)
+	"""
+	v = _registry(reg).var
+	loc, percept, stench = v('L', x, y, t), v('Stench', t=t), v('S', x, y)
+
+
+	return [(-loc, -percept, stench), (-loc, percept, -stench)]
+
+
+
+def iter_stench_percept_and_location_clauses(t, xmin, xmax, ymin, ymax, reg=None, cells=None):
+	for x, y in _iter_locations(xmin, xmax, ymin, ymax, cells):
+		yield from clause_generator_stench_percept_and_location_property(x, y, t, reg)
+
+
+
+def generate_stench_percept_and_location_clauses(t, xmin, xmax, ymin, ymax, reg=None, cells=None):
+	return list(iter_stench_percept_and_location_clauses(t, xmin, xmax, ymin, ymax, reg, cells))
+
+
+
+#----------------------------------
+# Auxiliary propositions of the at_location SSA, one per disjunct:
+# StayAt{x}_{y}_{t} <=> L{x}_{y}_{t} & (Bump{t+1} | Wait{t} | ~Forward{t}),
+# ArriveFromEast{x}_{y}_{t} <=> L{x+1}_{y}_{t} & HeadingWest{t} & Forward{t}, etc.
+at_location_ssa_aux_bases = ['StayAt', 'ArriveFromEast', 'ArriveFromWest', 'ArriveFromNorth', 'ArriveFromSouth']
+
+
+
+def clause_generator_at_location_ssa(t, x, y, xmin, xmax, ymin, ymax, reg=None):
+	"""
+	Tseitin encoding of axiom_generator_at_location_ssa: each of the five
+	disjuncts gets an auxiliary proposition (at_location_ssa_aux_bases), so
+	the SSA becomes 27 short clauses instead of the ~170 that the direct
+	CNF expansion produces.
+	"""
+	v = _registry(reg).var
+	forward = v('Forward', t=t)
+	stay, east, west, north, south = [v(base, x, y, t) for base in at_location_ssa_aux_bases]
+	clauses = clauses_iff_or(v('L', x, y, t + 1), [stay, east, west, north, south])
+
+
+	loc = v('L', x, y, t)
+	clauses.extend([(-stay, loc), (-stay, v('Bump', t=t + 1), v('Wait', t=t), -forward)])
+	clauses.extend([(stay, -loc, -v('Bump', t=t + 1)), (stay, -loc, -v('Wait', t=t)), (stay, -loc, forward)])
+
+	for aux, loc, heading in ((east, v('L', x + 1, y, t), v('HeadingWest', t=t)),
+			(west, v('L', x - 1, y, t), v('HeadingEast', t=t)),
+			(north, v('L', x, y + 1, t), v('HeadingSouth', t=t)),
+			(south, v('L', x, y - 1, t), v('HeadingNorth', t=t))):
+		clauses.extend([(-aux, loc), (-aux, heading), (-aux, forward), (aux, -loc, -heading, -forward)])
+
+	return clauses
+
+
+
+def generate_at_location_ssa_clauses(t, x, y, xmin, xmax, ymin, ymax, heading, reg=None):
+	"""
+	CNF counterpart of generate_at_location_ssa.
+	"""
+	clauses = clause_generator_at_location_ssa(t, x, y, xmin, xmax, ymin, ymax, reg)
+	ahead = _forward_cell(x, y, xmin, xmax, ymin, ymax, heading)
+
+
+	if ahead is not None:
+		clauses.extend(clause_generator_at_location_ssa(t, ahead[0], ahead[1], xmin, xmax, ymin, ymax, reg))
+
+	return clauses
+
+
+
+def generate_move_clauses(t, reg=None):
+	"""
+	CNF counterpart of generate_move_axioms: 15 clauses.
+	"""
+	v = _registry(reg).var
+	move, forward, bump = v('MoveForward', t=t), v('Forward', t=t), v('Bump', t=t + 1)
+	clauses = [(-move, forward), (-move, -bump), (move, -forward, bump)]
+
+
+	for base, heading in zip(at_location_move_bases[1:], heading_bases):
+		aux, heading = v(base, t=t), v(heading, t=t)
+		clauses.extend([(-aux, move), (-aux, heading), (aux, -move, -heading)])
+
+	return clauses
+
+
+
+def clause_generator_compact_at_location_ssa(t, x, y, xmin, xmax, ymin, ymax, reg=None):
+	"""
+	CNF counterpart of axiom_generator_compact_at_location_ssa: at most 11
+	clauses, and no auxiliary propositions of its own.
+	"""
+	v = _registry(reg).var
+	loc = v('L', x, y, t + 1)
+	sources = [(v('L', sx, sy, t), (-v('MoveForward', t=t) if move is None else v('Move' + move.capitalize(), t=t)))
+		for sx, sy, move in _at_location_sources(x, y, xmin, xmax, ymin, ymax)]
+
+
+	clauses = [(-src, -cond, loc) for src, cond in sources]
+	clauses.append((-loc,) + tuple(src for src, cond in sources))
+	clauses.extend((-loc, -src, cond) for src, cond in sources)
+
+	return clauses
+
+
+
+def generate_compact_at_location_ssa_clauses(t, x, y, xmin, xmax, ymin, ymax, heading, reg=None):
+	"""
+	generate_at_location_ssa_clauses over the move fluents: the move clauses
+	and the compact SSAs of the current and facing locations.
+	"""
+	clauses = generate_move_clauses(t, reg)
+	ahead = _forward_cell(x, y, xmin, xmax, ymin, ymax, heading)
+
+
+	clauses.extend(clause_generator_compact_at_location_ssa(t, x, y, xmin, xmax, ymin, ymax, reg))
+	if ahead is not None:
+		clauses.extend(clause_generator_compact_at_location_ssa(t, ahead[0], ahead[1], xmin, xmax, ymin, ymax, reg))
+
+	return clauses
+
+
+
+def generate_full_at_location_ssa_clauses(t, xmin, xmax, ymin, ymax, reg=None, cells=None):
+	"""
+	CNF counterpart of generate_full_at_location_ssa (or, given cells, of
+	the move axioms and the SSAs of those locations only).
+	"""
+	clauses = generate_move_clauses(t, reg)
+
+
+	for x, y in locations(xmin, xmax, ymin, ymax, cells):
+		clauses.extend(clause_generator_compact_at_location_ssa(t, x, y, xmin, xmax, ymin, ymax, reg))
+
+	return clauses
+
+
+
+#----------------------------------
+def clause_generator_have_arrow_ssa(t, reg=None):
+	v = _registry(reg).var
+
+
+	return clauses_iff_dnf(v('HaveArrow', t=t + 1), [(v('HaveArrow', t=t), -v('Shoot', t=t))])
+
+
+
+def clause_generator_wumpus_alive_ssa(t, reg=None):
+	v = _registry(reg).var
+
+
+	return clauses_iff_dnf(v('WumpusAlive', t=t + 1), [(v('WumpusAlive', t=t), -v('Scream', t=t + 1))])
+
+
+
+def _clause_generator_heading_ssa(heading, t, reg):
+	# The heading kept when not turning, reached by turning left, and reached by turning right.
+	i = headings.index(heading)
+	v = _registry(reg).var
+	left, right = v('TurnLeft', t=t), v('TurnRight', t=t)
+
+
+	return clauses_iff_dnf(v(heading_bases[i], t=t + 1), [(v(heading_bases[i], t=t), -left, -right),
+		(v(heading_bases[(i + 1) % 4], t=t), left), (v(heading_bases[(i - 1) % 4], t=t), right)])
+
+
+
+def clause_generator_heading_north_ssa(t, reg=None):
+	return _clause_generator_heading_ssa('north', t, reg)
+
+
+
+def clause_generator_heading_east_ssa(t, reg=None):
+	return _clause_generator_heading_ssa('east', t, reg)
+
+
+
+def clause_generator_heading_south_ssa(t, reg=None):
+	return _clause_generator_heading_ssa('south', t, reg)
+
+
+
+def clause_generator_heading_west_ssa(t, reg=None):
+	return _clause_generator_heading_ssa('west', t, reg)
+
+
+
+def generate_heading_ssa_clauses(t, reg=None):
+	clauses = []
+
+
+	for heading in headings:
+		clauses.extend(_clause_generator_heading_ssa(heading, t, reg))
+
+	return clauses
+
+
+
+def generate_non_location_ssa_clauses(t, reg=None):
+	clauses = clause_generator_have_arrow_ssa(t, reg)
+	clauses.extend(clause_generator_wumpus_alive_ssa(t, reg))
+	clauses.extend(generate_heading_ssa_clauses(t, reg))
+
+
+	return clauses
+
+
+
+#----------------------------------
+def clause_generator_heading_only(heading, t, reg=None):
+	"""
+	CNF of Heading<heading> <=> ~(any other heading) at time t.
+	"""
+	v = _registry(reg).var
+	base = heading_bases[headings.index(heading)]
+	lit = v(base, t=t)
+	others = [v(other, t=t) for other in heading_bases if other != base]
+
+
+	return [(-lit, -other) for other in others] + [(lit,) + tuple(others)]
+
+
+
+def generate_heading_only_one_direction_clauses(t, reg=None, encoding=None):
+	"""
+	Together the four heading-only axioms say that exactly one heading holds,
+	which is what gets encoded here.
+	"""
+	v = _registry(reg).var
+
+
+	return clauses_exactly_one([v(base, t=t) for base in heading_bases], encoding, 'HeadingAmo', t, reg)
+
+
+
+def clause_generator_only_one_action_axioms(t, reg=None, encoding=None):
+	v = _registry(reg).var
+
+
+	return clauses_exactly_one([v(base, t=t) for base in proposition_bases_actions], encoding, 'ActionAmo', t, reg)
+
+
+
+def generate_mutually_exclusive_clauses(t, reg=None, encoding=None):
+	clauses = generate_heading_only_one_direction_clauses(t + 1, reg, encoding)
+	clauses.extend(clause_generator_only_one_action_axioms(t, reg, encoding))
+
+
+	return clauses
+
+
+
+#-------------------------------------------------------------------------------
+# Time Templates
+#
+# The per-step axiom families only differ in t from one step to the next, so
+# each is compiled once into a clause skeleton whose literals are stored as
+# (mult, add) pairs: the literal at step t is mult * step_base(t) + add, with
+# add holding the signed slot offset (including dt * stride for propositions
+# at t+1), or the signed fixed ID of an atemporal proposition (mult = 0).
+#-------------------------------------------------------------------------------
+def step_proposition_slots(width, height, encoding=None, sparse=False):
+	"""
+	The (base, x, y) step slots for a width x height world: every percept,
+	state fluent and action, the move fluents of the compact at_location SSA,
+	OK and L for each location (unless sparse: they then get IDs as they are
+	first used, which suits frontier and sparse sessions, where only a few
+	locations have them at each step), and the auxiliary propositions of the
+	heading and action exactly-one constraints.
+	"""
+	slots = [(base, None, None) for base in proposition_bases_perceptual_fluents
+		+ proposition_bases_state_fluents + proposition_bases_actions + at_location_move_bases]
+
+
+	for base in ([] if sparse else proposition_bases_location_fluents):
+		slots.extend((base, x, y) for x, y in world_geometry(1, width, 1, height).cells)
+
+	recorder = PropositionRegistry()
+	generate_mutually_exclusive_clauses(0, recorder, encoding)
+	for vid in range(1, len(recorder) + 1):
+		base, x, y, t = recorder.key(vid)
+		if t == 0 and (base, x, y) not in slots: slots.append((base, x, y))
+
+	return slots
+
+
+
+def grid_registry(width, height, encoding=None, sparse=False):
+	"""
+	A PropositionRegistry with the step layout of a width x height world
+	(see step_proposition_slots).
+	"""
+	return PropositionRegistry(step_proposition_slots(width, height, encoding, sparse))
+
+
+
+class TimeTemplate(object):
+	"""
+	A per-step clause generator compiled against a registry.
+
+	generator := called as generator(t, *args, reg=..., **kwargs), returning
+		clauses over propositions at times t and t+1 and atemporal ones.
+
+	Clauses are grouped by width, so that instantiating a group is one
+	vectorized multiply-add over its flat literal arrays followed by
+	chopping the result into tuples.
+	"""
+	def __init__(self, generator, args, kwargs, reg):
+		self.reg = reg
+		recorder = PropositionRegistry()
+		clauses = generator(0, *args, reg=recorder, **kwargs)
+
+
+		groups = {}
+		for clause in clauses:
+			mults, adds = groups.setdefault(len(clause), ([], []))
+			for lit in clause:
+				sign = (1 if lit > 0 else -1)
+				base, x, y, dt = recorder.key(lit)
+				slot = (reg.slots.get((base, x, y)) if dt is not None else None)
+				if dt is None:
+					mults.append(0)
+					adds.append(sign * reg.var(base, x, y))
+				elif slot is not None:
+					mults.append(sign)
+					adds.append(sign * (dt * reg.stride + slot))
+				else:
+					mults.append(None)
+					adds.append((sign, (base, x, y, dt)))
+
+		self.groups = sorted((width, mults, adds) for width, (mults, adds) in groups.items())
+		self.count = len(clauses)
+		self.exact = all(None not in mults for _, mults, _ in self.groups)
+		self.dts = sorted(set(recorder.key(lit)[3] for clause in clauses for lit in clause) - set([None]))
+
+
+	def __len__(self):
+		return self.count
+
+
+	def instantiate(self, t):
+		"""
+		Returns the template's clauses at time t.
+		"""
+		reg = self.reg
+		base = (reg.step_base(t) if reg.stride else 0)
+		exact = self.exact and all(reg.step_base(t + dt) == base + dt * reg.stride for dt in self.dts)
+		clauses = []
+
+
+		for width, mults, adds in self.groups:
+			if exact: lits = list(map(operator.add, adds, map(operator.mul, mults, itertools.repeat(base, len(mults)))))
+			else: lits = [self._literal(t, mult, add) for mult, add in zip(mults, adds)]
+			clauses.extend(zip(*[iter(lits)] * width))
+
+		return clauses
+
+
+	def _literal(self, t, mult, add):
+		if mult == 0: return add
+		if mult is None:
+			sign, (base, x, y, dt) = add
+			return sign * self.reg.var(base, x, y, t + dt)
+
+		dt, slot = divmod(abs(add), self.reg.stride)
+
+		return mult * (self.reg.step_base(t + dt) + slot)
+
+
+
+def time_template(generator, *args, reg=None, **kwargs):
+	"""
+	Returns the TimeTemplate of generator(t, *args, **kwargs), compiling it
+	the first time it is asked for on a registry.
+
+	Templates are cached by the underlying generator, so that a wrapped one
+	(see wumpus_profile.enable) finds the template compiled before wrapping.
+	"""
+	reg = _registry(reg)
+	key = (getattr(generator, '__wrapped__', generator), args, tuple(sorted(kwargs.items())))
+
+
+	template = reg.templates.get(key)
+	if template is None:
+		template = TimeTemplate(generator, args, kwargs, reg)
+		reg.templates[key] = template
+
+	return template
+
+
+
+def generate_step_clauses_from_templates(t, xmin, xmax, ymin, ymax, reg=None, encoding=None):
+	"""
+	The templated per-step clauses: non-location SSAs, mutually exclusive
+	axioms, location OK axioms and the breeze/stench percept links at time t.
+	"""
+	clauses = time_template(generate_non_location_ssa_clauses, reg=reg).instantiate(t)
+
+
+	clauses.extend(time_template(generate_mutually_exclusive_clauses, reg=reg, encoding=encoding).instantiate(t))
+	for generator in (generate_square_OK_clauses, generate_breeze_percept_and_location_clauses,
+			generate_stench_percept_and_location_clauses):
+		clauses.extend(time_template(generator, xmin, xmax, ymin, ymax, reg=reg).instantiate(t))
+
+	return clauses
@@ -0,0 +1,209 @@
+# wumpus_planner.py
+# -----------------
+# Route planning over the locations an agent's KB has proven OK.
+#
+# SafeRoutePlanner keeps the set of safe locations, fed by the answers of
+# safety queries (e.g. KBSession.ask_all over OK{x}_{y}_{t}), and finds
+# shortest action sequences with A* over (x, y, heading) states, using the
+# semantics of the heading and location SSAs: TurnLeft and TurnRight change
+# the heading, Forward moves one location towards it (or bumps into a wall),
+# each at a cost of one step.
+#
+# Routes are cached, with every suffix of a route found cached along with it
+# (an agent following a route asks again from each state it passes), and the
+# cache is only invalidated when the safe set changes.
+#
+# Nothing is laid out over the whole map, so that big (sparse) worlds cost no
+# more than the locations proven safe.
+import heapq
+
+import wumpus_kb
+
+
+
+
+#-------------------------------------------------------------------------------
+# Planner
+#-------------------------------------------------------------------------------
+# The (dx, dy) of a move forward with each heading of wumpus_kb.headings.
+heading_steps = [(0, 1), (1, 0), (0, -1), (-1, 0)]
+
+
+
+def _turns(heading, goal):
+	# Least number of turns from heading index to goal index.
+	d = (goal - heading) % 4
+
+
+	return (2 if d == 2 else min(d, 1))
+
+
+
+class SafeRoutePlanner(object):
+	"""
+	width,height := dimensions of world
+	max_routes := most routes cached; the cache is cleared when it is full;
+		default=4096
+
+	States are (x, y, heading), headings named as in wumpus_kb.headings, and
+	routes are lists of the actions TurnLeft, TurnRight and Forward.
+	"""
+	def __init__(self, width, height, max_routes=4096):
+		self.width = width
+		self.height = height
+		self.max_routes = max_routes
+		self.safe = set()
+		self.routes = {}
+		self.stats = {'plans': 0, 'hits': 0, 'searches': 0, 'expanded': 0, 'invalidations': 0}
+
+
+	def add_safe(self, cells):
+		"""
+		Adds cells to the safe set.
+		"""
+		new = [cell for cell in cells if cell not in self.safe and self.inside(*cell)]
+
+
+		if not new: return
+		self.safe.update(new)
+		self.invalidate()
+
+
+	def remove_safe(self, cells):
+		"""
+		Removes cells from the safe set (e.g. after being told of a hazard
+		the KB had not accounted for).
+		"""
+		gone = [cell for cell in cells if cell in self.safe]
+
+
+		if not gone: return
+		self.safe.difference_update(gone)
+		self.invalidate()
+
+
+	def update(self, answers):
+		"""
+		answers := {(x, y): True/False/None}, the answers of safety queries:
+			proven OK cells become safe, proven not OK ones stop being safe,
+			unknown ones are left as they are
+		"""
+		self.add_safe([cell for cell, ok in answers.items() if ok])
+		self.remove_safe([cell for cell, ok in answers.items() if ok is False])
+
+
+	def inside(self, x, y):
+		return 1 <= x <= self.width and 1 <= y <= self.height
+
+
+	def forward(self, cell, heading):
+		"""
+		The location moving forward from cell with heading index leads to,
+		or None if it bumps into a wall.
+		"""
+		dx, dy = heading_steps[heading]
+		x, y = cell[0] + dx, cell[1] + dy
+
+
+		return ((x, y) if self.inside(x, y) else None)
+
+
+	def invalidate(self):
+		if self.routes: self.stats['invalidations'] += 1
+		self.routes = {}
+
+
+	def plan(self, x, y, heading, goals):
+		"""
+		A shortest route from x,y facing heading to any of the goals
+		locations through safe locations (the goals need to be safe too, the
+		start does not), or None if there is none.
+		"""
+		goals = frozenset(cell for cell in goals if self.inside(*cell))
+		start = ((x, y), wumpus_kb.headings.index(heading))
+		key = (start, goals)
+		self.stats['plans'] += 1
+
+
+		if key in self.routes:
+			self.stats['hits'] += 1
+		else:
+			states, actions = self.search(start, goals)
+			if len(self.routes) + len(actions) >= self.max_routes: self.routes = {}
+			self.routes[key] = (None if states is None else ())
+			for i, state in enumerate(states or ()):
+				self.routes[(state, goals)] = tuple(actions[i:])
+		route = self.routes[key]
+
+		return (None if route is None else list(route))
+
+
+	def search(self, start, goals):
+		"""
+		A* from state start ((x, y), heading index) to any cell in goals;
+		returns (states, actions), the states visited and the actions taken
+		from each, or (None, ()) if no goal can be reached.
+		"""
+		self.stats['searches'] += 1
+		safe = self.safe
+		targets = set(goal for goal in goals if goal in safe)
+		if not targets: return None, ()
+
+
+		def estimate(state):
+			# Moves plus the turns needed to face every direction the nearest
+			# goals lie in: a lower bound, so the first route found is shortest.
+			x, y = state[0]
+			best = None
+			for gx, gy in targets:
+				dirs = [d for d, needed in enumerate((gy > y, gx > x, gy < y, gx < x)) if needed]
+				cost = abs(gx - x) + abs(gy - y)
+				if dirs: cost += min(_turns(state[1], d) for d in dirs) + len(dirs) - 1
+				if best is None or cost < best: best = cost
+			return best
+
+		parents = {start: None}
+		costs = {start: 0}
+		queue = [(estimate(start), 0, start)]
+		while queue:
+			f, g, state = heapq.heappop(queue)
+			if g > costs[state]: continue
+			self.stats['expanded'] += 1
+			cell, heading = state
+			if cell in targets: break
+			nxt = self.forward(cell, heading)
+			for action, succ in (('Forward', ((nxt, heading) if nxt in safe else None)),
+					('TurnLeft', (cell, (heading - 1) % 4)), ('TurnRight', (cell, (heading + 1) % 4))):
+				if succ is not None and g + 1 < costs.get(succ, g + 2):
+					costs[succ] = g + 1
+					parents[succ] = (state, action)
+					heapq.heappush(queue, (g + 1 + estimate(succ), g + 1, succ))
+		else:
+			return None, ()
+
+		states, actions = [], []
+		while parents[state] is not None:
+			state, action = parents[state]
+			states.append(state)
+			actions.append(action)
+
+		return states[::-1], actions[::-1]
+
+
+	def route_cells(self, x, y, heading, route):
+		"""
+		The locations route leads through from x,y facing heading.
+		"""
+		cells, cell, heading = [], (x, y), wumpus_kb.headings.index(heading)
+
+
+		for action in route:
+			if action == 'Forward':
+				nxt = self.forward(cell, heading)
+				if nxt is not None:
+					cell = nxt
+					cells.append(cell)
+			elif action in ('TurnLeft', 'TurnRight'):
+				heading = (heading + (-1 if action == 'TurnLeft' else 1)) % 4
+
+		return cells
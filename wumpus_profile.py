@@ -0,0 +1,337 @@
+# wumpus_profile.py
+# -----------------
+# Opt-in instrumentation of the hot paths: axiom and clause generation (see
+# wumpus_kb), KB sessions (wumpus_session) and solving (sat_solver).
+#
+# enable() wraps the instrumented functions in place, so callers need no
+# changes, and disable() puts the originals back: nothing is wrapped, and
+# nothing costs anything, while profiling is off.  Generators returning an
+# iterator (the wumpus_kb.iter_* ones) are counted and timed as the iterator
+# is consumed.
+#
+#	profiler = wumpus_profile.enable(trace=True)
+#	... run an episode ...
+#	wumpus_profile.disable()
+#	profiler.stats()                              # per-generator, per-step and solver stats
+#	profiler.export_chrome_trace('trace.json')    # chrome://tracing or ui.perfetto.dev
+import functools
+import json
+import math
+import os
+import threading
+import time
+
+import sat_solver
+import wumpus_kb
+import wumpus_session
+
+
+
+
+#-------------------------------------------------------------------------------
+# Profiler
+#-------------------------------------------------------------------------------
+def _item_size(item):
+	# (axioms, string bytes, clauses, literals) of one axiom string or clause.
+	if isinstance(item, str): return (1, len(item), 0, 0)
+
+
+	return (0, 0, 1, len(item))
+
+
+
+def _output_size(result):
+	"""
+	(axioms, string bytes, clauses, literals) of a generator's output: an
+	axiom string, a list of them, or a list of clauses.  Iterators are
+	sized as they are consumed instead (see _wrap_generator).
+	"""
+	if isinstance(result, str): return _item_size(result)
+	if not isinstance(result, list) or not result: return (0, 0, 0, 0)
+
+
+	if isinstance(result[0], str): return (len(result), sum(len(axiom) for axiom in result), 0, 0)
+	return (0, 0, len(result), sum(len(clause) for clause in result))
+
+
+
+class Profiler(object):
+	"""
+	trace := also keep every call as an event for export_chrome_trace;
+		default=False
+	max_events := most trace events kept; default=1000000
+	step_budget := time budget of a KBSession.tell_step call, in seconds;
+		steps over it are listed in stats(); default=None
+	"""
+	def __init__(self, trace=False, max_events=1000000, step_budget=None):
+		self.trace = trace
+		self.max_events = max_events
+		self.step_budget = step_budget
+		self.origin = time.perf_counter()
+		self.lock = threading.Lock()
+		self.reset()
+
+
+	def reset(self):
+		self.generators = {}
+		self.sessions = {}
+		self.steps = {}
+		self.solves = {'calls': 0, 'sat': 0, 'unsat': 0, 'time': 0.0, 'histogram': {}}
+		self.events = []
+		self.dropped = 0
+
+
+	def event(self, category, name, start, end, args=None):
+		if len(self.events) >= self.max_events:
+			self.dropped += 1
+			return
+
+
+		event = {'name': name, 'cat': category, 'ph': 'X', 'ts': (start - self.origin) * 1e6,
+			'dur': (end - start) * 1e6, 'pid': os.getpid(), 'tid': threading.get_ident()}
+		if args: event['args'] = args
+		self.events.append(event)
+
+
+	def generator_call(self, name, start, end, result=None, size=None):
+		"""
+		Records a call of generator name: its output result, or, for one
+		returning an iterator, the size of what was consumed of it (see
+		_output_size) and end - start the time spent producing it.
+		"""
+		axioms, size, clauses, literals = (_output_size(result) if size is None else size)
+
+
+		with self.lock:
+			stats = self.generators.get(name)
+			if stats is None:
+				stats = self.generators[name] = {'calls': 0, 'time': 0.0, 'axioms': 0, 'string_bytes': 0,
+					'clauses': 0, 'literals': 0}
+			stats['calls'] += 1
+			stats['time'] += end - start
+			stats['axioms'] += axioms
+			stats['string_bytes'] += size
+			stats['clauses'] += clauses
+			stats['literals'] += literals
+			if self.trace: self.event('generate', name, start, end)
+
+
+	def session_call(self, name, start, end):
+		with self.lock:
+			stats = self.sessions.setdefault(name, {'calls': 0, 'time': 0.0})
+			stats['calls'] += 1
+			stats['time'] += end - start
+			if self.trace: self.event('session', name, start, end)
+
+
+	def step(self, t, start, end, clauses):
+		# KB growth and time of one KBSession.tell_step call.
+		with self.lock:
+			self.steps[t] = {'time': end - start, 'clauses': clauses}
+			if self.trace: self.event('step', 'tell_step', start, end, {'t': t, 'clauses': clauses})
+
+
+	def solve(self, start, end, status):
+		# Latencies are bucketed by powers of two of microseconds: the
+		# histogram maps each bucket's upper bound to its count.
+		with self.lock:
+			self.solves['calls'] += 1
+			self.solves['sat' if status else 'unsat'] += 1
+			self.solves['time'] += end - start
+			bucket = 2 ** max(0, int(math.ceil(math.log2(max((end - start) * 1e6, 1.0)))))
+			self.solves['histogram'][bucket] = self.solves['histogram'].get(bucket, 0) + 1
+			if self.trace: self.event('solve', 'solve', start, end, {'sat': bool(status)})
+
+
+	def stats(self):
+		"""
+		All counters as a dict (JSON serializable).
+		"""
+		steps = [self.steps[t] for t in sorted(self.steps)]
+		step_time = sum(step['time'] for step in steps)
+
+
+		stats = {'generators': self.generators, 'sessions': self.sessions,
+			'steps': dict((str(t), step) for t, step in sorted(self.steps.items())),
+			'step_summary': {'steps': len(steps), 'time': step_time, 'mean_time': (step_time / len(steps) if steps else 0.0),
+				'max_time': max([step['time'] for step in steps] or [0.0]),
+				'clauses': sum(step['clauses'] for step in steps)},
+			'solves': dict(self.solves, histogram=dict((str(bound), count) for bound, count in sorted(self.solves['histogram'].items()))),
+			'dropped_events': self.dropped}
+		if self.step_budget is not None:
+			stats['step_summary']['budget'] = self.step_budget
+			stats['step_summary']['over_budget'] = [t for t in sorted(self.steps) if self.steps[t]['time'] > self.step_budget]
+
+		return stats
+
+
+	def export_json(self, path):
+		with open(path, 'w') as f: json.dump(self.stats(), f, indent=1)
+
+
+	def export_chrome_trace(self, path):
+		"""
+		Writes the trace events in the Chrome trace event format.
+		"""
+		with open(path, 'w') as f: json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, f)
+
+
+
+#-------------------------------------------------------------------------------
+# Instrumentation
+#-------------------------------------------------------------------------------
+# The wumpus_kb functions whose names start with one of these are wrapped.
+instrumented_prefixes = ('axiom_generator_', 'clause_generator_', 'generate_', 'iter_', 'initial_',
+	'static_wumpus_clauses', 'clauses_at_most_one', 'clauses_exactly_one')
+
+instrumented_session_methods = ('tell', 'tell_percept', 'tell_action', 'tell_cell', 'tell_step_cells', 'compact',
+	'entails', 'ask_all')
+
+profiler = None
+_originals = []
+
+
+
+def _wrap_generator(name, fn):
+	# Generators returning an iterator (the iter_* ones) are recorded once it
+	# is exhausted or dropped, see _consume.
+	@functools.wraps(fn)
+	def wrapper(*args, **kwargs):
+		start = time.perf_counter()
+		result = fn(*args, **kwargs)
+		if hasattr(result, '__next__'): return _consume(name, start, time.perf_counter() - start, result)
+		profiler.generator_call(name, start, time.perf_counter(), result)
+		return result
+
+	return wrapper
+
+
+
+def _consume(name, start, elapsed, items):
+	"""
+	Yields items, counting them and timing only the calls into the
+	iterator (not the consumer's work in between).
+	"""
+	size = [0, 0, 0, 0]
+
+
+	try:
+		while True:
+			begin = time.perf_counter()
+			try:
+				item = next(items)
+			except StopIteration:
+				break
+			finally:
+				elapsed += time.perf_counter() - begin
+			size = [total + count for total, count in zip(size, _item_size(item))]
+			yield item
+	finally:
+		if profiler is not None: profiler.generator_call(name, start, start + elapsed, size=tuple(size))
+
+
+
+def _wrap_session_method(name, fn):
+	@functools.wraps(fn)
+	def wrapper(*args, **kwargs):
+		start = time.perf_counter()
+		result = fn(*args, **kwargs)
+		profiler.session_call(name, start, time.perf_counter())
+		return result
+
+	return wrapper
+
+
+
+def _wrap_tell_step(fn):
+	@functools.wraps(fn)
+	def wrapper(session, t, *args, **kwargs):
+		clauses = session.clause_count
+		start = time.perf_counter()
+		result = fn(session, t, *args, **kwargs)
+		profiler.step(t, start, time.perf_counter(), session.clause_count - clauses)
+		return result
+
+	return wrapper
+
+
+
+def _wrap_solve(fn):
+	@functools.wraps(fn)
+	def wrapper(solver, assumptions=()):
+		start = time.perf_counter()
+		status = fn(solver, assumptions)
+		profiler.solve(start, time.perf_counter(), status)
+		return status
+
+	return wrapper
+
+
+
+def _patch(owner, name, wrapper):
+	_originals.append((owner, name, getattr(owner, name)))
+	setattr(owner, name, wrapper)
+
+
+
+def enable(trace=False, max_events=1000000, step_budget=None):
+	"""
+	Starts profiling into a new Profiler (see Profiler for the arguments),
+	and returns it.
+	"""
+	global profiler
+	if profiler is not None: disable()
+
+
+	profiler = Profiler(trace, max_events, step_budget)
+	for name in sorted(vars(wumpus_kb)):
+		fn = getattr(wumpus_kb, name)
+		if name.startswith(instrumented_prefixes) and callable(fn) and not isinstance(fn, type):
+			_patch(wumpus_kb, name, _wrap_generator(name, fn))
+	_patch(wumpus_kb.TimeTemplate, 'instantiate', _wrap_generator('TimeTemplate.instantiate', wumpus_kb.TimeTemplate.instantiate))
+
+	for name in instrumented_session_methods:
+		_patch(wumpus_session.KBSession, name, _wrap_session_method(name, getattr(wumpus_session.KBSession, name)))
+	_patch(wumpus_session.KBSession, 'tell_step', _wrap_tell_step(wumpus_session.KBSession.tell_step))
+
+	_patch(sat_solver.CDCLSolver, 'solve', _wrap_solve(sat_solver.CDCLSolver.solve))
+	_patch(sat_solver.NativeSolver, 'solve', _wrap_solve(sat_solver.NativeSolver.solve))
+
+	return profiler
+
+
+
+def disable():
+	"""
+	Stops profiling and restores the original functions; returns the
+	Profiler that was active, if any.
+	"""
+	global profiler
+	active = profiler
+
+
+	while _originals:
+		owner, name, original = _originals.pop()
+		setattr(owner, name, original)
+	profiler = None
+
+	return active
+
+
+
+class profiling(object):
+	"""
+	Context manager around enable() and disable():
+
+		with wumpus_profile.profiling(trace=True) as profiler: ...
+	"""
+	def __init__(self, **kwargs):
+		self.kwargs = kwargs
+
+
+	def __enter__(self):
+		return enable(**self.kwargs)
+
+
+	def __exit__(self, *exc):
+		disable()
@@ -0,0 +1,275 @@
+# wumpus_satplan.py
+# -----------------
+# SATPlan-style action search over an agent's KB (see wumpus_session.py).
+#
+# The SSAs (heading, HaveArrow, WumpusAlive and, in the full encoding, the
+# location of every cell) and the one-action axioms form a complete
+# transition model.  SATPlanner unrolls them for time steps t, t+1, ...,
+# t+k-1 into the session's own solver and asks for a model where the goal
+# holds at t+k (e.g. L1_1_{t+k} & Climb{t+k}); the actions true in the model
+# are the plan.  The horizon k grows one step at a time in the same solver,
+# so each longer horizon only adds the clauses of one more step, and the
+# first horizon with a model gives a shortest plan.
+#
+# A model only shows the plan is safe in one possible world, so plans are
+# restricted to the locations the caller passes as safe (e.g. those proven
+# OK, see wumpus_planner.SafeRoutePlanner), to Forward and turns, and to
+# moves that don't bump into a wall.  These restrictions are not facts
+# about the world: they are added once per time step under guard literals
+# (propositions of that step, one more per safe set for staying on it) that
+# are only assumed while planning, so they never constrain later queries
+# (nor do the goals).  So is the location and heading the plan starts from:
+# true, but unless the SSA encoding is 'full', more than the KB itself
+# says.  Nothing is asserted about the guards, so compaction has nothing of
+# the planner's to keep, and retires its propositions along with the steps
+# they belong to.
+#
+#	planner = SATPlanner(session)
+#	actions = planner.plan(t, location_goal((1, 1)), safe_cells, max_horizon=20)
+import wumpus_kb
+
+
+
+
+#-------------------------------------------------------------------------------
+# Goals
+#
+# A goal is a function of the session and the time step s it must hold at,
+# returning clauses over the session's registry: unit clauses are assumed,
+# longer ones (e.g. being at any of several locations) are added under a
+# selector literal that is assumed instead (one per distinct clause).
+#-------------------------------------------------------------------------------
+def location_goal(*cells):
+	"""
+	Being at any of cells.
+	"""
+	return lambda session, s: [tuple(session.var('L', x, y, s) for x, y in cells)]
+
+
+
+def climb_goal(x, y):
+	"""
+	Climbing out from x,y (the start of the world).
+	"""
+	return lambda session, s: [(session.var('L', x, y, s),), (session.var('Climb', t=s),)]
+
+
+
+def grab_goal(x, y):
+	"""
+	Grabbing at x,y (e.g. where Glitter was perceived).
+	"""
+	return lambda session, s: [(session.var('L', x, y, s),), (session.var('Grab', t=s),)]
+
+
+
+#-------------------------------------------------------------------------------
+# Planner
+#-------------------------------------------------------------------------------
+# The actions plans are made of.
+plan_actions = ['Forward', 'TurnLeft', 'TurnRight']
+
+
+
+class SATPlanner(object):
+	"""
+	session := the wumpus_session.KBSession to plan over
+
+	The transition axioms unrolled into the session's solver are sound (they
+	are the same axioms tell_step adds for those steps), so they are kept
+	from one plan to the next, and so are the guarded restrictions of each
+	step and the goal selectors: all are only added again when the session
+	has rebuilt its solver (see KBSession.compact and KBSession.preprocess).
+	"""
+	def __init__(self, session):
+		if session.sparse: raise ValueError('SATPlan unrolls the SSAs of every location, which a sparse session has not got')
+		self.session = session
+		self.solver = None
+		self.unrolled = set()
+		self.pins = {}
+		self.guards = {}
+		self.avoids = {}
+		self.safe_sets = {}
+		self.selectors = {}
+		self.selector_count = 0
+		self.stats = {'plans': 0, 'found': 0, 'solves': 0, 'unrolled': 0, 'clauses': 0}
+
+
+	def add_clauses(self, clauses):
+		# Straight into the solver: neither the transition axioms (tell_step
+		# adds them again when the time comes) nor the guarded restrictions
+		# are part of the KB that compaction and snapshots keep.
+		for clause in clauses: self.solver.add_clause(clause)
+		self.stats['clauses'] += len(clauses)
+
+
+	def unroll(self, s):
+		"""
+		Adds the transition axioms from time s to s+1, unless already added
+		(by the planner, or by tell_step(s) with the full SSA encoding).
+		"""
+		if s in self.unrolled or (self.session.ssa == 'full' and s in self.session.states): return
+
+
+		session, reg = self.session, self.session.reg
+		self.add_clauses(wumpus_kb.time_template(wumpus_kb.generate_non_location_ssa_clauses, reg=reg).instantiate(s))
+		self.add_clauses(wumpus_kb.time_template(wumpus_kb.generate_mutually_exclusive_clauses, reg=reg).instantiate(s))
+		self.add_clauses(wumpus_kb.time_template(wumpus_kb.generate_full_at_location_ssa_clauses, 1, session.width, 1,
+			session.height, reg=reg).instantiate(s))
+		self.unrolled.add(s)
+		self.stats['unrolled'] += 1
+
+
+	def pin(self, t):
+		"""
+		The guard literal of the location and heading at time t, as told to
+		tell_step (unless the SSA encoding is 'full', the KB doesn't rule out
+		being at other locations too).  They are added the first time.
+		"""
+		if t in self.pins: return self.pins[t]
+
+
+		session = self.session
+		x, y, heading = session.states[t]
+		guard = self.pins[t] = session.var('PlanStart', t=t)
+		clauses = wumpus_kb.clause_generator_only_in_one_location(x, y, 1, session.width, 1, session.height, t, session.reg)
+		clauses += wumpus_kb.clause_generator_only_one_heading(heading, t, session.reg)
+		self.add_clauses([(-guard,) + tuple(clause) for clause in clauses])
+
+		return guard
+
+
+	def guard(self, s):
+		"""
+		The guard literal of the restrictions on the step from s to s+1: only
+		the plan_actions, and no Forward into a wall (so no Bump).  They are
+		added the first time.
+		"""
+		if s in self.guards: return self.guards[s]
+
+
+		session = self.session
+		geometry = wumpus_kb.world_geometry(1, session.width, 1, session.height)
+		var = session.var
+		guard = self.guards[s] = var('PlanStep', t=s)
+		clauses = [(-guard, -var(action, t=s)) for action in wumpus_kb.proposition_bases_actions
+			if action not in plan_actions]
+		clauses.append((-guard, -var('Bump', t=s + 1)))
+
+
+		forward = var('Forward', t=s)
+		for heading, base in zip(wumpus_kb.headings, wumpus_kb.heading_bases):
+			ahead = geometry.forward[heading]
+			for i, (x, y) in enumerate(geometry.cells):
+				if ahead[i] < 0: clauses.append((-guard, -var('L', x, y, s), -var(base, t=s), -forward))
+		self.add_clauses(clauses)
+
+		return guard
+
+
+	def avoid(self, s, unsafe):
+		"""
+		The guard literal of not being at any of the unsafe locations (a
+		frozenset) at time s+1, added under it the first time for that set.
+		"""
+		key = (s, unsafe)
+		if key in self.avoids: return self.avoids[key]
+
+
+		session = self.session
+		index = self.safe_sets.setdefault(unsafe, len(self.safe_sets) + 1)
+		guard = self.avoids[key] = session.var('PlanAvoid', index, 0, s)
+		self.add_clauses([(-guard, -session.var('L', x, y, s + 1)) for x, y in sorted(unsafe)])
+
+		return guard
+
+
+	def selector(self, s, clause):
+		"""
+		The selector literal of goal clause (to hold at time s), added under
+		it the first time.
+		"""
+		clause = tuple(clause)
+		if clause in self.selectors: return self.selectors[clause]
+
+
+		self.selector_count += 1
+		selector = self.selectors[clause] = self.session.var('PlanGoal', self.selector_count, 0, s)
+		self.add_clauses([(-selector,) + clause])
+
+		return selector
+
+
+	def plan(self, t, goal, safe, max_horizon=None):
+		"""
+		A shortest plan from the state at time t (after tell_step(t), before
+		tell_action(t)) to goal, moving only through the locations in safe.
+
+		goal := function (session, s) -> the clauses to hold at time s, e.g.
+			climb_goal(x, y)
+		safe := the locations the plan may go through (the goal's location
+			among them)
+		max_horizon := longest plan searched for; default=3 actions per
+			safe location reachable from the start but the last (a shortest
+			plan never comes back to a location, and makes at most two
+			turns before each Forward)
+		Returns the list of actions at t, t+1, ..., t+k-1 (the goal's own
+		action, if any, is taken at t+k), or None if there is no plan within
+		max_horizon.
+		"""
+		session = self.session
+		safe = set(safe)
+		unsafe = frozenset(cell for cell in wumpus_kb.locations(1, session.width, 1, session.height) if cell not in safe)
+		if max_horizon is None: max_horizon = 3 * (len(self.reachable(session.states[t][:2], safe)) - 1)
+		self.stats['plans'] += 1
+		if self.solver is not session.solver:
+			self.solver = session.solver
+			self.unrolled, self.pins, self.guards, self.avoids, self.selectors = set(), {}, {}, {}, {}
+
+
+		actions, restrictions = None, [self.pin(t)]
+		for k in range(max_horizon + 1):
+			if k:
+				self.unroll(t + k - 1)
+				restrictions.append(self.guard(t + k - 1))
+				if unsafe: restrictions.append(self.avoid(t + k - 1, unsafe))
+			assumptions = list(restrictions)
+			for clause in goal(session, t + k):
+				assumptions.append(clause[0] if len(clause) == 1 else self.selector(t + k, clause))
+			self.stats['solves'] += 1
+			if self.solver.solve(assumptions):
+				actions = [self.action(s) for s in range(t, t + k)]
+				self.stats['found'] += 1
+				break
+
+		return actions
+
+
+	def reachable(self, cell, safe):
+		"""
+		The locations reachable from cell through the locations in safe
+		(cell among them).
+		"""
+		session = self.session
+		seen = set([cell])
+		stack = [cell]
+
+
+		while stack:
+			x, y = stack.pop()
+			for near in wumpus_kb._neighbour_cells(x, y, 1, session.width, 1, session.height):
+				if near in safe and near not in seen:
+					seen.add(near)
+					stack.append(near)
+
+		return seen
+
+
+	def action(self, s):
+		"""
+		The action at time s in the solver's model.
+		"""
+		for action in plan_actions:
+			if self.solver.model_value(self.session.var(action, t=s)): return action
+
+		return None
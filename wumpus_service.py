@@ -0,0 +1,312 @@
+# wumpus_service.py
+# -----------------
+# An asyncio front-end serving the KBs of many concurrent agents from one
+# process.
+#
+# AgentService keeps one KBSession per agent, all started from the same static
+# clauses (see wumpus_kb.static_wumpus_clauses).  KB updates and queries run on
+# a bounded executor, so they never block the event loop; each agent's calls
+# are serialized by a per-agent lock.  Concurrent safety queries for the same
+# agent and time step are coalesced into one batched query (see
+# KBSession.ask_all), and a cap on in-flight requests makes callers wait
+# instead of queueing without bound.
+#
+# LocalSimulator is an in-process stand-in for the simulation API, and
+# run_agents drives many ExplorerAgents (see wumpus_world) against both to
+# measure step latency.
+#
+# Usage:
+#	python wumpus_service.py [--agents 500] [--size 4] [--steps 30] [--workers 4] [--json FILE]
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import sys
+import time
+
+import wumpus_kb
+import wumpus_session
+import wumpus_world
+
+
+
+
+#-------------------------------------------------------------------------------
+# Service
+#-------------------------------------------------------------------------------
+class _Agent(object):
+	# The session of one agent, the lock serializing calls on it, the
+	# safety queries waiting to be dispatched ({t: (cells, future)}), and
+	# the decided answers of earlier queries ({t: {cell: answer}}).
+	def __init__(self, session):
+		self.session = session
+		self.lock = asyncio.Lock()
+		self.batches = {}
+		self.answers = {}
+
+
+
+class AgentService(object):
+	"""
+	width,height := dimensions of the agents' worlds
+	max_workers := size of the executor running KB calls; default=4
+	max_pending := most requests in flight at once, beyond which callers
+		wait (backpressure); default=1000
+	executor := an existing concurrent.futures executor to use instead
+	kwargs := passed on to KBSession (e.g. backend, window, frontier)
+	"""
+	def __init__(self, width, height, max_workers=4, max_pending=1000, executor=None, **kwargs):
+		self.width = width
+		self.height = height
+		self.kwargs = kwargs
+		self.executor = executor or concurrent.futures.ThreadPoolExecutor(max_workers)
+		self.own_executor = executor is None
+		self.pending = asyncio.Semaphore(max_pending)
+		self.agents = {}
+		self.static = None
+		# Lazy (and sparse, which implies lazy) sessions add their atemporal
+		# axioms as they go, so they can't start from static clauses.
+		if not (kwargs.get('lazy') or kwargs.get('sparse')):
+			reg = wumpus_kb.grid_registry(width, height, sparse=bool(kwargs.get('frontier')))
+			self.static = (reg, wumpus_kb.static_wumpus_clauses(width, height, reg))
+		self.stats = {'requests': 0, 'queries': 0, 'coalesced': 0, 'cached': 0, 'dispatched': 0}
+
+
+	async def call(self, agent, fn, *args):
+		"""
+		Runs fn(*args) on the executor, holding agent's lock.
+		"""
+		async with agent.lock:
+			return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+
+	async def open(self, agent_id, xi, yi, heading='east'):
+		"""
+		Starts the KB of a new agent; returns its KBSession.
+		"""
+		async with self.pending:
+			self.stats['requests'] += 1
+			session = await asyncio.get_running_loop().run_in_executor(self.executor,
+				lambda: wumpus_session.KBSession(xi, yi, self.width, self.height, heading, static=self.static, **self.kwargs))
+		self.agents[agent_id] = _Agent(session)
+
+		return session
+
+
+	def close(self, agent_id):
+		self.agents.pop(agent_id, None)
+
+
+	async def tell_step(self, agent_id, t, percept, x, y, heading):
+		"""
+		Tells agent_id's KB the percepts and temporal axioms of time step t.
+		"""
+		agent = self.agents[agent_id]
+
+
+		async with self.pending:
+			self.stats['requests'] += 1
+			await self.call(agent, self._tell_step, agent.session, t, percept, x, y, heading)
+
+
+	def _tell_step(self, session, t, percept, x, y, heading):
+		session.tell_percept(t, percept)
+		session.tell_step(t, x, y, heading)
+
+
+	async def tell_action(self, agent_id, t, action):
+		agent = self.agents[agent_id]
+
+
+		async with self.pending:
+			self.stats['requests'] += 1
+			await self.call(agent, agent.session.tell_action, t, action)
+
+
+	async def ask_safety(self, agent_id, t, cells):
+		"""
+		Returns {(x, y): True/False/None}: whether each of cells is proven OK
+		at time t, proven not OK, or unknown.
+
+		Queries for the same agent and time step that arrive while one is
+		waiting to run are answered together, and answers already proven at
+		that step are reused (the KB only grows, so they stay proven).
+		"""
+		agent = self.agents[agent_id]
+		cells = list(cells)
+		known = agent.answers.get(t, {})
+		self.stats['queries'] += 1
+
+
+		todo = [cell for cell in cells if cell not in known]
+		if not todo:
+			self.stats['cached'] += 1
+			return dict((cell, known[cell]) for cell in cells)
+
+		async with self.pending:
+			self.stats['requests'] += 1
+			batch = agent.batches.get(t)
+			if batch is None:
+				batch = agent.batches[t] = (set(todo), asyncio.get_running_loop().create_future())
+				asyncio.ensure_future(self._dispatch(agent, t))
+			else:
+				self.stats['coalesced'] += 1
+				batch[0].update(todo)
+			answers = await asyncio.shield(batch[1])
+
+		return dict((cell, (known[cell] if cell in known else answers[cell])) for cell in cells)
+
+
+	async def _dispatch(self, agent, t):
+		# Waits for the agent's lock, then runs every query collected for
+		# step t by then as one batch.
+		async with agent.lock:
+			cells, future = agent.batches.pop(t)
+			self.stats['dispatched'] += 1
+			try:
+				answers = await asyncio.get_running_loop().run_in_executor(self.executor,
+					self._ask_safety, agent.session, t, sorted(cells))
+			except Exception as e:
+				future.set_exception(e)
+				return
+
+		agent.answers.setdefault(t, {}).update((cell, answer) for cell, answer in answers.items() if answer is not None)
+		for step in [step for step in agent.answers if step < t - 1]: del agent.answers[step]
+		future.set_result(answers)
+
+
+	def _ask_safety(self, session, t, cells):
+		answers = session.ask_all(session.var('OK', x, y, t) for x, y in cells)
+
+
+		return dict((cell, answers[session.var('OK', cell[0], cell[1], t)]) for cell in cells)
+
+
+	def shutdown(self):
+		if self.own_executor: self.executor.shutdown()
+
+
+
+#-------------------------------------------------------------------------------
+# Simulator stand-in
+#-------------------------------------------------------------------------------
+class LocalSimulator(object):
+	"""
+	An in-process stand-in for the simulation API: one WumpusWorld per
+	agent, answering after latency seconds.
+	"""
+	def __init__(self, width, height, pit_prob=0.2, latency=0.0):
+		self.width = width
+		self.height = height
+		self.pit_prob = pit_prob
+		self.latency = latency
+		self.worlds = {}
+
+
+	async def reset(self, agent_id, seed=None):
+		"""
+		Starts a new world for agent_id; returns (world, initial percept).
+		"""
+		if self.latency: await asyncio.sleep(self.latency)
+		world = self.worlds[agent_id] = wumpus_world.WumpusWorld(self.width, self.height, seed, self.pit_prob)
+
+
+		return world, world.percept()
+
+
+	async def act(self, agent_id, action):
+		"""
+		Executes action; returns (percept, done).
+		"""
+		if self.latency: await asyncio.sleep(self.latency)
+		world = self.worlds[agent_id]
+
+
+		world.execute(action)
+
+		return world.percept(), world.done
+
+
+
+async def run_agent(service, simulator, agent_id, seed=None, max_steps=100):
+	"""
+	Plays one episode with an ExplorerAgent talking to its KB through
+	service; returns the latencies of its steps (tell, ask, decide, tell).
+	"""
+	world, percept = await simulator.reset(agent_id, seed)
+	session = await service.open(agent_id, world.start[0], world.start[1], world.heading)
+	agent = wumpus_world.ExplorerAgent(session, world.start[0], world.start[1], world.heading, seed)
+	latencies, done = [], False
+
+
+	while not done and agent.t < max_steps:
+		start = time.perf_counter()
+		t = agent.t
+		await service.tell_step(agent_id, t, percept, agent.x, agent.y, agent.heading)
+		safe = []
+		if not (percept[2] and not agent.have_gold):
+			answers = await service.ask_safety(agent_id, t, agent.neighbours(agent.x, agent.y))
+			safe = [cell for cell, ok in answers.items() if ok]
+		action = agent.decide(percept, safe)
+		await service.tell_action(agent_id, t, action)
+		agent.advance(action)
+		latencies.append(time.perf_counter() - start)
+		percept, done = await simulator.act(agent_id, action)
+	service.close(agent_id)
+
+	return latencies
+
+
+
+def percentile(values, q):
+	values = sorted(values)
+
+
+	if not values: return 0.0
+	return values[min(len(values) - 1, int(q * len(values)))]
+
+
+
+async def run_agents(agents=500, width=4, height=4, max_steps=30, max_workers=4, max_pending=1000, latency=0.0,
+		**kwargs):
+	"""
+	Runs agents concurrent episodes and returns step latency percentiles
+	and service stats.
+	"""
+	service = AgentService(width, height, max_workers, max_pending, **kwargs)
+	simulator = LocalSimulator(width, height, latency=latency)
+	start = time.perf_counter()
+
+
+	try:
+		results = await asyncio.gather(*[run_agent(service, simulator, i, i, max_steps) for i in range(agents)])
+	finally:
+		service.shutdown()
+	latencies = [latency for result in results for latency in result]
+
+	return {'agents': agents, 'steps': len(latencies), 'wall_time': time.perf_counter() - start,
+		'p50': percentile(latencies, 0.5), 'p99': percentile(latencies, 0.99), 'max': max(latencies or [0.0]),
+		'stats': service.stats}
+
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Load test of the asyncio agent service')
+	parser.add_argument('--agents', type=int, default=500)
+	parser.add_argument('--size', type=int, default=4)
+	parser.add_argument('--steps', type=int, default=30)
+	parser.add_argument('--workers', type=int, default=4)
+	parser.add_argument('--max-pending', type=int, default=1000)
+	parser.add_argument('--latency', type=float, default=0.0, help='simulated API latency in seconds')
+	parser.add_argument('--json', metavar='FILE', help="write the results as JSON ('-' for stdout)")
+	args = parser.parse_args()
+
+	report = asyncio.run(run_agents(args.agents, args.size, args.size, args.steps, args.workers, args.max_pending,
+		args.latency))
+	if args.json == '-':
+		json.dump(report, sys.stdout, indent=1)
+		print()
+	else:
+		if args.json:
+			with open(args.json, 'w') as f: json.dump(report, f, indent=1)
+		for key, value in report.items(): print('{0}\t{1}'.format(key, value))
@@ -0,0 +1,571 @@
+# wumpus_session.py
+# -----------------
+# An agent's wumpus knowledge base held in an in-process, incremental SAT
+# solver (see sat_solver.py).
+#
+# Instead of re-serializing the whole KB for every query, the initial axioms
+# are added once, each time step only adds its own axioms, and entailment
+# queries are solve-under-assumptions calls: KB |= lit iff KB & ~lit is
+# unsatisfiable.  Clauses the solver learns are kept from step to step.
+#
+# With compaction (see KBSession.compact), the KB only holds a sliding
+# window of time steps, so memory and solve time stay bounded over long
+# episodes.  With preprocessing (see KBSession.preprocess), the solver is
+# periodically reloaded with a simplified copy of the KB instead.  In sparse
+# mode (see KBSession), nothing is laid out over the whole map, so maps of
+# 256x256 and more can be explored.  With slicing (see KBSession), each
+# batch of queries is solved over the clauses it depends on only.
+import sat_preprocess
+import sat_slice
+import sat_solver
+import wumpus_cache
+import wumpus_kb
+import wumpus_snapshot
+
+
+
+
+ssa_encodings = ['local', 'compact', 'full']
+
+
+
+class KBSession(object):
+	"""
+	xi,yi := initial location
+	width,height := dimensions of world
+	heading := initial heading; default='east'
+	backend := solver backend, see sat_solver.new_solver
+	window := compaction mode: every window steps, tell_step calls
+		compact(t) so the KB only holds the last window steps; default=None
+		(the KB grows for the whole episode)
+	lazy := only add the atemporal axioms of a location when the agent first
+		visits it or one of its neighbours, or when its Breeze, Stench or
+		location is asked about (see wumpus_kb.generate_cell_axioms);
+		default=False
+	frontier := only add the per-step location OK axioms and percept links
+		of the visited locations and their neighbours, plus those of any
+		other location when a query asks about it at that step (see
+		wumpus_kb.frontier_cells); default=False
+	static := (reg, clauses): start from wumpus_kb.static_wumpus_clauses
+		already generated over registry reg (which is copied, not changed),
+		e.g. shared by many episodes on the same map; the session refers to
+		clauses (iterated again on compaction, snapshots and preprocessing)
+		rather than keeping a copy, though its solver holds its own;
+		default=None
+	ssa := encoding of the at_location SSAs: 'local' (those of the current
+		and facing locations, see wumpus_kb.generate_at_location_ssa),
+		'compact' (the same locations over the move fluents, see
+		wumpus_kb.generate_compact_at_location_ssa_clauses) or 'full' (every
+		location over the move fluents, so the location at every step is
+		entailed, see wumpus_kb.generate_full_at_location_ssa);
+		default='local'
+	simplify := preprocessing mode: every simplify steps, tell_step calls
+		preprocess(t) to reload the solver with the KB simplified; default=
+		None (never)
+	sparse := sparse world mode, for big maps: implies lazy and frontier,
+		locations only get propositions as they are first used, and the
+		exactly-one Wumpus and initial location axioms are kept
+		symbolically (see wumpus_kb.sparse_wumpus_split_clauses), so
+		nothing is enumerated over the whole map; not with ssa 'full';
+		default=False
+	cache := a wumpus_cache.QueryCache (e.g. shared by many episodes):
+		safety queries (OK at a step whose percepts have been told) are
+		answered from it when it holds an answer over the same evidence,
+		and their answers are added to it otherwise; only valid while the
+		KB holds nothing but what tell_percept, tell_step and tell_action
+		add; default=None
+	slicing := solve queries over their cone of influence (the clauses
+		they depend on under the facts the solver has fixed, see
+		sat_slice) in fresh solvers, instead of over the whole KB, so that
+		they cost as much as the locations near them; default=False
+	executor := with slicing, a concurrent.futures executor the
+		independent slices of a batch of queries are solved in, in
+		parallel; default=None (one after the other)
+	"""
+	def __init__(self, xi, yi, width, height, heading='east', backend=None, window=None, lazy=False,
+			frontier=False, static=None, ssa='local', simplify=None, sparse=False, cache=None, slicing=False,
+			executor=None):
+		if ssa not in ssa_encodings: raise ValueError('Unknown at_location SSA encoding: {0!r}'.format(ssa))
+		if sparse and ssa == 'full': raise ValueError('The full at_location SSAs cover every location of a sparse world')
+		if sparse: lazy, frontier = True, True
+		self.width = width
+		self.height = height
+		self.backend = backend
+		self.window = window
+		self.lazy = lazy
+		self.ssa = ssa
+		self.simplify = simplify
+		self.simplified = 0
+		self.sparse = sparse
+		self.cells = (wumpus_kb.frontier_cells([(xi, yi)], 1, width, 1, height) if lazy and not sparse else set())
+		self.wumpus_cells = {}
+		self.location = (xi, yi)
+		self.elsewhere = set()
+
+		# The percepts at the visited locations, for the query cache.
+		self.cache = cache
+		self.start = (xi, yi)
+		self.percepts = {}
+		self.evidence = {}
+		self.scream = None
+		# Every step up to perceived has had its percepts told; the steps
+		# told past a gap wait in perceived_ahead until it fills.
+		self.perceived = -1
+		self.perceived_ahead = set()
+		self.graph = (sat_slice.ClauseGraph() if slicing else None)
+		self.executor = executor
+		self.frontier = (set() if frontier else None)
+		self.visited = set()
+		self.step_cells = {}
+		if static is not None and lazy: raise ValueError('static clauses cannot be added lazily')
+		# Frontier sessions only use the OK and L of a few locations at each
+		# step, which then get IDs as they are used rather than a step slot
+		# per location of the map (see wumpus_kb.step_proposition_slots).
+		self.reg = (wumpus_kb.grid_registry(width, height, sparse=frontier) if static is None else static[0].copy())
+		self.solver = sat_solver.new_solver(backend)
+		self.clause_count = 0
+		self.query_count = 0
+		self.solve_count = 0
+		self.root_count = 0
+		self.cache_count = 0
+
+		# Clauses kept for compaction: the static ones (not copied), the
+		# other atemporal ones, and the rest bucketed by the earliest time
+		# step they mention.
+		self.static_clauses = (() if static is None else static[1])
+		self.atemporal = []
+		self.buckets = {}
+		self.states = {}
+		self.horizon = 0
+		self.recorder = None
+
+
+		if sparse:
+			self.tell([(wumpus_kb.sparse_wumpus_rest(0, self.reg),)], None)
+			for cell in wumpus_kb.locations(1, width, 1, height, wumpus_kb.frontier_cells([(xi, yi)], 1, width, 1, height)):
+				self.tell_cell(*cell)
+			self.tell(wumpus_kb.initial_state_clauses(xi, yi, width, height, heading, self.reg,
+				wumpus_kb.sparse_location_cells(xi, yi, width, height)))
+		elif static is None:
+			self.tell(wumpus_kb.iter_initial_wumpus_clauses(xi, yi, width, height, heading, self.reg, lazy))
+		else:
+			self.tell(self.static_clauses, None, keep=False)
+			self.tell(wumpus_kb.initial_state_clauses(xi, yi, width, height, heading, self.reg))
+
+
+	def var(self, base, x=None, y=None, t=None):
+		return self.reg.var(base, x, y, t)
+
+
+	def clause_time(self, clause):
+		"""
+		The earliest time step clause mentions, or None if it is atemporal.
+		"""
+		times = [t for t in (self.reg.key(lit)[3] for lit in clause) if t is not None]
+
+
+		return (min(times) if times else None)
+
+
+	def tell(self, clauses, t=-1, keep=True):
+		"""
+		Adds clauses (an iterable of sequences of literals over self.reg,
+		e.g. one of the wumpus_kb.iter_* generators) to the KB.
+
+		t := the earliest time step the clauses mention (None if they are
+			atemporal); by default it is looked up clause by clause
+		keep := keep the clauses for compaction; False for the static ones,
+			which are kept by reference; default=True
+		"""
+		if self.recorder is not None:
+			clauses = list(clauses)
+			self.recorder.write(clauses, (None if t == -1 else t))
+		for clause in clauses:
+			self.solver.add_clause(clause)
+			if self.graph is not None: self.graph.add_clause(clause)
+			self.clause_count += 1
+			if not keep: continue
+			bucket = (self.clause_time(clause) if t == -1 else t)
+			if bucket is None: self.atemporal.append(clause)
+			else: self.buckets.setdefault(bucket, []).append(clause)
+
+
+	def tell_percept(self, t, tvec):
+		"""
+		tvec := percept vector (<stench>,<breeze>,<glitter>,<bump>,<scream>)
+		"""
+		self.tell(wumpus_kb.clause_generator_percept_sentence(t, tvec, self.reg), t)
+		self.percepts[t] = tvec
+		self.note_evidence(t)
+
+
+	def note_evidence(self, t):
+		# Once both the percepts and the location at time t are known.
+		if t not in self.percepts or t not in self.states: return
+
+
+		tvec = self.percepts.pop(t)
+		self.evidence[self.states[t][:2]] = (bool(tvec[0]), bool(tvec[1]))
+		if tvec[4] and (self.scream is None or t < self.scream): self.scream = t
+		self.perceived_ahead.add(t)
+		while self.perceived + 1 in self.perceived_ahead:
+			self.perceived += 1
+			self.perceived_ahead.remove(self.perceived)
+
+
+	def tell_step(self, t, x, y, heading):
+		"""
+		Adds the temporal axioms of time step t, for an agent at x,y facing
+		heading (used to restrict the at_location SSAs unless ssa is 'full',
+		see wumpus_kb.generate_at_location_ssa).
+		"""
+		self.states[t] = (x, y, heading)
+		self.note_evidence(t)
+		if self.lazy:
+			for cell in wumpus_kb.locations(1, self.width, 1, self.height,
+					wumpus_kb.frontier_cells([(x, y)], 1, self.width, 1, self.height)):
+				self.tell_cell(*cell)
+		if self.window and t - self.horizon >= self.window: self.compact(t)
+		if self.simplify and t - max(self.simplified, self.horizon) >= self.simplify: self.preprocess(t)
+
+
+		if self.frontier is None:
+			self.tell(wumpus_kb.generate_step_clauses_from_templates(t, 1, self.width, 1, self.height, self.reg), t)
+		else:
+			if (x, y) not in self.visited:
+				self.visited.add((x, y))
+				self.frontier = wumpus_kb.frontier_cells(self.visited, 1, self.width, 1, self.height)
+			self.tell(wumpus_kb.time_template(wumpus_kb.generate_non_location_ssa_clauses, reg=self.reg).instantiate(t), t)
+			self.tell(wumpus_kb.time_template(wumpus_kb.generate_mutually_exclusive_clauses, reg=self.reg).instantiate(t), t)
+			self.tell_step_cells(t, self.frontier)
+		if self.ssa == 'full':
+			self.tell(wumpus_kb.time_template(wumpus_kb.generate_full_at_location_ssa_clauses, 1, self.width, 1, self.height,
+				reg=self.reg).instantiate(t), t)
+		elif self.ssa == 'compact':
+			self.tell(wumpus_kb.generate_compact_at_location_ssa_clauses(t, x, y, 1, self.width, 1, self.height, heading,
+				self.reg), t)
+		else:
+			self.tell(wumpus_kb.generate_at_location_ssa_clauses(t, x, y, 1, self.width, 1, self.height, heading, self.reg), t)
+
+
+	def tell_step_cells(self, t, cells):
+		"""
+		In frontier mode, adds the location OK axioms and percept links at
+		time t of the locations in cells that don't have them yet.
+		"""
+		told = self.step_cells.setdefault(t, set())
+		cells = set(cells) - told
+
+
+		if not cells: return
+		told.update(cells)
+		if self.sparse: self.tell_wumpus_cells(cells)
+		for generator in (wumpus_kb.generate_square_OK_clauses, wumpus_kb.generate_breeze_percept_and_location_clauses,
+				wumpus_kb.generate_stench_percept_and_location_clauses):
+			self.tell(generator(t, 1, self.width, 1, self.height, self.reg, cells), t)
+
+
+	def tell_cell(self, x, y):
+		"""
+		In lazy mode, adds the atemporal axioms of location x,y if not yet added.
+		"""
+		if (x, y) in self.cells: return
+
+
+		self.cells.add((x, y))
+		if self.sparse: self.tell_wumpus_cells(wumpus_kb.frontier_cells([(x, y)], 1, self.width, 1, self.height))
+		self.tell(wumpus_kb.generate_cell_clauses(x, y, self.width, self.height, self.reg), None)
+
+
+	def tell_wumpus_cells(self, cells):
+		"""
+		In sparse mode, adds the locations in cells to the exactly-one Wumpus
+		constraint, unless already there (see
+		wumpus_kb.sparse_wumpus_split_clauses).
+		"""
+		size = self.width * self.height
+
+
+		for x, y in wumpus_kb.locations(1, self.width, 1, self.height, cells):
+			if (x, y) in self.wumpus_cells: continue
+			i = self.wumpus_cells[(x, y)] = len(self.wumpus_cells)
+			self.tell(wumpus_kb.sparse_wumpus_split_clauses(x, y, i, i + 1 == size, self.reg), None)
+
+
+	def tell_action(self, t, action):
+		"""
+		action := one of wumpus_kb.proposition_bases_actions
+		"""
+		self.tell([(self.var(action, t=t),)], t)
+
+
+	def compact(self, t):
+		"""
+		Retires every time step before t, once the state at t is fully
+		determined: the location and heading at t (as told to tell_step) are
+		entailed, and HaveArrow and WumpusAlive at t are known.
+
+		The state fluents are then asserted as unit facts for time t (the
+		same units the initial axioms assert for time 0), the Breeze and
+		Stench of the locations visited before t are kept as unit facts
+		(whatever the KB entails of them: the retired percept links are what
+		tied them to the percepts), as are the atemporal literals the solver
+		has fixed at the root level, and every clause
+		mentioning an earlier time step is dropped, including the learned
+		ones: the solver is rebuilt from what is left.
+
+		Returns False (and leaves the KB as is) if the state at t is not
+		determined.
+		"""
+		if t <= self.horizon or t not in self.states: return False
+
+		x, y, heading = self.states[t]
+		heading_lit = self.var(wumpus_kb.heading_bases[wumpus_kb.headings.index(heading)], t=t)
+		arrow, alive = self.var('HaveArrow', t=t), self.var('WumpusAlive', t=t)
+		visited = sorted(set(self.states[step][:2] for step in self.states if step < t))
+		percepts = [self.var(base, vx, vy) for vx, vy in visited for base in ('B', 'S')]
+		answers = self.ask_all([self.var('L', x, y, t), heading_lit, arrow, alive] + percepts)
+		if answers[self.var('L', x, y, t)] is not True or answers[heading_lit] is not True \
+				or answers[arrow] is None or answers[alive] is None:
+			return False
+
+
+		facts = [(lit if answers[lit] else -lit,) for lit in percepts if answers[lit] is not None]
+		kept = set(abs(lit) for lit in percepts)
+		facts.extend((lit,) for lit in self.solver.root_literals() if self.reg.key(lit)[3] is None and abs(lit) not in kept)
+		units = wumpus_kb.clause_generator_only_in_one_location(x, y, 1, self.width, 1, self.height, t, self.reg,
+			(wumpus_kb.sparse_location_cells(x, y, self.width, self.height) if self.sparse else None))
+		units.extend(wumpus_kb.clause_generator_only_one_heading(heading, t, self.reg))
+		units.extend([((arrow if answers[arrow] else -arrow),), ((alive if answers[alive] else -alive),)])
+
+		self.stop_recording()
+		for step in [step for step in self.buckets if step < t]: del self.buckets[step]
+		for step in [step for step in self.states if step < t]: del self.states[step]
+		for step in [step for step in self.step_cells if step < t]: del self.step_cells[step]
+		self.reg.retire_steps(t)
+		self.horizon = t
+		self.location = (x, y)
+		self.elsewhere = set()
+
+		atemporal, buckets = self.atemporal, self.buckets
+		self.atemporal, self.buckets = [], {}
+		self.solver = sat_solver.new_solver(self.backend)
+		if self.graph is not None: self.graph = sat_slice.ClauseGraph()
+		self.clause_count = 0
+		self.tell(self.static_clauses, None, keep=False)
+		self.tell(atemporal, None)
+		self.tell(facts, None)
+		self.tell(units, t)
+		for step in sorted(buckets): self.tell(buckets[step], step)
+
+		return True
+
+
+	def preprocess(self, t):
+		"""
+		Reloads the solver with the KB simplified by sat_preprocess: unit
+		propagation, subsumption, and elimination of the propositions no
+		later axiom mentions (e.g. the percepts, actions and OK of past
+		steps, and the Breeze and Stench of locations outside the frontier),
+		which substitutes the definitions of B, S and OK away.  The learned
+		clauses are dropped.  After the first time, the clauses the solver
+		holds are simplified again rather than the whole KB.
+
+		The propositions of time t on, and the atemporal ones later axioms
+		use, are kept.  Queries about an eliminated proposition still work:
+		its clauses are put back first (see sat_preprocess.SimplifiedSolver).
+		"""
+		cells = (None if self.frontier is None else set(self.frontier))
+		if isinstance(self.solver, sat_preprocess.SimplifiedSolver): clauses = self.solver.clauses
+		else: clauses = list(self.static_clauses) + self.atemporal + [clause for step in sorted(self.buckets)
+			for clause in self.buckets[step]]
+		frozen = set()
+
+
+		for v in set(abs(lit) for clause in clauses for lit in clause):
+			base, x, y, step = self.reg.key(v)
+			if (step is not None and step >= t) or base in ('P', 'W') \
+					or (base in ('B', 'S') and (cells is None or (x, y) in cells)):
+				frozen.add(v)
+
+		if isinstance(self.solver, sat_preprocess.SimplifiedSolver): self.solver = self.solver.resimplify(frozen)
+		else: self.solver = sat_preprocess.SimplifiedSolver(clauses, frozen, self.backend)
+		self.simplified = t
+
+
+	def snapshot(self, path):
+		"""
+		Writes the clauses of the KB (only the current window after a
+		compaction) to a snapshot file, see wumpus_snapshot.
+		"""
+		with wumpus_snapshot.SnapshotWriter(path, self.reg) as writer:
+			if self.static_clauses: writer.write(self.static_clauses, None)
+			writer.write(self.atemporal, None)
+			for step in sorted(self.buckets): writer.write(self.buckets[step], step)
+
+
+	def record(self, path):
+		"""
+		Writes the KB to a snapshot file, then appends whatever is told from
+		then on, so the file always holds the whole KB.  Recording stops at
+		the next compaction, which recycles the IDs of the retired steps.
+		"""
+		self.stop_recording()
+		self.snapshot(path)
+		self.recorder = wumpus_snapshot.SnapshotWriter(path, self.reg, append=True)
+
+
+	def stop_recording(self):
+		if self.recorder is not None: self.recorder.close()
+		self.recorder = None
+
+
+	def tell_query_cells(self, lits):
+		# Breeze, Stench and L of a location are only fully constrained once
+		# its axioms are added, in frontier mode OK and L at time t once its
+		# per-step axioms are, and in sparse mode W once the location is in
+		# the exactly-one Wumpus constraint, and L at the initial (or last
+		# compacted) step once it is asserted against the agent's location.
+		for lit in lits:
+			base, x, y, t = self.reg.key(lit)
+			if self.lazy and base in ('B', 'S', 'L') and 1 <= x <= self.width and 1 <= y <= self.height:
+				self.tell_cell(x, y)
+			if self.sparse and base == 'W': self.tell_wumpus_cells([(x, y)])
+			if self.sparse and base == 'L' and t == self.horizon and (x, y) != self.location \
+					and (x, y) not in self.elsewhere:
+				self.elsewhere.add((x, y))
+				self.tell([(-self.var('L', x, y, t),)], t)
+			if self.frontier is not None and base in ('OK', 'L') and t in self.states \
+					and (x, y) not in self.step_cells.get(t, ()):
+				self.tell_step_cells(t, [(x, y)])
+
+
+	def entails(self, lit):
+		"""
+		True iff the KB entails literal lit.
+
+		Queries decided by unit propagation alone (the unit facts told by the
+		initial axioms and percepts, and whatever they imply, e.g. the
+		location and heading after a known action) are answered without a
+		solve, assuming the KB is satisfiable.
+		"""
+		if self.lazy or self.frontier is not None: self.tell_query_cells([lit])
+		self.query_count += 1
+		root = self.solver.root_value(lit)
+
+
+		if root:
+			self.root_count += 1
+			return root == 1
+		self.solve_count += 1
+
+		return not self.solver.solve([-lit])
+
+
+	def ask(self, lit):
+		"""
+		True if the KB entails lit, False if it entails ~lit, None otherwise.
+		"""
+		if self.graph is not None: return self.ask_all([lit])[lit]
+		if self.entails(lit): return True
+		if self.entails(-lit): return False
+
+		return None
+
+
+	def ask_ok(self, x, y, t):
+		if self.cache is not None: return self.ask_all([self.var('OK', x, y, t)])[self.var('OK', x, y, t)]
+
+
+		return self.ask(self.var('OK', x, y, t))
+
+
+	def ask_location(self, x, y, t):
+		return self.ask(self.var('L', x, y, t))
+
+
+	def ask_all(self, lits):
+		"""
+		Batched ask: returns {lit: True/False/None} for every literal in lits,
+		in a single pass over the solver (see sat_solver.entailed_literals).
+		With a cache, the safety queries it has answers for skip the solver.
+		"""
+		lits = list(lits)
+		keys = (self.cache_keys(lits) if self.cache is not None else {})
+		cached = {}
+		if keys:
+			found = self.cache.get_many(set(keys.values()))
+			cached = dict((lit, found[key]) for lit, key in keys.items() if key in found)
+			self.cache_count += len(cached)
+			lits = [lit for lit in lits if lit not in cached]
+		if not lits: return cached
+
+
+		if self.lazy or self.frontier is not None: self.tell_query_cells(lits)
+		solves = self.solves()
+		self.query_count += 2 * len(lits)
+		if self.graph is None:
+			entailed = sat_solver.entailed_literals(self.solver, lits + [-lit for lit in lits])
+		else:
+			entailed = sat_slice.entailed_literals(self.graph, lits + [-lit for lit in lits], self.root_value, self.backend,
+				self.executor)
+		self.solve_count += self.solves() - solves
+		self.root_count += sum(1 for lit in lits if self.solver.root_value(lit))
+
+		answers = dict((lit, (True if lit in entailed else (False if -lit in entailed else None))) for lit in lits)
+		if keys: self.cache.put_many((keys[lit], answer) for lit, answer in answers.items() if lit in keys)
+		answers.update(cached)
+		return answers
+
+
+	def solves(self):
+		return self.solver.stats['solves'] + (0 if self.graph is None else self.graph.stats['solves'])
+
+
+	def root_value(self, lit):
+		# What the solver has fixed at the root level, without putting
+		# eliminated propositions back (see sat_preprocess.SimplifiedSolver):
+		# those are unknown.
+		if isinstance(self.solver, sat_preprocess.SimplifiedSolver):
+			if abs(lit) in self.solver.preprocessor.eliminated: return 0
+			return self.solver.solver.root_value(lit)
+
+
+		return self.solver.root_value(lit)
+
+
+	def cache_keys(self, lits):
+		"""
+		{lit: key} for the safety queries among lits: OK literals of a time
+		step whose percepts (and those of every earlier step) have been told,
+		see wumpus_cache.safety_keys.
+		"""
+		queries = {}
+		keys = {}
+
+
+		for lit in lits:
+			if lit < 0: continue
+			base, x, y, t = self.reg.key(lit)
+			if base == 'OK' and t is not None and t <= self.perceived and 1 <= x <= self.width and 1 <= y <= self.height:
+				queries.setdefault(t, []).append((lit, (x, y)))
+		for t, pairs in queries.items():
+			cell_keys = wumpus_cache.safety_keys([cell for lit, cell in pairs], t, self.width, self.height, self.start,
+				self.evidence, self.scream)
+			keys.update((lit, cell_keys[cell]) for lit, cell in pairs)
+
+		return keys
+
+
+	def ask_all_safety(self, t, xmin=1, xmax=None, ymin=1, ymax=None):
+		"""
+		Returns {(x, y): True/False/None} telling, for every location in the
+		bounds (default: the whole world), whether it is proven OK at time t,
+		proven not OK, or unknown.
+		"""
+		cells = [(x, y) for x in range(xmin, (self.width if xmax is None else xmax) + 1)
+			for y in range(ymin, (self.height if ymax is None else ymax) + 1)]
+		answers = self.ask_all(self.var('OK', x, y, t) for x, y in cells)
+
+
+		return dict((cell, answers[self.var('OK', cell[0], cell[1], t)]) for cell in cells)
@@ -0,0 +1,323 @@
+# wumpus_snapshot.py
+# ------------------
+# A compact binary format for persisting a wumpus KB in clause form (see the
+# clause generators in wumpus_kb), for replays, debugging and warm starts.
+#
+# A snapshot file is a header followed by segments, so that a KB can be
+# appended to step by step without rewriting what is already there:
+#
+#	header:  magic 'WKBS', uint16 version, uint16 flags (0), uint64 reserved
+#	segment: 4-byte kind, uint32 count, int32 t (-1: atemporal), uint32 size,
+#		then size bytes of payload (a multiple of 4)
+#
+#	'SYMS' segment, count symbols:
+#		int32 ids[count], uint32 name_ends[count], UTF-8 names (padded)
+#		the names of the IDs first used by the clauses that follow, as
+#		given by the registry (e.g. 'P1_2', 'L1_1_0', see
+#		wumpus_kb.proposition_str)
+#	'CLSE' segment, count clauses of time step t:
+#		uint32 offsets[count + 1], int32 literals[offsets[count]]
+#		clause i is literals[offsets[i]:offsets[i + 1]], DIMACS style
+#
+# All integers are little-endian.  Snapshot maps the file and reads the
+# arrays in place (zero-copy), so loading does not depend on the KB size.
+import array
+import bisect
+import mmap
+import os
+import struct
+import sys
+
+import sat_solver
+import wumpus_kb
+
+
+
+
+#-------------------------------------------------------------------------------
+# Format
+#-------------------------------------------------------------------------------
+snapshot_magic = b'WKBS'
+snapshot_version = 1
+_header = struct.Struct('<4sHHQ')
+_segment = struct.Struct('<4sIiI')
+
+
+
+def _int_array(typecode, values):
+	data = array.array(typecode, values)
+	assert data.itemsize == 4
+	if sys.byteorder != 'little': data.byteswap()
+
+	return data.tobytes()
+
+
+
+def _int_view(buf, typecode):
+	"""
+	The little-endian 32-bit integers in buf, in place when the host is
+	little-endian, else as a byte-swapped copy.
+	"""
+	if sys.byteorder == 'little': return buf.cast(typecode)
+
+
+	data = array.array(typecode, buf.tobytes())
+	data.byteswap()
+
+	return data
+
+
+
+#-------------------------------------------------------------------------------
+# Writing
+#-------------------------------------------------------------------------------
+class SnapshotWriter(object):
+	"""
+	Writes (or appends to) a snapshot file.
+
+	path := the snapshot file
+	reg := the PropositionRegistry the clauses are over; default=
+		wumpus_kb.propositions
+	append := add to an existing snapshot instead of starting a new one;
+		default=False
+
+	The IDs of a snapshot must keep their names: a registry whose retired
+	time steps have been recycled (see PropositionRegistry.retire_steps)
+	cannot be appended to a snapshot started before the recycling.
+	"""
+	def __init__(self, path, reg=None, append=False):
+		self.path = path
+		self.reg = wumpus_kb._registry(reg)
+		self.names = {}
+
+
+		if append and os.path.exists(path) and os.path.getsize(path) > 0:
+			with Snapshot(path) as snapshot: self.names = snapshot.names()
+			self.file = open(path, 'ab')
+		else:
+			self.file = open(path, 'wb')
+			self.file.write(_header.pack(snapshot_magic, snapshot_version, 0, 0))
+
+
+	def write(self, clauses, t=None):
+		"""
+		Appends clauses (sequences of literals over self.reg) as a segment of
+		time step t (None for atemporal clauses), after the names of the IDs
+		they use for the first time.
+		"""
+		clauses = list(clauses)
+		symbols = []
+
+
+		for clause in clauses:
+			for lit in clause:
+				v = abs(lit)
+				name = self.names.get(v)
+				if name is None:
+					name = self.names[v] = self.reg.name(v)
+					symbols.append((v, name))
+				elif name != self.reg.name(v):
+					raise ValueError('ID {0} was {1}, now {2}: recycled IDs cannot be appended'.format(v, name, self.reg.name(v)))
+
+		if symbols:
+			blob = ''.join(name for v, name in symbols).encode('utf-8')
+			ends, end = [], 0
+			for v, name in symbols:
+				end += len(name.encode('utf-8'))
+				ends.append(end)
+			payload = _int_array('i', [v for v, name in symbols]) + _int_array('I', ends) + blob
+			payload += b'\0' * (-len(payload) % 4)
+			self.file.write(_segment.pack(b'SYMS', len(symbols), -1, len(payload)) + payload)
+
+		offsets = [0]
+		for clause in clauses: offsets.append(offsets[-1] + len(clause))
+		payload = _int_array('I', offsets) + _int_array('i', [lit for clause in clauses for lit in clause])
+		self.file.write(_segment.pack(b'CLSE', len(clauses), (-1 if t is None else t), len(payload)) + payload)
+		self.file.flush()
+
+
+	def close(self):
+		self.file.close()
+
+
+	def __enter__(self):
+		return self
+
+
+	def __exit__(self, *exc):
+		self.close()
+
+
+
+def save_snapshot(path, clauses, reg=None, t=None):
+	"""
+	Writes clauses to a new snapshot file, as a single segment.
+	"""
+	with SnapshotWriter(path, reg) as writer: writer.write(clauses, t)
+
+
+
+#-------------------------------------------------------------------------------
+# Reading
+#-------------------------------------------------------------------------------
+class Snapshot(object):
+	"""
+	A snapshot file, mapped read-only.
+
+	The clause arrays are views into the mapping: nothing is decoded until
+	it is asked for.  Clauses are numbered across segments in file order.
+
+	An empty file is an empty snapshot, as SnapshotWriter(append=True)
+	takes it.  A file cut short (e.g. by a crash while appending) raises
+	ValueError rather than losing its last segment silently.
+	"""
+	def __init__(self, path):
+		self.path = path
+		self.file = open(path, 'rb')
+		# An empty file cannot be mapped; there is nothing to map anyway.
+		self.map = (mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(self.file.fileno()).st_size
+			else b'')
+		self.view = memoryview(self.map)
+		self.symbol_segments = []
+		self.segments = []
+		self.version = snapshot_version
+		self.nvars = 0
+
+
+		try:
+			self.load()
+		except Exception:
+			self.close()
+			raise
+
+
+	def load(self):
+		# Checks the segment headers first, so that a bad file raises before
+		# any view into the mapping exists (close could not release it).
+		headers = []
+		pos = count = 0
+
+
+		if self.map:
+			if len(self.map) < _header.size: raise ValueError('{0} is truncated: incomplete header'.format(self.path))
+			magic, self.version, flags, reserved = _header.unpack_from(self.map, 0)
+			if magic != snapshot_magic: raise ValueError('{0} is not a KB snapshot'.format(self.path))
+			if self.version > snapshot_version: raise ValueError('Unsupported snapshot version: {0}'.format(self.version))
+			pos = _header.size
+		while pos < len(self.map):
+			if pos + _segment.size > len(self.map):
+				raise ValueError('{0} is truncated: incomplete segment header at byte {1}'.format(self.path, pos))
+			kind, n, t, size = _segment.unpack_from(self.map, pos)
+			if pos + _segment.size + size > len(self.map):
+				raise ValueError('{0} is truncated: the segment at byte {1} needs {2} bytes, {3} are left'.format(
+					self.path, pos, _segment.size + size, len(self.map) - pos))
+			headers.append((pos + _segment.size, kind, n, t, size))
+			pos += _segment.size + size
+
+		for pos, kind, n, t, size in headers:
+			payload = self.view[pos:pos + size]
+			if kind == b'SYMS':
+				ids = _int_view(payload[:4 * n], 'i')
+				ends = _int_view(payload[4 * n:8 * n], 'I')
+				self.symbol_segments.append((ids, ends, payload[8 * n:]))
+				if n: self.nvars = max(self.nvars, max(ids))
+			elif kind == b'CLSE':
+				offsets = _int_view(payload[:4 * (n + 1)], 'I')
+				literals = _int_view(payload[4 * (n + 1):], 'i')
+				self.segments.append(((None if t == -1 else t), count, offsets, literals))
+				count += n
+		self.count = count
+		self.starts = [start for t, start, offsets, literals in self.segments]
+
+
+	def __len__(self):
+		return self.count
+
+
+	def __iter__(self):
+		for t, start, offsets, literals in self.segments:
+			for i in range(len(offsets) - 1):
+				yield tuple(literals[offsets[i]:offsets[i + 1]])
+
+
+	def clause(self, i):
+		"""
+		Clause number i, as a tuple of literals.
+		"""
+		if not 0 <= i < self.count: raise IndexError(i)
+		t, start, offsets, literals = self.segments[bisect.bisect_right(self.starts, i) - 1]
+
+
+		i -= start
+
+		return tuple(literals[offsets[i]:offsets[i + 1]])
+
+
+	def steps(self):
+		"""
+		[(t, clause count)] for every clause segment, in file order.
+		"""
+		return [(t, len(offsets) - 1) for t, start, offsets, literals in self.segments]
+
+
+	def names(self):
+		"""
+		{id: name} for every ID the clauses use.
+		"""
+		names = {}
+
+
+		for ids, ends, blob in self.symbol_segments:
+			begin = 0
+			for v, end in zip(ids, ends):
+				names[v] = bytes(blob[begin:end]).decode('utf-8')
+				begin = end
+
+		return names
+
+
+	def solver(self, backend=None):
+		"""
+		A new solver (see sat_solver.new_solver) holding the snapshot's
+		clauses, over the snapshot's IDs.
+		"""
+		solver = sat_solver.new_solver(backend)
+
+
+		for clause in self: solver.add_clause(clause)
+
+		return solver
+
+
+	def to_dimacs(self, f, names=True):
+		"""
+		Writes the clauses to file object f in DIMACS CNF, preceded by the
+		symbol table as 'c <id> <name>' comment lines when names is True.
+		"""
+		if names:
+			for v, name in sorted(self.names().items()): f.write('c {0} {1}\n'.format(v, name))
+
+
+		f.write('p cnf {0} {1}\n'.format(self.nvars, self.count))
+		for clause in self: f.write(' '.join(map(str, clause)) + ' 0\n')
+
+
+	def close(self):
+		# The array views must be released before the mapping can close.
+		self.segments = self.symbol_segments = self.starts = []
+		self.view.release()
+		if self.map: self.map.close()
+		self.file.close()
+
+
+	def __enter__(self):
+		return self
+
+
+	def __exit__(self, *exc):
+		self.close()
+
+
+
+def export_dimacs(snapshot_path, dimacs_path, names=True):
+	with Snapshot(snapshot_path) as snapshot, open(dimacs_path, 'w') as f: snapshot.to_dimacs(f, names)
@@ -0,0 +1,274 @@
+# wumpus_world.py
+# ---------------
+# A small in-process wumpus world simulator and a safe-exploring agent
+# driven by a KBSession, for running whole episodes (see wumpus_batch) without
+# the full game environment.
+#
+# Percepts are vectors in the order of axiom_generator_percept_sentence:
+# (<stench>,<breeze>,<glitter>,<bump>,<scream>), and actions are named as in
+# wumpus_kb.proposition_bases_actions.
+import random
+import time
+
+import wumpus_kb
+import wumpus_planner
+import wumpus_satplan
+import wumpus_session
+
+
+
+
+#-------------------------------------------------------------------------------
+# World
+#-------------------------------------------------------------------------------
+heading_moves = {'north': (0, 1), 'east': (1, 0), 'south': (0, -1), 'west': (-1, 0)}
+
+
+
+def turn(heading, action):
+	"""
+	The heading after action (TurnLeft or TurnRight) from heading.
+	"""
+	i = wumpus_kb.headings.index(heading)
+
+
+	return wumpus_kb.headings[(i + (-1 if action == 'TurnLeft' else 1)) % 4]
+
+
+
+class WumpusWorld(object):
+	"""
+	width,height := dimensions of world
+	seed := seed of the random layout; default=None
+	pit_prob := probability of a Pit at each location but the start; default=0.2
+	start := the agent's initial location; default=(1, 1)
+	heading := the agent's initial heading; default='east'
+
+	The Wumpus and the gold are placed uniformly at random away from start.
+	"""
+	def __init__(self, width, height, seed=None, pit_prob=0.2, start=(1, 1), heading='east'):
+		rng = random.Random(seed)
+		cells = [cell for cell in wumpus_kb.locations(1, width, 1, height) if cell != start]
+
+
+		self.width = width
+		self.height = height
+		self.start = start
+		self.pits = set(cell for cell in cells if rng.random() < pit_prob)
+		self.wumpus = (rng.choice(cells) if cells else None)
+		self.gold = (rng.choice(cells) if cells else None)
+
+		self.x, self.y = start
+		self.heading = heading
+		self.alive = True
+		self.wumpus_alive = True
+		self.have_arrow = True
+		self.have_gold = False
+		self.done = False
+		self.bump = False
+		self.scream = False
+
+
+	def ok(self, x, y):
+		return (x, y) not in self.pits and not (self.wumpus_alive and (x, y) == self.wumpus)
+
+
+	def percept(self):
+		near = set(wumpus_kb._neighbour_cells(self.x, self.y, 1, self.width, 1, self.height))
+
+
+		return [self.wumpus in near, bool(self.pits & near), (self.x, self.y) == self.gold and not self.have_gold,
+			self.bump, self.scream]
+
+
+	def execute(self, action):
+		self.bump = self.scream = False
+
+
+		if action == 'Forward':
+			dx, dy = heading_moves[self.heading]
+			if 1 <= self.x + dx <= self.width and 1 <= self.y + dy <= self.height:
+				self.x, self.y = self.x + dx, self.y + dy
+				self.alive = self.ok(self.x, self.y)
+				self.done = not self.alive
+			else:
+				self.bump = True
+		elif action in ('TurnLeft', 'TurnRight'):
+			self.heading = turn(self.heading, action)
+		elif action == 'Grab':
+			if (self.x, self.y) == self.gold: self.have_gold = True
+		elif action == 'Shoot':
+			if self.have_arrow and self.wumpus_alive:
+				dx, dy = heading_moves[self.heading]
+				x, y = self.x, self.y
+				while 1 <= x <= self.width and 1 <= y <= self.height:
+					if (x, y) == self.wumpus:
+						self.wumpus_alive = False
+						self.scream = True
+					x, y = x + dx, y + dy
+			self.have_arrow = False
+		elif action == 'Climb':
+			self.done = (self.x, self.y) == self.start
+
+
+
+#-------------------------------------------------------------------------------
+# Agent
+#-------------------------------------------------------------------------------
+class ExplorerAgent(object):
+	"""
+	Explores the world moving only to locations its KB proves OK, preferring
+	unvisited neighbours, then the nearest unvisited location proven OK
+	earlier; grabs the gold when it sees it and climbs out when it has the
+	gold or nothing safe is left to explore.  Routes are planned over the
+	proven OK locations by a wumpus_planner.SafeRoutePlanner, or with
+	satplan, by one SATPlan search in the KB (see wumpus_satplan).
+
+	session := the KBSession of the episode
+	xi,yi := initial location
+	heading := initial heading; default='east'
+	seed := seed of the tie-breaking choices; default=None
+	satplan := plan routes with a wumpus_satplan.SATPlanner over the
+		session; default=False
+
+	step(percept) tells the KB about the current step and returns the
+	action; it is split into the KB calls and decide(percept, safe) and
+	advance(action), the policy and dead reckoning, for callers that talk
+	to the KB some other way (see wumpus_service).
+	"""
+	def __init__(self, session, xi, yi, heading='east', seed=None, satplan=False):
+		self.session = session
+		self.width, self.height = session.width, session.height
+		self.x, self.y = xi, yi
+		self.start = (xi, yi)
+		self.heading = heading
+		self.rng = random.Random(seed)
+		self.planner = wumpus_planner.SafeRoutePlanner(self.width, self.height)
+		self.planner.add_safe([(xi, yi)])
+		self.satplanner = (wumpus_satplan.SATPlanner(session) if satplan else None)
+		self.visited = set([(xi, yi)])
+		self.have_gold = False
+		self.route = []
+		self.t = 0
+
+
+	def step(self, percept):
+		session, t = self.session, self.t
+
+
+		session.tell_percept(t, percept)
+		session.tell_step(t, self.x, self.y, self.heading)
+		action = self.decide(percept, ([] if percept[2] and not self.have_gold else self.safe_neighbours()))
+		session.tell_action(t, action)
+		self.advance(action)
+
+		return action
+
+
+	def advance(self, action):
+		if action == 'Forward':
+			dx, dy = heading_moves[self.heading]
+			if 1 <= self.x + dx <= self.width and 1 <= self.y + dy <= self.height:
+				self.x, self.y = self.x + dx, self.y + dy
+				self.visited.add((self.x, self.y))
+				self.planner.add_safe([(self.x, self.y)])
+		elif action in ('TurnLeft', 'TurnRight'):
+			self.heading = turn(self.heading, action)
+		elif action == 'Grab':
+			self.have_gold = True
+		self.t += 1
+
+
+	def decide(self, percept, safe):
+		"""
+		safe := the neighbouring locations proven OK at the current step
+		"""
+		if percept[2] and not self.have_gold: return 'Grab'
+		self.planner.add_safe(safe)
+		fresh = [cell for cell in safe if cell not in self.visited]
+
+
+		if (self.x, self.y) == self.start and self.have_gold: return 'Climb'
+		if not self.route: self.route = self.plan(fresh)
+		if not self.route: return 'Climb'
+
+		return self.route.pop(0)
+
+
+	def neighbours(self, x, y):
+		return [cell for cell in wumpus_kb._neighbour_cells(x, y, 1, self.width, 1, self.height) if cell != (x, y)]
+
+
+	def safe_neighbours(self):
+		"""
+		The neighbouring locations the KB proves OK now, in one batched query.
+		"""
+		cells = self.neighbours(self.x, self.y)
+		answers = self.session.ask_all(self.session.var('OK', x, y, self.t) for x, y in cells)
+
+
+		return [cell for cell in cells if answers[self.session.var('OK', cell[0], cell[1], self.t)]]
+
+
+	def plan(self, fresh):
+		"""
+		The actions of a route to one of the fresh (safe, unvisited)
+		neighbouring locations, or else to the nearest safe unvisited
+		location, or else back to the start (see
+		wumpus_planner.SafeRoutePlanner).
+		"""
+		goals = [self.start]
+		if not self.have_gold:
+			goals = ([self.rng.choice(fresh)] if fresh else
+				[cell for cell in self.planner.safe if cell not in self.visited] or goals)
+
+
+		if self.satplanner is not None:
+			route = self.satplanner.plan(self.t, wumpus_satplan.location_goal(*goals), self.planner.safe)
+			if route is None and goals != [self.start]:
+				route = self.satplanner.plan(self.t, wumpus_satplan.location_goal(self.start), self.planner.safe)
+			return route or []
+
+		route = self.planner.plan(self.x, self.y, self.heading, goals)
+		if route is None and goals != [self.start]: route = self.planner.plan(self.x, self.y, self.heading, [self.start])
+
+		return route or []
+
+
+
+def run_episode(world, agent, max_steps=200):
+	"""
+	Runs agent in world until the world ends (the agent died or climbed
+	out) or for max_steps steps, and returns the episode's stats.
+	"""
+	times = []
+
+
+	while not world.done and len(times) < max_steps:
+		start = time.perf_counter()
+		action = agent.step(world.percept())
+		times.append(time.perf_counter() - start)
+		world.execute(action)
+
+	session = agent.session
+	outcome = ('dead' if not world.alive else ('gold' if world.have_gold and world.done else
+		('climbed' if world.done else 'timeout')))
+	return {'outcome': outcome, 'steps': len(times), 'visited': len(agent.visited),
+		'queries': session.query_count, 'solves': session.solve_count, 'root_answers': session.root_count,
+		'cached': session.cache_count,
+		'clauses': session.clause_count, 'time': sum(times), 'step_time': (sum(times) / len(times) if times else 0.0),
+		'max_step_time': max(times or [0.0])}
+
+
+
+def new_episode(width, height, seed=None, pit_prob=0.2, static=None, satplan=False, **kwargs):
+	"""
+	A (world, agent) pair for a random width x height world; kwargs are
+	passed on to KBSession.
+	"""
+	world = WumpusWorld(width, height, seed, pit_prob)
+	session = wumpus_session.KBSession(world.start[0], world.start[1], width, height, world.heading,
+		static=static, **kwargs)
+
+
+	return world, ExplorerAgent(session, world.start[0], world.start[1], world.heading, seed, satplan)